@@ -0,0 +1,173 @@
+"""
+HTTP job API for the video pipeline.
+
+Jobs are kept in a local SQLite queue (JOB_DB_PATH, default public/jobs.db)
+and rendered by background workers, so requests return right away:
+
+    POST   /jobs                 {"prompt": "...", "orientation": "portrait", "voice": "Kore",
+                                  "music": "bgMusic.mp3", "bg_volume": 0.08}  -> 202 {"id": ...}
+    GET    /jobs                 recent jobs (?status=queued|running|done|failed|cancelled&limit=50)
+    GET    /jobs/<id>            status, per-stage progress, timings, error
+    GET    /jobs/<id>/video      the finished video
+    DELETE /jobs/<id>            cancel a queued job
+    GET    /health               job counts per status
+
+Usage:
+    uv run api.py                        # API + API_WORKERS background workers
+    uv run api.py --workers 0            # API only
+    uv run api.py --worker-only --workers 4   # workers only, e.g. on another process
+"""
+import argparse
+import os
+import time
+from flask import Flask, jsonify, request, send_file, url_for
+from app.services.batch import JOB_DEFAULTS
+from app.services.workers import WorkerPool
+from app.utils import JobQueue
+from app.utils.job_queue import QUEUED, DONE
+
+MUSIC_DIR = "public/audios"
+ORIENTATIONS = ("portrait", "landscape")
+
+def parse_job(data):
+    """Validate a job submission. Returns (params, None) or (None, error message)."""
+    if not isinstance(data, dict):
+        return None, "Expected a JSON object"
+    prompt = data.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        return None, "\"prompt\" is required"
+
+    params = {**JOB_DEFAULTS, "prompt": prompt.strip()}
+    if "orientation" in data:
+        if data["orientation"] not in ORIENTATIONS:
+            return None, f"\"orientation\" must be one of {', '.join(ORIENTATIONS)}"
+        params["orientation"] = data["orientation"]
+    if "voice" in data:
+        if not isinstance(data["voice"], str) or not data["voice"].isalnum():
+            return None, "\"voice\" must be a Gemini TTS voice name"
+        params["voice"] = data["voice"]
+    if "music" in data:
+        # Only tracks from MUSIC_DIR, never arbitrary paths
+        music = data["music"]
+        if music is None:
+            params["music"] = None
+        elif not isinstance(music, str) or os.path.basename(music) != music or music.startswith("."):
+            return None, f"\"music\" must be a file name in {MUSIC_DIR} or null"
+        elif not os.path.isfile(os.path.join(MUSIC_DIR, music)):
+            return None, f"Unknown music track: {music}"
+        else:
+            params["music"] = os.path.join(MUSIC_DIR, music)
+    if "bg_volume" in data:
+        volume = data["bg_volume"]
+        if isinstance(volume, bool) or not isinstance(volume, (int, float)) or not 0 <= volume <= 1:
+            return None, "\"bg_volume\" must be a number between 0 and 1"
+        params["bg_volume"] = volume
+    if "fresh" in data:
+        if not isinstance(data["fresh"], bool):
+            return None, "\"fresh\" must be true or false"
+        params["fresh"] = data["fresh"]
+    return params, None
+
+def _iso(timestamp):
+    return time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(timestamp)) if timestamp else None
+
+def job_view(queue, job):
+    view = {
+        "id": job["id"],
+        "status": job["status"],
+        "params": job["params"],
+        "stages": job["stages"],
+        "timings": job["timings"],
+        "error": job["error"],
+        "attempts": job["attempts"],
+        "created_at": _iso(job["created_at"]),
+        "started_at": _iso(job["started_at"]),
+        "finished_at": _iso(job["finished_at"]),
+        "url": url_for("get_job", job_id=job["id"]),
+    }
+    if job["status"] == QUEUED:
+        view["queue_position"] = queue.position(job["id"])
+    if job["status"] == DONE:
+        view["video_url"] = url_for("get_video", job_id=job["id"])
+    return view
+
+def create_app(queue=None):
+    """Flask app serving the job API on top of queue (default: JobQueue())."""
+    app = Flask(__name__)
+    queue = queue or JobQueue()
+    app.config["JOB_QUEUE"] = queue
+
+    def not_found(job_id):
+        return jsonify(error=f"No job {job_id}"), 404
+
+    @app.post("/jobs")
+    def submit_job():
+        params, error = parse_job(request.get_json(silent=True))
+        if error:
+            return jsonify(error=error), 400
+        job = queue.get(queue.submit(params))
+        return jsonify(job_view(queue, job)), 202, {"Location": url_for("get_job", job_id=job["id"])}
+
+    @app.get("/jobs")
+    def list_jobs():
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+        jobs = queue.list(status=request.args.get("status"), limit=limit)
+        return jsonify(jobs=[job_view(queue, job) for job in jobs])
+
+    @app.get("/jobs/<job_id>")
+    def get_job(job_id):
+        job = queue.get(job_id)
+        if job is None:
+            return not_found(job_id)
+        return jsonify(job_view(queue, job))
+
+    @app.get("/jobs/<job_id>/video")
+    def get_video(job_id):
+        job = queue.get(job_id)
+        if job is None:
+            return not_found(job_id)
+        if job["status"] != DONE:
+            return jsonify(error=f"Job {job_id} is {job['status']}"), 409
+        if not job["output"] or not os.path.isfile(job["output"]):
+            return jsonify(error=f"The video of job {job_id} is no longer available"), 410
+        return send_file(os.path.abspath(job["output"]), mimetype="video/mp4",
+                         download_name=f"{job_id}.mp4", conditional=True)
+
+    @app.delete("/jobs/<job_id>")
+    def cancel_job(job_id):
+        job = queue.get(job_id)
+        if job is None:
+            return not_found(job_id)
+        if not queue.cancel(job_id):
+            return jsonify(error=f"Job {job_id} is {job['status']} and can no longer be cancelled"), 409
+        return jsonify(job_view(queue, queue.get(job_id)))
+
+    @app.get("/health")
+    def health():
+        return jsonify(status="ok", jobs=queue.counts())
+
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the video job API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Background workers in this process (default: API_WORKERS or 2)")
+    parser.add_argument("--worker-only", action="store_true", help="Run workers without the HTTP server")
+    args = parser.parse_args()
+
+    queue = JobQueue()
+    pool = WorkerPool(queue, workers=args.workers).start()
+    print(f"{pool.workers} workers on {queue.path}")
+    try:
+        if args.worker_only:
+            while True:
+                time.sleep(3600)
+        else:
+            create_app(queue).run(host=args.host, port=args.port, threaded=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Stopping: waiting for running jobs to finish...")
+        pool.stop()
@@ -1,27 +1,47 @@
-from app.services.prompt_generator import *
-from app.services.script_generator import *
-from app.services.generate_voice import *
-from app.services.generate_image import *
-from app.services.generate_media import *
-from app.services.resize_and_center import *
-from app.services.apply_pan_effect import *
-from app.services.add_multiple_texts import *
-from app.services.concatenate_media import *
-from app.services.generate_media_segments import *
-from app.services.add_audio import *
-from app.services.add_background_music import *
+"""
+Video pipeline services.
 
-__all__ = [
-    generate_prompts_from_prompt,
-    generate_script_from_prompt,
-    generate_voice_from_segments,
-    generate_image_from_prompt,
-    generate_media_sequence,
-    apply_pan_effect,
-    concatenate_media,
-    add_multiple_texts,
-    resize_and_center,
-    process_media_segments,
-    add_audio_to_video,
-    add_bgMusic_to_video,
-]
\ No newline at end of file
+Names are loaded lazily: `from app.services import process_media_segments`
+only imports the module that defines it, so light entry points (the API
+server, the batch CLI, Streamlit reruns) do not pay for MoviePy, librosa or
+google-genai until a service that needs them is used.
+"""
+import importlib
+
+# Public name -> module that defines it
+_EXPORTS = {
+    "generate_prompts_from_prompt": "app.services.prompt_generator",
+    "generate_script_from_prompt": "app.services.script_generator",
+    "generate_plan_from_prompt": "app.services.plan_generator",
+    "generate_voice_from_segments": "app.services.generate_voice",
+    "generate_image_from_prompt": "app.services.generate_image",
+    "generate_media_sequence": "app.services.generate_media",
+    "KieClient": "app.services.kie_client",
+    "apply_pan_effect": "app.services.apply_pan_effect",
+    "concatenate_media": "app.services.concatenate_media",
+    "add_multiple_texts": "app.services.add_multiple_texts",
+    "resize_and_center": "app.services.resize_and_center",
+    "process_media_segments": "app.services.generate_media_segments",
+    "add_audio_to_video": "app.services.add_audio",
+    "add_bgMusic_to_video": "app.services.add_background_music",
+    "render_final_video": "app.services.render_final",
+    "render_final_video_incremental": "app.services.render_segments",
+    "render_final_video_streaming": "app.services.frame_stream",
+    "run_video_pipeline": "app.services.pipeline",
+    "render_job": "app.services.pipeline",
+    "run_batch": "app.services.batch",
+    "WorkerPool": "app.services.workers",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
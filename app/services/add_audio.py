@@ -1,6 +1,8 @@
 from moviepy import VideoFileClip, AudioFileClip
+import os
+from app.utils import moviepy_write_args, span
 
-def add_audio_to_video(video_path, audio_path, output_path):
+def add_audio_to_video(video_path, audio_path, output_path, workspace=None, profile='final'):
     """
     Replace or attach an audio track to a video using MoviePy.
 
@@ -8,7 +10,12 @@ def add_audio_to_video(video_path, audio_path, output_path):
         video_path (str): Path to the input video file.
         audio_path (str): Path to the audio file to attach.
         output_path (str): Path to save the final video with audio.
+        workspace (JobWorkspace): Optional; output_path is saved in its outputs directory.
+        profile (str | dict): Encoder profile (see ENCODER_PROFILES).
     """
+    if workspace is not None:
+        output_path = workspace.output_path(os.path.basename(output_path))
+
     # Load video and audio
     video = VideoFileClip(video_path)
     audio = AudioFileClip(audio_path)
@@ -17,12 +24,14 @@ def add_audio_to_video(video_path, audio_path, output_path):
     video_with_audio = video.with_audio(audio)
 
     # Write output video
-    video_with_audio.write_videofile(
-        output_path,
-        codec="libx264",
-        audio_codec="aac"
-    )
+    with span("write_videofile", "moviepy", output=output_path):
+        video_with_audio.write_videofile(
+            output_path,
+            **moviepy_write_args(profile)
+        )
 
     # Close clips
     video.close()
-    audio.close()
\ No newline at end of file
+    audio.close()
+
+    return output_path
\ No newline at end of file
@@ -1,22 +1,16 @@
 from moviepy import VideoFileClip, AudioFileClip, CompositeAudioClip
+import os
+from app.utils import moviepy_write_args, span
 
-def add_bgMusic_to_video(video_path, audio_path, output_path, bg_volume=0.05):
+def fit_bg_music(bg_audio, video_duration, bg_volume=0.05):
     """
-    Add background music to video while keeping the original audio.
-    Adjusts background music to match video duration (loops or truncates as needed).
+    Trims or loops a background music clip to video_duration and lowers its volume.
 
     Parameters:
-        video_path (str): Path to the input video file.
-        audio_path (str): Path to the audio file to attach.
-        output_path (str): Path to save the final video with audio.
+        bg_audio (AudioFileClip): The background music clip.
+        video_duration (float): Duration to fit the music to, in seconds.
         bg_volume (float): Volume multiplier for background music (0.0 to 1.0).
-                          Default is 0.05 (5% of original volume).
     """
-    # Load video and background audio
-    video = VideoFileClip(video_path)
-    bg_audio = AudioFileClip(audio_path)
-    
-    video_duration = video.duration
     audio_duration = bg_audio.duration
     
     # Adjust background music to match video duration
@@ -29,7 +23,30 @@ def add_bgMusic_to_video(video_path, audio_path, output_path, bg_volume=0.05):
         bg_audio = bg_audio.loop(n=num_loops).subclipped(0, video_duration)
     
     # Reduce background music volume
-    bg_audio_lowered = bg_audio.with_volume_scaled(bg_volume)
+    return bg_audio.with_volume_scaled(bg_volume)
+
+def add_bgMusic_to_video(video_path, audio_path, output_path, bg_volume=0.05, workspace=None, profile='final'):
+    """
+    Add background music to video while keeping the original audio.
+    Adjusts background music to match video duration (loops or truncates as needed).
+
+    Parameters:
+        video_path (str): Path to the input video file.
+        audio_path (str): Path to the audio file to attach.
+        output_path (str): Path to save the final video with audio.
+        bg_volume (float): Volume multiplier for background music (0.0 to 1.0).
+                          Default is 0.05 (5% of original volume).
+        workspace (JobWorkspace): Optional; output_path is saved in its outputs directory.
+        profile (str | dict): Encoder profile (see ENCODER_PROFILES).
+    """
+    if workspace is not None:
+        output_path = workspace.output_path(os.path.basename(output_path))
+
+    # Load video and background audio
+    video = VideoFileClip(video_path)
+    bg_audio = AudioFileClip(audio_path)
+    
+    bg_audio_lowered = fit_bg_music(bg_audio, video.duration, bg_volume)
     
     # Get the original video audio
     original_audio = video.audio
@@ -45,12 +62,14 @@ def add_bgMusic_to_video(video_path, audio_path, output_path, bg_volume=0.05):
     video_with_audio = video.with_audio(mixed_audio)
     
     # Write output video
-    video_with_audio.write_videofile(
-        output_path,
-        codec="libx264",
-        audio_codec="aac"
-    )
+    with span("write_videofile", "moviepy", output=output_path):
+        video_with_audio.write_videofile(
+            output_path,
+            **moviepy_write_args(profile)
+        )
     
     # Close clips
     video.close()
     bg_audio.close()
+
+    return output_path
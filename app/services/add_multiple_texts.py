@@ -1,5 +1,216 @@
-from moviepy import VideoFileClip, CompositeVideoClip, vfx, TextClip
+from moviepy import VideoFileClip, TextClip
+from functools import lru_cache
+from PIL import Image
+import numpy as np
 import os
+from app.utils import moviepy_write_args, span
+
+# Caption animation: zoom from 1.2x to 1x over the first 0.3s, 0.1s fades in and out
+ZOOM_DURATION = 0.3
+ZOOM_START_SCALE = 1.2
+FADE_DURATION = 0.1
+
+# Caption style values measured in pixels, with render_caption_sprite's defaults
+CAPTION_PIXEL_STYLE = {
+    'font_size': 40,
+    'stroke_width': 0,
+    'size': (800, None),
+    'margin': (10, 10),
+    'interline': 4,
+}
+
+@lru_cache(maxsize=256)
+def render_caption_sprite(
+    text,
+    font=os.path.join(os.getcwd(), "public/fonts/font1.ttf"),
+    font_size=40,
+    color='white',
+    bg_color=None,
+    stroke_color=None,
+    stroke_width=0,
+    method='caption',
+    text_align='center',
+    horizontal_align='center',
+    vertical_align='bottom',
+    size=(800, None),
+    margin=(10, 10),
+    interline=4,
+    transparent=True,
+):
+    """
+    Rasterizes a caption once into an RGBA uint8 array.
+    Sprites are cached by text and style, so repeated captions and re-renders
+    with the same styling never rasterize twice. Style arguments must be hashable.
+    """
+    txt = TextClip(
+        text=text,
+        font=font,
+        font_size=font_size,
+        color=color,
+        bg_color=bg_color,
+        stroke_color=stroke_color,
+        stroke_width=stroke_width,
+        method=method,
+        text_align=text_align,
+        horizontal_align=horizontal_align,
+        vertical_align=vertical_align,
+        size=size,
+        margin=margin,
+        interline=interline,
+        transparent=transparent
+    )
+    rgb = txt.get_frame(0).astype(np.uint8)
+    if txt.mask is not None:
+        alpha = (txt.mask.get_frame(0) * 255).round().astype(np.uint8)
+    else:
+        alpha = np.full(rgb.shape[:2], 255, np.uint8)
+    txt.close()
+
+    sprite = np.dstack([rgb, alpha])
+    sprite.flags.writeable = False  # shared between callers through the cache
+    return sprite
+
+def scale_caption_style(style, scale):
+    """
+    Return caption style with every pixel measure (font size, stroke, text box
+    size, margins, line spacing) multiplied by scale, so captions keep their
+    proportions on a frame rendered at scale times the full resolution.
+    """
+    if scale == 1.0:
+        return dict(style)
+
+    def scaled(value):
+        if value is None:
+            return None
+        return int(round(value * scale))
+
+    style = dict(style)
+    for key, default in CAPTION_PIXEL_STYLE.items():
+        value = style.get(key, default)
+        if isinstance(value, (tuple, list)):
+            style[key] = tuple(scaled(v) for v in value)
+        else:
+            style[key] = scaled(value)
+    style['font_size'] = max(1, style['font_size'])
+    return style
+
+def caption_scale(t):
+    """Zoom-in scale of a caption t seconds after it appears."""
+    if t >= ZOOM_DURATION:
+        return 1.0
+    return ZOOM_START_SCALE - (ZOOM_START_SCALE - 1.0) * (t / ZOOM_DURATION)
+
+def caption_opacity(t, duration):
+    """Fade-in/fade-out opacity of a caption t seconds after it appears."""
+    opacity = 1.0
+    if t < FADE_DURATION:
+        opacity = t / FADE_DURATION
+    if t > duration - FADE_DURATION:
+        opacity = min(opacity, (duration - t) / FADE_DURATION)
+    return max(0.0, opacity)
+
+class _Layer:
+    """A sprite ready to blend: premultiplied color and alpha as float32."""
+
+    def __init__(self, rgba):
+        alpha = rgba[..., 3:4].astype(np.float32) / 255
+        self.color = rgba[..., :3].astype(np.float32) * alpha
+        self.alpha = alpha
+        self.height, self.width = rgba.shape[:2]
+
+class CaptionTrack:
+    """
+    Blends a list of timed captions onto video frames.
+
+    Every caption is rasterized once (render_caption_sprite). The zoom-in scale
+    for the frames of the 0.3s animation is precomputed as keyframes (one resized
+    sprite per frame), and fades are an opacity factor on the blend. Once the
+    animation is over, a frame is a plain alpha blit of the cached sprite.
+
+    Args:
+        texts: List of (text, start_time, end_time) tuples
+        frame_size: (width, height) of the frames the captions are blended onto
+        fps: Frame rate used to precompute the zoom keyframes
+        **style: Caption styling passed to render_caption_sprite
+    """
+
+    def __init__(self, texts, frame_size, fps=30, **style):
+        self.frame_width, self.frame_height = frame_size
+        self.fps = fps
+        self.horizontal_align = style.get('horizontal_align', 'center')
+        self.vertical_align = style.get('vertical_align', 'bottom')
+        style = {key: tuple(value) if isinstance(value, list) else value for key, value in style.items()}
+
+        n_keyframes = int(np.ceil(ZOOM_DURATION * fps))
+        self.captions = []
+        for text_content, start_time, end_time in texts:
+            sprite = render_caption_sprite(text_content, **style)
+            keyframes = [self._scaled_layer(sprite, caption_scale(k / fps)) for k in range(n_keyframes)]
+            self.captions.append((start_time, end_time, keyframes, _Layer(sprite)))
+
+    @staticmethod
+    def _scaled_layer(sprite, scale):
+        if scale == 1.0:
+            return _Layer(sprite)
+        height, width = sprite.shape[:2]
+        resized = Image.fromarray(sprite).resize(
+            (int(width * scale), int(height * scale)), Image.Resampling.LANCZOS
+        )
+        return _Layer(np.asarray(resized))
+
+    def _position(self, layer):
+        x = {
+            'left': 0,
+            'center': (self.frame_width - layer.width) / 2,
+            'right': self.frame_width - layer.width,
+        }[self.horizontal_align]
+        y = {
+            'top': 0,
+            'center': (self.frame_height - layer.height) / 2,
+            'bottom': self.frame_height - layer.height,
+        }[self.vertical_align]
+        return int(x), int(y)
+
+    def blend(self, frame, t):
+        """Blend every caption visible at time t onto frame (uint8 HxWx3), in place."""
+        for start_time, end_time, keyframes, layer in self.captions:
+            if not start_time <= t < end_time:
+                continue
+            local_t = t - start_time
+            key = int(round(local_t * self.fps))
+            if key < len(keyframes):
+                layer = keyframes[key]
+            opacity = caption_opacity(local_t, end_time - start_time)
+            if opacity <= 0:
+                continue
+            self._blit(frame, layer, opacity)
+        return frame
+
+    def _blit(self, frame, layer, opacity):
+        x, y = self._position(layer)
+        # Clip the sprite to the frame
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + layer.width, self.frame_width)
+        y1 = min(y + layer.height, self.frame_height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        sx, sy = x0 - x, y0 - y
+        color = layer.color[sy:sy + y1 - y0, sx:sx + x1 - x0]
+        alpha = layer.alpha[sy:sy + y1 - y0, sx:sx + x1 - x0]
+
+        region = frame[y0:y1, x0:x1]
+        if opacity >= 1.0:
+            blended = region * (1 - alpha) + color
+        else:
+            blended = region * (1 - alpha * opacity) + color * opacity
+        np.copyto(region, blended + 0.5, casting='unsafe')
+
+    def apply_to(self, clip):
+        """Return clip with the captions blended onto its frames."""
+        def filter(get_frame, t):
+            frame = np.array(get_frame(t), dtype=np.uint8)  # never draw on the source's buffer
+            return self.blend(frame, t)
+        return clip.transform(filter)
 
 def add_multiple_texts(
     video_path,
@@ -19,69 +230,56 @@ def add_multiple_texts(
     margin=(10, 10),
     interline=4,
     transparent=True,
+    workspace=None,
+    profile='draft',
+    scale=1.0,
+    fps=30,
 ):
-    video = VideoFileClip(video_path)
-    text_clips = []
-
-    def zoom_in(t):
-        zoom_duration = 0.3
-        start_scale = 1.2
-        end_scale = 1.0
-        if t >= zoom_duration:
-            return end_scale
-        return start_scale - (start_scale - end_scale) * (t / zoom_duration)
-
-    for text_content, start_time, end_time in texts:
-        duration = end_time - start_time
-
-        txt = TextClip(
-            text=text_content,
-            font=font,
-            font_size=font_size,
-            color=color,
-            bg_color=bg_color,
-            stroke_color=stroke_color,
-            stroke_width=stroke_width,
-            method=method,
-            text_align=text_align,
-            horizontal_align=horizontal_align,
-            vertical_align=vertical_align,
-            size=size,
-            margin=margin,
-            interline=interline,
-            transparent=transparent
-        )
+    """
+    Blends timed captions onto a video (see CaptionTrack).
 
-        txt = (
-            txt.with_position((horizontal_align, vertical_align))
-               .with_start(start_time)
-               .with_duration(duration)
-               .with_effects([
-                   vfx.CrossFadeIn(0.1),
-                   vfx.CrossFadeOut(0.1),
-                   vfx.Resize(zoom_in),
-               ])
-        )
+    scale multiplies the pixel measures of the style (see scale_caption_style)
+    for videos rendered below full resolution, e.g. previews; fps is the frame
+    rate of the output.
+    """
+    if workspace is not None:
+        output_path = workspace.output_path(os.path.basename(output_path))
 
-        text_clips.append(txt)
-
-    final = CompositeVideoClip([video] + text_clips)
-
-    final.write_videofile(
-        output_path,
-        codec='libx264',
-        audio_codec='aac',
-        fps=30,
-        preset='ultrafast',
-        threads=8,
-        bitrate='50k',
-        audio_bitrate='2k',
-        ffmpeg_params=['-crf', '23'],
-        logger='bar'
+    video = VideoFileClip(video_path)
+    style = scale_caption_style(dict(
+        font_size=font_size,
+        stroke_width=stroke_width,
+        size=size,
+        margin=margin,
+        interline=interline,
+    ), scale)
+    track = CaptionTrack(
+        texts,
+        frame_size=video.size,
+        fps=fps,
+        font=font,
+        color=color,
+        bg_color=bg_color,
+        stroke_color=stroke_color,
+        method=method,
+        text_align=text_align,
+        horizontal_align=horizontal_align,
+        vertical_align=vertical_align,
+        transparent=transparent,
+        **style,
     )
 
+    final = track.apply_to(video)
+
+    with span("write_videofile", "moviepy", output=output_path):
+        final.write_videofile(
+            output_path,
+            fps=fps,
+            logger='bar',
+            **moviepy_write_args(profile)
+        )
+
     video.close()
-    for c in text_clips:
-        c.close()
     final.close()
 
+    return output_path
@@ -1,119 +1,187 @@
-from moviepy import ColorClip, CompositeVideoClip, vfx
+import numpy as np
+from moviepy import VideoClip
 
-def apply_pan_effect(clip, target_width, target_height, direction='zoom', intensity=1.15):
+def compute_pan_zoom_rects(source_width, source_height, target_width, target_height,
+                           duration, fps=30, direction='zoom', intensity=1.15):
+    """
+    Precomputes the source crop rectangle shown on every frame of a pan/zoom.
+
+    The image is first scaled to COVER the target frame, then scaled further by
+    intensity to leave room for movement. Zooms animate that scale, pans keep it
+    fixed and move the visible window, so the frame is always covered.
+
+    Returns:
+        float array of shape (n_frames, 4) with (x, y, width, height) in source pixels
+    """
+    source_aspect = source_width / source_height
+    target_aspect = target_width / target_height
+
+    # Scale factor that makes the image cover the frame
+    if source_aspect > target_aspect:
+        # Image is wider, match HEIGHT
+        base_scale = target_height / source_height
+    else:
+        # Image is taller, match WIDTH
+        base_scale = target_width / source_width
+
+    n_frames = max(1, int(np.ceil(duration * fps)))
+    progress = np.minimum(np.arange(n_frames) / fps / duration, 1.0)  # 0 to 1
+
+    if direction in ['zoom_in', 'zoom']:
+        # Start at base size (covering frame), end at scaled size
+        scale = base_scale * (1 + (intensity - 1) * progress)
+    elif direction == 'zoom_out':
+        # Start at scaled size, end at base size (covering frame)
+        scale = base_scale * (intensity - (intensity - 1) * progress)
+    else:
+        scale = np.full(n_frames, base_scale * intensity)
+
+    crop_w = target_width / scale
+    crop_h = target_height / scale
+    # Centered window, used as-is by zooms and by pans along the other axis
+    x = (source_width - crop_w) / 2
+    y = (source_height - crop_h) / 2
+
+    if direction == 'left':
+        # Pan from right to left
+        x = (source_width - crop_w) * progress
+    elif direction == 'right':
+        # Pan from left to right
+        x = (source_width - crop_w) * (1 - progress)
+    elif direction == 'up':
+        # Pan from bottom to top
+        y = (source_height - crop_h) * progress
+    elif direction == 'down':
+        # Pan from top to bottom
+        y = (source_height - crop_h) * (1 - progress)
+
+    return np.stack([x, y, crop_w, crop_h], axis=1)
+
+def _sample_table(starts, lengths, source_size, out_size):
+    """Bilinear sample positions for every frame along one axis."""
+    centers = (np.arange(out_size) + 0.5) / out_size
+    pos = starts[:, None] + centers[None, :] * lengths[:, None] - 0.5
+    pos = np.clip(pos, 0, source_size - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, source_size - 1)
+    weight = (pos - lo).astype(np.float32)
+    return lo, hi, weight
+
+def box_reduce(image, factor):
+    """Shrink an HxWxC float image by an integer factor, averaging factor x factor blocks (like PIL's Image.reduce)."""
+    height, width = image.shape[0] // factor, image.shape[1] // factor
+    blocks = image[:height * factor, :width * factor].reshape(height, factor, width, factor, -1)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+class PanZoomRenderer:
+    """
+    Renders pan/zoom frames of a still image with NumPy.
+
+    The image is decoded once, the per-frame crop rectangles and bilinear sample
+    tables are precomputed, and every frame is produced with a single separable
+    crop+resize into reused buffers. render() returns the same output array on
+    every call, so copy it if it has to outlive the next frame.
+
+    Bilinear sampling alone aliases when the image is shrunk by more than 2x
+    (e.g. at preview scale), so the source is first box-filtered by the
+    largest integer factor that keeps it at least as detailed as every frame
+    needs (box_reduce).
+    """
+
+    def __init__(self, image, target_width, target_height, duration, fps=30,
+                 direction='zoom', intensity=1.15):
+        source = np.asarray(image[..., :3], dtype=np.float32)
+        source_height, source_width = source.shape[:2]
+        self.fps = fps
+        self.size = (target_width, target_height)
+
+        self.rects = compute_pan_zoom_rects(source_width, source_height, target_width, target_height,
+                                            duration, fps, direction, intensity)
+        self.n_frames = len(self.rects)
+
+        # Source pixels per output pixel on the most zoomed-in frame, rounded down
+        self.prefilter = max(1, int(np.min(self.rects[:, 2] / target_width)))
+        if self.prefilter > 1:
+            source = box_reduce(source, self.prefilter)
+            source_height, source_width = source.shape[:2]
+        self.source = np.ascontiguousarray(source)
+
+        x, y, w, h = (self.rects / self.prefilter).T
+        self._x_lo, self._x_hi, self._x_w = _sample_table(x, w, source_width, target_width)
+        self._y_lo, self._y_hi, self._y_w = _sample_table(y, h, source_height, target_height)
+        # Only the rows inside the crop are resampled horizontally
+        self._row_start = self._y_lo.min(axis=1)
+        self._row_stop = self._y_hi.max(axis=1) + 1
+
+        max_rows = int((self._row_stop - self._row_start).max())
+        self._cols_a = np.empty((max_rows, target_width, 3), np.float32)
+        self._cols_b = np.empty((max_rows, target_width, 3), np.float32)
+        self._rows_a = np.empty((target_height, target_width, 3), np.float32)
+        self._rows_b = np.empty((target_height, target_width, 3), np.float32)
+        self._out = np.empty((target_height, target_width, 3), np.uint8)
+
+    def frame_index(self, t):
+        return min(max(int(round(t * self.fps)), 0), self.n_frames - 1)
+
+    def render(self, index, out=None):
+        """Render frame `index` into out (or the internal buffer) and return it."""
+        if out is None:
+            out = self._out
+
+        start, stop = self._row_start[index], self._row_stop[index]
+        band = self.source[start:stop]
+        rows = stop - start
+
+        # Horizontal pass over the rows inside the crop
+        a, b = self._cols_a[:rows], self._cols_b[:rows]
+        np.take(band, self._x_lo[index], axis=1, out=a, mode='clip')
+        np.take(band, self._x_hi[index], axis=1, out=b, mode='clip')
+        b -= a
+        b *= self._x_w[index][None, :, None]
+        a += b
+
+        # Vertical pass
+        c, d = self._rows_a, self._rows_b
+        np.take(a, self._y_lo[index] - start, axis=0, out=c, mode='clip')
+        np.take(a, self._y_hi[index] - start, axis=0, out=d, mode='clip')
+        d -= c
+        d *= self._y_w[index][:, None, None]
+        c += d
+
+        c += 0.5  # round to nearest when truncating to uint8
+        np.copyto(out, c, casting='unsafe')
+        return out
+
+    def frame_at(self, t):
+        return self.render(self.frame_index(t))
+
+class PanZoomClip(VideoClip):
+    """
+    Video clip showing a still image with a Ken Burns pan/zoom, rendered by
+    PanZoomRenderer at the target size (no per-frame resize or compositing).
+    """
+
+    def __init__(self, image, target_width, target_height, duration, fps=30,
+                 direction='zoom', intensity=1.15):
+        self.renderer = PanZoomRenderer(image, target_width, target_height, duration, fps,
+                                        direction, intensity)
+        super().__init__(frame_function=self.renderer.frame_at, duration=duration)
+
+def apply_pan_effect(clip, target_width, target_height, direction='zoom', intensity=1.15, fps=30):
     """
     Applies a slow pan/zoom effect to an image clip while ensuring frame is always covered.
-    
+
     Args:
         clip: The image clip to animate
         target_width: Target width for the output
         target_height: Target height for the output
         direction: 'left', 'right', 'up', 'down', 'zoom_in', 'zoom_out', 'zoom' (alias for zoom_in)
         intensity: How much to scale/move (1.15 = 15% larger/movement)
+        fps: Frame rate the crop rectangles are precomputed for
     """
-    clip_width, clip_height = clip.size
-    duration = clip.duration
-    clip_aspect = clip_width / clip_height
-    target_aspect = target_width / target_height
-    
-    # First, scale image to COVER the frame (matching the larger dimension needed)
-    if clip_aspect > target_aspect:
-        # Clip is wider, match HEIGHT
-        base_height = target_height
-        base_width = int(target_height * clip_aspect)
-    else:
-        # Clip is taller, match WIDTH
-        base_width = target_width
-        base_height = int(target_width / clip_aspect)
-    
-    # Scale up further by intensity to allow for movement while staying covered
-    scale_factor = intensity
-    scaled_width = int(base_width * scale_factor)
-    scaled_height = int(base_height * scale_factor)
-    
-    # Apply zoom effects
-    if direction in ['zoom_in', 'zoom']:
-        def zoom_func(t):
-            progress = t / duration
-            # Start at base size (covering frame), end at scaled size
-            start_w, start_h = base_width, base_height
-            end_w, end_h = scaled_width, scaled_height
-            current_w = int(start_w + (end_w - start_w) * progress)
-            current_h = int(start_h + (end_h - start_h) * progress)
-            return (current_w, current_h)
-        
-        def position_func(t):
-            current_size = zoom_func(t)
-            x = -(current_size[0] - target_width) // 2
-            y = -(current_size[1] - target_height) // 2
-            return (x, y)
-        
-        animated_clip = clip.with_effects([vfx.Resize(zoom_func)]).with_position(position_func)
-        
-    elif direction == 'zoom_out':
-        def zoom_func(t):
-            progress = t / duration
-            # Start at scaled size, end at base size (covering frame)
-            start_w, start_h = scaled_width, scaled_height
-            end_w, end_h = base_width, base_height
-            current_w = int(start_w - (start_w - end_w) * progress)
-            current_h = int(start_h - (start_h - end_h) * progress)
-            return (current_w, current_h)
-        
-        def position_func(t):
-            current_size = zoom_func(t)
-            x = -(current_size[0] - target_width) // 2
-            y = -(current_size[1] - target_height) // 2
-            return (x, y)
-        
-        animated_clip = clip.with_effects([vfx.Resize(zoom_func)]).with_position(position_func)
-    
-    else:
-        # Pan effects - use scaled size
-        scaled_clip = clip.resized((scaled_width, scaled_height))
-        
-        def position_func(t):
-            progress = t / duration  # 0 to 1
-            
-            if direction == 'left':
-                # Pan from right to left
-                max_offset = scaled_width - target_width
-                x = -int(max_offset * progress)
-                y = -(scaled_height - target_height) // 2
-                
-            elif direction == 'right':
-                # Pan from left to right
-                max_offset = scaled_width - target_width
-                x = -int(max_offset * (1 - progress))
-                y = -(scaled_height - target_height) // 2
-                
-            elif direction == 'up':
-                # Pan from bottom to top
-                max_offset = scaled_height - target_height
-                x = -(scaled_width - target_width) // 2
-                y = -int(max_offset * progress)
-                
-            elif direction == 'down':
-                # Pan from top to bottom
-                max_offset = scaled_height - target_height
-                x = -(scaled_width - target_width) // 2
-                y = -int(max_offset * (1 - progress))
-            
-            else:
-                # No movement (center)
-                x = -(scaled_width - target_width) // 2
-                y = -(scaled_height - target_height) // 2
-            
-            return (x, y)
-        
-        animated_clip = scaled_clip.with_position(position_func)
-    
-    # Create background and composite
-    bg = ColorClip(size=(target_width, target_height), 
-                   color=(0, 0, 0), 
-                   duration=duration)
-    
-    final = CompositeVideoClip([bg, animated_clip], size=(target_width, target_height))
-    
-    return final
+    # Decode the image once; transparent areas end up black as before
+    image = clip.get_frame(0).astype(np.float32)
+    if clip.mask is not None:
+        image *= clip.mask.get_frame(0)[..., None]
 
+    return PanZoomClip(image, target_width, target_height, clip.duration, fps, direction, intensity)
@@ -0,0 +1,127 @@
+import json
+import os
+import subprocess
+import tempfile
+from app.utils import ffmpeg_video_args, span
+
+# Shared intermediate format of the pieces joined by concat_segments
+INTERMEDIATE_CODEC = "h264"
+INTERMEDIATE_PIX_FMT = "yuv420p"
+INTERMEDIATE_TIMESCALE = "15360"
+
+def run_tool(cmd):
+    """Run an ffmpeg/ffprobe command and return its stdout, raising RuntimeError with its stderr on failure."""
+    with span(os.path.basename(cmd[0]), "subprocess", output=cmd[-1]):
+        p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"{cmd[0]} failed:\n{p.stderr.strip()}")
+    return p.stdout
+
+def probe_media(path):
+    """
+    Probe the first video stream of a file with ffprobe.
+
+    Returns:
+        Dict with codec, profile, level, pix_fmt, width, height, sar,
+        time_base, extradata_hash (sha256 of the avcC parameter sets), fps and
+        duration (seconds)
+    """
+    out = run_tool([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_data_hash", "sha256",
+        "-show_entries", (
+            "stream=codec_name,profile,level,pix_fmt,width,height,sample_aspect_ratio,"
+            "time_base,r_frame_rate,extradata_hash:format=duration"
+        ),
+        "-of", "json",
+        path
+    ])
+    data = json.loads(out)
+    stream = data["streams"][0]
+    num, den = stream["r_frame_rate"].split("/")
+    return {
+        "codec": stream["codec_name"],
+        "profile": stream.get("profile"),
+        "level": stream.get("level"),
+        "pix_fmt": stream.get("pix_fmt"),
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "sar": stream.get("sample_aspect_ratio"),
+        "time_base": stream.get("time_base"),
+        "extradata_hash": stream.get("extradata_hash"),
+        "fps": float(num) / float(den) if float(den) else 0.0,
+        "duration": float(data.get("format", {}).get("duration", 0.0)),
+    }
+
+# Stream properties every file joined with "-c copy" must share. The output's
+# avcC comes from the first file, so the parameter sets themselves must match.
+CONCAT_FIELDS = ("codec", "profile", "level", "pix_fmt", "width", "height", "sar", "time_base", "extradata_hash")
+
+def concat_compatible(infos):
+    """True if the probed files can be joined without re-encoding."""
+    first = infos[0]
+    return all(info[field] == first[field] for info in infos[1:] for field in CONCAT_FIELDS)
+
+def is_video_item(item):
+    """True for a clip entry ('video.mp4', start_time, end_time) of a media_list (same rule as build_media_clips)."""
+    return len(item) == 3 and isinstance(item[1], (int, float)) and isinstance(item[2], (int, float)) and item[2] > item[1]
+
+def is_conforming(info, size, fps=30):
+    """True if a probed clip is already in the intermediate format at this frame size and rate."""
+    return (
+        info["codec"] == INTERMEDIATE_CODEC
+        and info["pix_fmt"] == INTERMEDIATE_PIX_FMT
+        and (info["width"], info["height"]) == tuple(size)
+        and info["sar"] in (None, "0:1", "1:1")
+        and abs(info["fps"] - fps) < 0.01
+    )
+
+def copy_clip(path, output_path):
+    """Remux the video stream of a clip into an intermediate piece, without re-encoding."""
+    run_tool([
+        "ffmpeg", "-y", "-v", "error", "-i", path,
+        "-map", "0:v:0", "-c", "copy",
+        "-video_track_timescale", INTERMEDIATE_TIMESCALE,
+        "-movflags", "+faststart",
+        output_path
+    ])
+    return output_path
+
+def concat_segments(paths, output_path, profile='final'):
+    """
+    Join segments with ffmpeg's concat demuxer, without re-encoding.
+
+    The files are probed first: if they differ in any of CONCAT_FIELDS (e.g. a
+    cached piece encoded with other settings), a stream copy would produce a
+    broken file, so the joined video is re-encoded with profile instead.
+
+    Args:
+        paths: Segment files, in timeline order
+        output_path: Path of the joined video (video stream only)
+        profile: Encoder profile used when the files cannot be stream-copied
+    """
+    infos = [probe_media(path) for path in dict.fromkeys(paths)]
+    if concat_compatible(infos):
+        codec_args = ["-c", "copy"]
+    else:
+        print("⚠️  Segments differ in their encoding parameters, re-encoding instead of stream copy")
+        codec_args = [*ffmpeg_video_args(profile), "-pix_fmt", INTERMEDIATE_PIX_FMT,
+                      "-video_track_timescale", INTERMEDIATE_TIMESCALE]
+
+    list_fd, list_path = tempfile.mkstemp(suffix=".txt", dir=os.path.dirname(output_path) or ".")
+    try:
+        with os.fdopen(list_fd, "w") as f:
+            for path in paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        run_tool([
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-map", "0:v", *codec_args,
+            "-movflags", "+faststart",
+            output_path
+        ])
+    finally:
+        os.remove(list_path)
+    return output_path
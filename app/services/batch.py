@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.services.pipeline import run_video_pipeline, RUNNING, DONE, FAILED
+from app.utils import JobWorkspace
+
+DEFAULT_BG_MUSIC = "public/audios/bgMusic.mp3"
+
+# Stages not listed run without a batch-wide limit
+DEFAULT_STAGE_LIMITS = {"voice": 2, "media": 2, "assemble": 1}
+
+JOB_DEFAULTS = {
+    "orientation": "portrait",
+    "voice": "Kore",
+    "music": DEFAULT_BG_MUSIC,
+    "bg_volume": 0.08,
+}
+
+_JOB_ID_RE = re.compile(r"[A-Za-z0-9_.-]+")
+
+def job_id_for(job):
+    """Stable id of a job without an explicit "id": a hash of its settings."""
+    settings = {k: job[k] for k in ("prompt", *JOB_DEFAULTS)}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def load_jobs(path):
+    """
+    Read batch jobs from a JSONL file, one JSON object per line:
+
+        {"id": "promo-1", "prompt": "...", "orientation": "landscape",
+         "voice": "Puck", "music": "public/audios/calm.mp3", "bg_volume": 0.1}
+
+    Only "prompt" is required; see JOB_DEFAULTS for the rest ("music": null
+    disables background music, "fresh": true skips the plan cache). Jobs
+    without an "id" get one from job_id_for. Blank lines are skipped.
+
+    Returns:
+        List of job dicts with every field filled in
+
+    Raises:
+        ValueError: On invalid JSON, a missing prompt, a bad or duplicate id
+    """
+    jobs = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e})") from e
+            if not isinstance(entry, dict) or not entry.get("prompt"):
+                raise ValueError(f"{path}:{line_no}: every job needs a \"prompt\"")
+
+            job = {**JOB_DEFAULTS, **entry}
+            job["id"] = str(job.get("id") or job_id_for(job))
+            if not _JOB_ID_RE.fullmatch(job["id"]):
+                raise ValueError(f"{path}:{line_no}: job id {job['id']!r} may only use letters, digits, '_', '.' and '-'")
+            if job["id"] in seen:
+                raise ValueError(f"{path}:{line_no}: duplicate job id {job['id']!r}")
+            seen.add(job["id"])
+            jobs.append(job)
+    return jobs
+
+def load_results(path):
+    """
+    Latest result record per job id from a results JSONL file (empty if the
+    file does not exist). A truncated last line, left by a crash mid-write, is
+    ignored.
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and "id" in record:
+                results[record["id"]] = record
+    return results
+
+def is_finished(record):
+    """True if a result record is a finished job whose video still exists."""
+    return record.get("status") == DONE and os.path.exists(record.get("output") or "")
+
+class ResultsWriter:
+    """Appends result records to a JSONL file, one fsync'd line per record. Thread-safe."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Make sure a partial line from an earlier crash does not swallow the next record
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+            if needs_newline:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n")
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+def make_stage_limits(limits):
+    """Turn {stage name: max concurrent runs} into the semaphores run_video_pipeline takes."""
+    return {name: threading.BoundedSemaphore(max(1, int(n))) for name, n in limits.items()}
+
+def run_job(job, stage_limits=None, publish_dir="public/outputs", profile='final', on_update=None):
+    """
+    Render one batch job and return its result record:
+
+        {"id", "status": "done" | "failed", "output", "error",
+         "started_at", "finished_at", "elapsed_s", "stages": {stage: seconds}}
+
+    Stage times are wall-clock, including time spent waiting for a stage slot.
+    The job runs in a JobWorkspace named after its id, so the video is
+    published as <publish_dir>/<id>.mp4.
+    """
+    stage_started = {}
+    stage_times = {}
+
+    def track(stage, state, states):
+        now = time.monotonic()
+        if state == RUNNING:
+            stage_started[stage.name] = now
+        elif state in (DONE, FAILED) and stage.name in stage_started:
+            stage_times[stage.name] = round(now - stage_started[stage.name], 2)
+        if on_update:
+            on_update(job, stage, state, states)
+
+    record = {"id": job["id"], "prompt": job["prompt"], "status": None, "output": None, "error": None}
+    started = time.monotonic()
+    record["started_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    try:
+        record["output"] = run_video_pipeline(
+            job["prompt"],
+            orientation=job["orientation"],
+            bg_music_path=job["music"],
+            bg_volume=job["bg_volume"],
+            on_update=track,
+            workspace=JobWorkspace(job_id=job["id"]),
+            publish_dir=publish_dir,
+            profile=profile,
+            voice_name=job["voice"],
+            stage_limits=stage_limits,
+            plan_cache=not job.get("fresh", False),
+        )
+        record["status"] = DONE
+    except Exception as e:
+        record["status"] = FAILED
+        record["error"] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    record["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    record["elapsed_s"] = round(time.monotonic() - started, 2)
+    record["stages"] = stage_times
+    return record
+
+def run_batch(
+    jobs_path,
+    results_path=None,
+    workers=2,
+    stage_limits=None,
+    publish_dir="public/outputs",
+    profile='final',
+    retry_failed=True,
+    on_update=None,
+):
+    """
+    Renders every job of a JSONL file (see load_jobs) with a pool of workers and
+    appends one result record per job to results_path (see run_job).
+
+    The batch is resumable: jobs whose latest record is "done" and whose video
+    still exists are skipped, so after a crash or Ctrl-C the same command picks
+    up where it stopped. Failed jobs are run again unless retry_failed=False.
+
+    Concurrency is bounded three ways: workers jobs run at once (and never more
+    than MAX_CONCURRENT_JOBS, see JobWorkspace), and across those jobs each stage
+    named in stage_limits runs at most that many times at once, e.g. one render
+    at a time while other jobs generate media.
+
+    Args:
+        jobs_path: JSONL file with the jobs
+        results_path: JSONL file the results are appended to (default: <jobs_path stem>.results.jsonl)
+        workers: Number of jobs processed concurrently
+        stage_limits: Dict stage name -> max concurrent runs (default: DEFAULT_STAGE_LIMITS)
+        publish_dir: Directory the videos are published to
+        profile: Encoder profile of the final renders
+        retry_failed: Run jobs again whose latest record is "failed"
+        on_update: Optional callback on_update(job, stage, state, states), called from worker threads
+
+    Returns:
+        List of the result records written by this run
+    """
+    if results_path is None:
+        results_path = os.path.splitext(jobs_path)[0] + ".results.jsonl"
+
+    jobs = load_jobs(jobs_path)
+    previous = load_results(results_path)
+    pending = []
+    for job in jobs:
+        record = previous.get(job["id"])
+        if record is not None and (is_finished(record) or (record.get("status") == FAILED and not retry_failed)):
+            continue
+        pending.append(job)
+
+    print(f"Batch: {len(jobs)} jobs, {len(jobs) - len(pending)} already finished, {len(pending)} to run")
+    if not pending:
+        return []
+
+    limits = make_stage_limits(DEFAULT_STAGE_LIMITS if stage_limits is None else stage_limits)
+    writer = ResultsWriter(results_path)
+    written = []
+
+    def record_result(future):
+        record = future.result()
+        writer.write(record)
+        written.append(record)
+        mark = "✓" if record["status"] == DONE else "✗"
+        print(f"{mark} [{len(written)}/{len(pending)}] {record['id']} {record['status']} "
+              f"in {record['elapsed_s']:.0f}s {record['output'] or record['error']}")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch") as pool:
+        futures = [pool.submit(run_job, job, limits, publish_dir, profile, on_update) for job in pending]
+        done = set()
+        try:
+            for future in as_completed(futures):
+                done.add(future)
+                record_result(future)
+        except KeyboardInterrupt:
+            print("Interrupted: finishing the running jobs, queued jobs are left for the next run...")
+            for future in futures:
+                future.cancel()
+            for future in futures:
+                if future not in done and not future.cancelled():
+                    record_result(future)
+            raise
+
+    failed = sum(1 for r in written if r["status"] != DONE)
+    print(f"Batch finished: {len(written) - failed} done, {failed} failed. Results in {results_path}")
+    return written
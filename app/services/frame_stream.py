@@ -0,0 +1,321 @@
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import numpy as np
+from PIL import Image
+from app.services.apply_pan_effect import PanZoomRenderer
+from app.services.add_multiple_texts import CaptionTrack, scale_caption_style
+from app.services.assemble_media import INTERMEDIATE_PIX_FMT, is_video_item
+from app.services.concatenate_media import get_target_size
+from app.utils import ffmpeg_video_args, ffmpeg_audio_args, span
+
+# MoviePy's default audio rate, used for the muxed soundtrack
+AUDIO_SAMPLE_RATE = 44100
+
+# Frames in flight between the renderer and the encoder
+RING_SIZE = 4
+
+def item_duration(item):
+    """Duration in seconds of a media_list entry."""
+    if is_video_item(item):
+        return item[2] - item[1]
+    return item[1]
+
+def segment_frames(item, fps=30):
+    """Number of frames MoviePy writes for a media_list entry."""
+    return int(np.ceil(item_duration(item) * fps - 1e-6))
+
+def soundtrack_args(first_input, audio_path, bg_music_path=None, bg_volume=0.08):
+    """
+    ffmpeg input and filter arguments mixing the narration (padded with silence)
+    and optional looped background music into the [a] output. Inputs are
+    converted to stereo the way MoviePy reads them, so the mix matches
+    render_final_video.
+
+    Args:
+        first_input: ffmpeg input index the narration will get
+    """
+    inputs = ["-i", audio_path]
+    voice = f"[{first_input}:a]aformat=channel_layouts=stereo"
+    if bg_music_path:
+        inputs += ["-stream_loop", "-1", "-i", bg_music_path]
+        audio_filter = (
+            f"{voice},apad[voice];"
+            f"[{first_input + 1}:a]aformat=channel_layouts=stereo,volume={bg_volume}[bg];"
+            "[voice][bg]amix=inputs=2:duration=first:normalize=0[a]"
+        )
+    else:
+        audio_filter = f"{voice},apad[a]"
+    return inputs, ["-filter_complex", audio_filter, "-map", "0:v", "-map", "[a]"]
+
+def _ffmpeg_error(stderr_file, what):
+    stderr_file.seek(0)
+    message = stderr_file.read().decode("utf-8", "replace").strip()
+    return RuntimeError(f"{what} failed:\n{message}")
+
+class FrameEncoder:
+    """
+    One ffmpeg process encoding raw RGB frames written to its stdin, optionally
+    muxed with the narration/background music soundtrack (see soundtrack_args)
+    in the same pass. No intermediate files.
+
+    Usage:
+        with FrameEncoder("out.mp4", (1080, 1920), audio_path="a.wav") as encoder:
+            for frame in frames:
+                encoder.write(frame)
+
+    Args:
+        output_path: Path of the encoded video
+        size: (width, height) of the frames
+        fps: Frame rate
+        profile: Encoder profile name or dict (see ENCODER_PROFILES)
+        audio_path: Optional narration; without it the output has no audio
+        bg_music_path: Optional background music, looped
+        bg_volume: Volume multiplier for background music
+        duration: Length of the output in seconds (cuts the padded soundtrack)
+        extra_args: More output arguments (e.g. -video_track_timescale)
+    """
+
+    def __init__(self, output_path, size, fps=30, profile='final', audio_path=None, bg_music_path=None,
+                 bg_volume=0.08, duration=None, extra_args=()):
+        width, height = size
+        self.frame_bytes = width * height * 3
+        self.output_path = output_path
+
+        cmd = [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "pipe:0",
+        ]
+        if audio_path:
+            inputs, mapping = soundtrack_args(1, audio_path, bg_music_path, bg_volume)
+            cmd += [*inputs, *mapping, *ffmpeg_audio_args(profile), "-ar", str(AUDIO_SAMPLE_RATE)]
+        else:
+            cmd += ["-an"]
+        # Declare the square pixels: raw frames carry no aspect ratio, and pieces
+        # must match conforming clips to be joined with them (see copyable_clip)
+        cmd += ["-vf", "setsar=1", *ffmpeg_video_args(profile), "-pix_fmt", INTERMEDIATE_PIX_FMT]
+        if duration is not None:
+            cmd += ["-t", f"{duration:.6f}"]
+        cmd += [*extra_args, "-movflags", "+faststart", output_path]
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def write(self, frame):
+        """Encode one contiguous uint8 HxWx3 frame."""
+        try:
+            self.process.stdin.write(memoryview(frame).cast("B"))
+        except (BrokenPipeError, ValueError):
+            self.process.wait()
+            raise _ffmpeg_error(self._stderr, "ffmpeg encoder")
+
+    def close(self):
+        """Finish the file. Raises RuntimeError if ffmpeg failed."""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.process.wait()
+        try:
+            if returncode != 0:
+                raise _ffmpeg_error(self._stderr, "ffmpeg encoder")
+        finally:
+            self._stderr.close()
+
+    def abort(self):
+        self.process.kill()
+        self.process.wait()
+        self._stderr.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+def load_image(path):
+    """Decode an image as float32 RGB; transparent areas end up black, as with ImageClip."""
+    with Image.open(path) as img:
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            rgba = np.asarray(img.convert("RGBA"), dtype=np.float32)
+            return rgba[..., :3] * (rgba[..., 3:] / 255)
+        return np.asarray(img.convert("RGB"), dtype=np.float32)
+
+class ImageFrames:
+    """Pan/zoom frames of an image entry ('image.png', duration, direction, intensity)."""
+
+    def __init__(self, item, size, fps=30):
+        direction = item[2] if len(item) > 2 else None
+        intensity = item[3] if len(item) > 3 else 1.15
+        if not direction:
+            # Static image: cover the frame, centered
+            intensity = 1.0
+        self.renderer = PanZoomRenderer(load_image(item[0]), *size, item[1], fps, direction, intensity)
+
+    def read_into(self, index, out):
+        self.renderer.render(min(index, self.renderer.n_frames - 1), out)
+
+    def close(self):
+        pass
+
+class VideoFrames:
+    """
+    Frames of a clip entry ('video.mp4', start, end), decoded by ffmpeg into
+    raw RGB, scaled to cover the frame and center-cropped like resize_and_center.
+    The last frame is repeated if the clip runs short.
+    """
+
+    def __init__(self, item, size, fps=30):
+        path, start, end = item
+        width, height = size
+        self.frame_bytes = width * height * 3
+        cmd = [
+            "ffmpeg", "-v", "error", "-ss", f"{start:.6f}", "-t", f"{end - start:.6f}", "-i", path,
+            "-an", "-vf", (
+                f"scale={width}:{height}:force_original_aspect_ratio=increase,"
+                f"crop={width}:{height},fps={fps},tpad=stop_mode=clone:stop_duration=1"
+            ),
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1",
+        ]
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=self._stderr)
+
+    def read_into(self, index, out):
+        view = memoryview(out).cast("B")
+        filled = 0
+        while filled < self.frame_bytes:
+            n = self.process.stdout.readinto(view[filled:])
+            if not n:
+                self.process.wait()
+                raise _ffmpeg_error(self._stderr, f"Decoding frame {index} of the clip")
+            filled += n
+
+    def close(self):
+        self.process.stdout.close()
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self._stderr.close()
+
+def open_frames(item, size, fps=30):
+    """Frame source of a media_list entry."""
+    if is_video_item(item):
+        return VideoFrames(item, size, fps)
+    return ImageFrames(item, size, fps)
+
+def stream_timeline(media_list, texts, encoder, size, fps=30, ring_size=RING_SIZE, text_options=None):
+    """
+    Render the timeline frame by frame into encoder.
+
+    Frames are produced into a ring of ring_size preallocated buffers: every
+    source writes straight into a free buffer, captions are blended into it in
+    place, and a writer thread hands it to the encoder while the next frame is
+    rendered. Memory stays at ring_size frames plus the sources' own buffers,
+    whatever the length of the timeline.
+
+    Args:
+        text_options: Caption styling passed to CaptionTrack (a dict, since it
+                      may hold a 'size' of its own: the caption box)
+
+    Returns:
+        Number of frames written
+    """
+    width, height = size
+    captions = CaptionTrack(texts, frame_size=size, fps=fps, **(text_options or {})) if texts else None
+
+    free = queue.Queue()
+    for _ in range(ring_size):
+        free.put(np.empty((height, width, 3), np.uint8))
+    ready = queue.Queue()
+    errors = []
+
+    def write_frames():
+        while True:
+            frame = ready.get()
+            if frame is None:
+                return
+            if not errors:
+                try:
+                    encoder.write(frame)
+                except Exception as e:
+                    errors.append(e)
+            free.put(frame)  # keep recycling after an error so the renderer never blocks
+
+    writer = threading.Thread(target=write_frames, name="frame-writer", daemon=True)
+    writer.start()
+
+    frame_number = 0
+    try:
+        for item in media_list:
+            n_frames = segment_frames(item, fps)
+            with span("frames", "render", media=os.path.basename(item[0]), frames=n_frames):
+                source = open_frames(item, size, fps)
+                try:
+                    for index in range(n_frames):
+                        frame = free.get()
+                        if errors:
+                            raise errors[0]
+                        source.read_into(index, frame)
+                        if captions is not None:
+                            captions.blend(frame, frame_number / fps)
+                        ready.put(frame)
+                        frame_number += 1
+                finally:
+                    source.close()
+    finally:
+        ready.put(None)
+        writer.join()
+    if errors:
+        raise errors[0]
+    return frame_number
+
+def render_final_video_streaming(
+    media_list,
+    texts,
+    audio_path,
+    output_path="public/outputs/final_output.mp4",
+    bg_music_path=None,
+    bg_volume=0.08,
+    orientation='portrait',
+    workspace=None,
+    profile='final',
+    scale=1.0,
+    fps=30,
+    **text_options,
+):
+    """
+    Renders the same video as render_final_video without MoviePy on the frame path.
+
+    Clips are decoded by ffmpeg straight into frame buffers, images are panned
+    by PanZoomRenderer, captions are blended in place (stream_timeline), and the
+    raw frames go to a single ffmpeg process that also mixes and encodes the
+    narration and background music.
+
+    Args:
+        Same as render_final_video
+
+    Returns:
+        Path to the rendered video
+    """
+    if workspace is not None:
+        output_path = workspace.output_path(os.path.basename(output_path))
+
+    size = get_target_size(orientation, scale)
+    text_options = scale_caption_style(text_options, scale)
+    duration = sum(segment_frames(item, fps) for item in media_list) / fps
+    if bg_music_path and not os.path.exists(bg_music_path):
+        bg_music_path = None
+
+    with span("render_streaming", "render", size=f"{size[0]}x{size[1]}", fps=fps):
+        with FrameEncoder(output_path, size, fps, profile, audio_path, bg_music_path, bg_volume, duration) as encoder:
+            stream_timeline(media_list, texts, encoder, size, fps, text_options=text_options)
+
+    print(f"Video saved as {output_path}")
+    return output_path
@@ -1,22 +1,30 @@
-from google import genai
-from google.genai import types
 import os
 from dotenv import load_dotenv
+from app.utils import atomic_path, get_asset_cache, get_gemini_manager, annotate
 
 load_dotenv()
 
-api_key = os.getenv("GEMINI_API_KEY")
+IMAGE_MODEL = "gemini-2.5-flash-image"
 
-client = genai.Client(api_key=api_key)
-    
-def generate_image_from_prompt(prompt, segment_number, output_dir="public/media"):
+def generate_image_from_prompt(prompt, segment_number, output_dir="public/media", workspace=None):
+    if workspace is not None:
+        output_dir = workspace.media_dir
 
     print(f"\n{'='*80}")
     print(f"Generating IMAGE for Segment {segment_number}")
     print(f"{'='*80}")
     print(f"Prompt: {prompt[:100]}...")
     
+    filepath = os.path.join(output_dir, f"{segment_number}.png")
+    cache = get_asset_cache()
+    cache_key = cache.make_key(IMAGE_MODEL, prompt)
+    if cache.fetch(cache_key, filepath):
+        annotate(cached=True)
+        return filepath
+    
     try:
+        from google.genai import types  # imported on first use, it is slow to load
+
         # response = client.models.generate_images(
         #     model='gemini-2.5-flash-image',
         #     prompt=prompt,
@@ -24,8 +32,8 @@ def generate_image_from_prompt(prompt, segment_number, output_dir="public/media"
         #         number_of_images=1, 
         #     )
         # )
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-image",
+        response = get_gemini_manager().generate_content(
+            model=IMAGE_MODEL,
             contents=prompt,  # Or [prompt] if passing as a list
             config=types.GenerateContentConfig(
                 response_modalities=['Image'],
@@ -53,11 +61,10 @@ def generate_image_from_prompt(prompt, segment_number, output_dir="public/media"
                 # Convert inline data to PIL Image
                 generated_image = part.as_image()
                 
-                filename = f"{segment_number}.png"
-                filepath = os.path.join(output_dir, filename)
-                
                 # Save the image
-                generated_image.save(filepath)
+                with atomic_path(filepath) as tmp_path:
+                    generated_image.save(tmp_path)
+                cache.put(cache_key, filepath)
                 print(f"✓ Image saved: {filepath}")
                 
                 image_saved = True
@@ -67,6 +74,8 @@ def generate_image_from_prompt(prompt, segment_number, output_dir="public/media"
         
         if not image_saved:
             raise ValueError("No image generated in response.")
+
+        return filepath
             
     except Exception as e:
         print(f"✗ Error generating image: {str(e)}")
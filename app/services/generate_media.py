@@ -1,18 +1,151 @@
-from google import genai
+import asyncio
+import contextvars
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
 from dotenv import load_dotenv
 from app.services.generate_image import generate_image_from_prompt
-from app.services.generate_video import generate_video_from_prompt
+from app.services.generate_video import generate_video_async
+from app.services.kie_client import get_kie_client, run_coroutine
+from app.utils import span
 
 load_dotenv()
 
-api_key = os.getenv("GEMINI_API_KEY")
+# Max number of jobs in flight per provider
+PROVIDER_LIMITS = {
+    "image": int(os.getenv("IMAGE_CONCURRENCY", "4")),  # Gemini image generation
+    "video": int(os.getenv("VIDEO_CONCURRENCY", "4")),  # Kie.ai Runway
+}
 
-client = genai.Client(api_key=api_key)
+class MediaGenerator:
+    """
+    Runs image and video generation jobs concurrently.
+
+    All segments are submitted at once and each provider only sees as many
+    requests in flight as its limit allows. Images run on a bounded thread pool;
+    videos are coroutines on the shared Kie.ai event loop (one pooled HTTP client),
+    bounded by a semaphore. Results are returned ordered by segment_number regardless of the order
+    in which the jobs finish.
+
+    shutdown(cancel_futures=True) abandons the jobs: the ones not started yet
+    never run, and with wait=True it returns once the running ones are over,
+    so nothing writes to output_dir afterwards.
+
+    Usage:
+        with MediaGenerator(output_dir) as generator:
+            for segment in segments:
+                generator.submit(segment)
+            results = generator.results()
+    """
+
+    def __init__(self, output_dir="public/media", provider_limits=None, workspace=None):
+        if workspace is not None:
+            output_dir = workspace.media_dir
+        self.output_dir = output_dir
+        limits = {**PROVIDER_LIMITS, **(provider_limits or {})}
+        self._pools = {
+            media_type: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"{media_type}-gen")
+            for media_type, limit in limits.items()
+            if media_type != 'video'
+        }
+        self._video_slots = asyncio.Semaphore(limits['video'])
+        self._jobs = []
+
+    def submit(self, segment):
+        """Queue generation of a single segment and return its future."""
+        segment_num = f"{segment['segment_number']}"
+        media_type = segment['type']
+        duration = segment['duration_seconds']
+        prompt = segment['prompt']
+
+        if media_type == 'image':
+            future = self._pools['image'].submit(
+                contextvars.copy_context().run,  # keeps the job's trace
+                self._generate_image,
+                prompt=prompt,
+                segment_number=segment_num,
+                output_dir=self.output_dir
+            )
+        elif media_type == 'video':
+            future = run_coroutine(self._generate_video(
+                prompt=prompt,
+                segment_number=segment_num,
+                duration_seconds=duration,
+                output_dir=self.output_dir
+            ))
+        else:
+            print(f"✗ Unknown media type: {media_type}")
+            future = None
+
+        self._jobs.append((segment, future))
+        return future
+
+    def _generate_image(self, **kwargs):
+        with span("generate_image", "media", segment=kwargs["segment_number"]):
+            return generate_image_from_prompt(**kwargs)
+
+    async def _generate_video(self, **kwargs):
+        with span("generate_video", "media", segment=kwargs["segment_number"]) as s:
+            waited = time.perf_counter()
+            async with self._video_slots:
+                s.set(slot_wait_s=round(time.perf_counter() - waited, 3))
+                return await generate_video_async(**kwargs)
 
-def generate_media_sequence(segments, output_dir="public/media"):
+    def results(self):
+        """
+        Wait for every submitted job and return one result dict per segment,
+        ordered by segment_number.
+        """
+        results = []
+        for segment, future in self._jobs:
+            try:
+                filepath = future.result() if future is not None else None
+            except Exception as e:
+                print(f"✗ Segment {segment['segment_number']} failed: {str(e)}")
+                filepath = None
+
+            results.append({
+                'segment_number': f"{segment['segment_number']}",
+                'type': segment['type'],
+                'duration_seconds': segment['duration_seconds'],
+                'filepath': filepath,
+                'status': 'success' if filepath else 'failed'
+            })
+
+        results.sort(key=lambda r: int(r['segment_number']))
+        return results
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """
+        Stop taking jobs. With cancel_futures=True, jobs that have not started
+        are cancelled (running video jobs are cancelled at their next await);
+        with wait=True, block until every job that did start has finished.
+        """
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+        # Video coroutines live on the shared event loop, not in a pool. A
+        # cancelled one only counts as done once its coroutine has unwound
+        futures = [future for segment, future in self._jobs if segment['type'] == 'video' and future is not None]
+        if cancel_futures:
+            for future in futures:
+                future.cancel()
+        if wait:
+            wait_futures(futures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.shutdown()
+        else:
+            self.shutdown(wait=False, cancel_futures=True)
+        return False
+
+def generate_media_sequence(segments, output_dir="public/media", provider_limits=None, workspace=None, generator=None):
     """
-    Generate all media (images and videos) from a list of segments
+    Generate all media (images and videos) from a list of segments.
+    All jobs are submitted at once and run concurrently (see MediaGenerator).
     
     Args:
         segments: List of segment dictionaries with keys:
@@ -21,81 +154,37 @@ def generate_media_sequence(segments, output_dir="public/media"):
                     - duration_seconds (int)
                     - prompt (str)
         output_dir: Directory to save all generated media
+        provider_limits: Optional overrides for PROVIDER_LIMITS, e.g. {"video": 2}
+        workspace: Optional JobWorkspace; overrides output_dir with its media directory
+        generator: Optional MediaGenerator the segments were already submitted to
+                   (e.g. as a streaming planner produced them); only its results
+                   are collected, and it is shut down afterwards
         
     Returns:
-        List of dictionaries with segment info and file paths
+        List of dictionaries with segment info and file paths, ordered by segment_number
     """
     print("\n" + "="*80)
     print("STARTING MEDIA GENERATION PIPELINE")
     print("="*80)
     print(f"Total segments to generate: {len(segments)}")
     
-    # # Create output directory with timestamp
-    # timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # output_dir = os.path.join(output_dir, f"sequence_{timestamp}")
-    
-    results = []
-    
     # Validate video count
     video_count = sum(1 for s in segments if s['type'] == 'video')
     print(f"\nVideo count: {video_count}")
     if not (2 <= video_count <= 4 and video_count % 2 == 0):
         print("⚠️  WARNING: Video count should be 2 or 4 (even number)")
     
-    # Generate each segment
-    a,b=["",0,""],[]
-    for segment in segments:
-        segment_num = f"{segment['segment_number']}"
-        media_type = segment['type']
-        duration = segment['duration_seconds']
-        prompt = segment['prompt']
-        if media_type == 'image':
-            filepath = generate_image_from_prompt(
-                prompt=prompt,
-                segment_number=segment_num,
-                output_dir=output_dir
-            )
-        if media_type == 'video':
-            filepath = generate_video_from_prompt(
-                prompt=prompt,
-                segment_number=segment_num,
-                duration_seconds=duration,
-                output_dir=output_dir
-            )
-            # if(a[0]==""):
-            #     a[0]+=segment_num
-            #     a[1]+=duration
-            #     a[2]+=prompt
-            # else:
-            #     b.append((a[0]+segment_num,a[1]+duration,a[2]+"\n\nthen after a transition (at exact 4 sec) generate   \n" + prompt))
-            #     a=["",0,""]
-        # else:
-        #     print(f"✗ Unknown media type: {media_type}")
-        #     filepath = None
-        
-        results.append({
-            'segment_number': segment_num,
-            'type': media_type,
-            'duration_seconds': duration,
-            'filepath': filepath,
-            'status': 'success' if filepath else 'failed'
-        })
-    # for segment in b:
-    #     segment_num = segment[0]
-    #     duration = segment[1]
-    #     prompt = segment[2]
-    #     filepath = generate_video_from_prompt(
-    #         prompt=prompt,
-    #         segment_number=segment_num,
-    #         duration_seconds=duration,
-    #         output_dir=output_dir
-    #     )
-    #     results.append({
-    #         'segment_number': segment_num,
-    #         'type': 'video',
-    #         'duration_seconds': duration,
-    #         'filepath': filepath,
-    #         'status': 'success' if filepath else 'failed'
-    #     })
+    if generator is not None:
+        with generator:
+            results = generator.results()
+    else:
+        with MediaGenerator(output_dir, provider_limits, workspace) as generator:
+            for segment in segments:
+                generator.submit(segment)
+            results = generator.results()
+
+    if video_count:
+        for label, usage in get_kie_client().key_stats().items():
+            print(f"Kie.ai key {label}: {usage}")
 
     return results
@@ -1,15 +1,24 @@
+import json
+import os
 import random
 
-def process_media_segments(visual_segments, script_segments):
+def process_media_segments(visual_segments, script_segments, media_dir="public/media", workspace=None, alignment=None):
     """
     Combines visual segments and script segments into the final lists for video generation.
-    Each video segment will use its own file named "<segment_number>.mp4" (no clubbing).
+    Each video segment will use its own file named "<segment_number>.mp4" (no clubbing),
+    looked up in media_dir (or the media directory of the given JobWorkspace).
+    alignment: Optional alignment table from generate_voice_from_segments (list or
+    path to the saved JSON). Captions then use the narration's measured start/end
+    times instead of the scripted ones.
     Returns:
         media_list: list of tuples for visuals
             - images: (filename, duration_seconds, 'zoom_in', zoom_amount)
             - videos: (filename, start_time, end_time)  # start_time=0, end_time=duration_seconds
         texts: list of tuples (script_text, start_time, end_time)
     """
+    if workspace is not None:
+        media_dir = workspace.media_dir
+
     media_list = []
     texts = []
 
@@ -21,13 +30,16 @@ def process_media_segments(visual_segments, script_segments):
 
         if s_type == "image":
             # Format: (Filename, Duration, Effect, Zoom_Amount)
-            filename = f"public/media/{s_num}.png"
-            zoom_amount = round(random.uniform(1.1, 1.5), 2)
+            filename = os.path.join(media_dir, f"{s_num}.png")
+            # Seeded by the segment, so re-running the same timeline gives the same
+            # zoom (and hits the segment render cache)
+            s_prompt = segment.get('prompt', '') if isinstance(segment, dict) else getattr(segment, 'prompt', '')
+            zoom_amount = round(random.Random(f"{s_num}:{s_prompt}").uniform(1.1, 1.5), 2)
             media_list.append((filename, s_duration, 'zoom_in', zoom_amount))
 
         elif s_type == "video":
             # Use a separate file per segment number (no clubbing)
-            filename = f"public/media/{s_num}.mp4"
+            filename = os.path.join(media_dir, f"{s_num}.mp4")
 
             # If the segment provides duration_seconds, use it as end; otherwise default to 4s
             # (you can change the default as needed)
@@ -37,11 +49,21 @@ def process_media_segments(visual_segments, script_segments):
             # Format: (Filename, Start_Time, End_Time)
             media_list.append((filename, 0, s_duration))
 
+    if isinstance(alignment, str):
+        with open(alignment) as f:
+            alignment = json.load(f)["segments"]
+    if alignment is not None and len(alignment) != len(script_segments):
+        print(f"⚠️  WARNING: alignment has {len(alignment)} entries for {len(script_segments)} script segments, ignoring it")
+        alignment = None
+
     # --- Build texts (Script/Overlay) ---
-    for item in script_segments:
+    for index, item in enumerate(script_segments):
         script_text = item['script'] if isinstance(item, dict) else item.script
         start_time = item['start_time'] if isinstance(item, dict) else item.start_time
         end_time = item['end_time'] if isinstance(item, dict) else item.end_time
+        if alignment is not None:
+            start_time = alignment[index]['start_time']
+            end_time = alignment[index]['end_time']
 
         # Remove all newlines and reformat with newline after every 6 words
         script_text = script_text.replace('\n', ' ')
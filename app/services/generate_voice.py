@@ -1,15 +1,19 @@
-from google import genai
-from google.genai import types
+import io
+import json
 import wave
 import os
-import subprocess
-import shutil
+import numpy as np
+import soundfile as sf
+from app.utils import get_asset_cache, get_gemini_manager, span, annotate
+
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+TTS_SAMPLE_RATE = 24000  # the API returns 16-bit mono PCM at 24kHz
 
 # ---------------------------
 # Utilities: save wav & transcript
 # ---------------------------
 
-def save_wav(filename, pcm, channels=1, rate=24000, sample_width=2):
+def save_wav(filename, pcm, channels=1, rate=TTS_SAMPLE_RATE, sample_width=2):
     """Save PCM data as WAV file (raw PCM bytes from API)."""
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
@@ -24,224 +28,373 @@ def build_transcript(segments):
     return " ".join(seg["script"] for seg in segments)
 
 # ---------------------------
-# FFmpeg helpers
+# In-memory audio helpers
 # ---------------------------
 
-def _ffprobe_duration(path):
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        path
-    ]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if p.returncode != 0:
-        raise RuntimeError(f"ffprobe failed for {path}: {p.stderr.strip()}")
-    return float(p.stdout.strip())
+def pcm_to_array(pcm, channels=1, sample_width=2):
+    """Raw little-endian PCM bytes (as returned by the TTS API) -> float32 samples in [-1, 1]."""
+    if sample_width != 2:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    return samples
 
-def _run(cmd):
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    return p.returncode, p.stdout, p.stderr
+def wav_bytes(pcm, channels=1, rate=TTS_SAMPLE_RATE, sample_width=2):
+    """Wrap raw PCM bytes in an in-memory WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return buffer.getvalue()
 
-# ---------------------------
-# New adjuster using ffmpeg (policy aware)
-# ---------------------------
+def fit_to_length(samples, n_samples):
+    """Trim or zero-pad samples (along the time axis) to exactly n_samples."""
+    if len(samples) >= n_samples:
+        return samples[:n_samples]
+    padding = [(0, n_samples - len(samples))] + [(0, 0)] * (samples.ndim - 1)
+    return np.pad(samples, padding)
 
-def adjust_audio_policy(input_file, output_file, target_duration,
-                        max_speed_for_stretch=2.0,
-                        allow_trim_when_too_fast=True):
-    """
-    Adjust audio to exact target_duration using ffmpeg.
-    - Keeps a temp WAV for the atempo chain
-    - Converts temp WAV to final codec (wav or mp3) with proper encoder args
-    Policy:
-      - If target_duration > original -> stretch (slow down) using atempo chain (net < 1)
-      - If target_duration < original and speed <= max_speed_for_stretch -> speed up via atempo chain
-      - If target_duration < original and speed > max_speed_for_stretch and allow_trim_when_too_fast -> trim instead
-    Returns final saved duration in seconds.
-    """
-    if not os.path.exists(input_file):
-        raise FileNotFoundError(f"Input file not found: {input_file}")
+def time_stretch(samples, speed):
+    """Play samples `speed` times faster (speed < 1 slows down) without changing pitch."""
+    if samples.ndim > 1:
+        return np.stack([time_stretch(channel, speed) for channel in samples.T], axis=1)
+    import librosa  # imported on first use, it is slow to load
+    return librosa.effects.time_stretch(samples, rate=speed)
 
-    # Determine final output encoder args
-    ext = os.path.splitext(output_file)[1].lower()
+def write_audio(path, samples, rate):
+    """Write samples to a .wav (16-bit PCM) or .mp3 file."""
+    ext = os.path.splitext(path)[1].lower()
     if ext == ".wav":
-        output_args = ["-acodec", "pcm_s16le"]
+        subtype = "PCM_16"
     elif ext == ".mp3":
-        output_args = ["-codec:a", "libmp3lame", "-b:a", "192k"]
+        subtype = "MPEG_LAYER_III"
     else:
         # allow other extensions but recommend .wav or .mp3
         raise ValueError(f"Unsupported output format: {ext}. Use .wav or .mp3")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sf.write(path, np.clip(samples, -1.0, 1.0), rate, subtype=subtype)
+
+# ---------------------------
+# Timing adjuster (policy aware)
+# ---------------------------
 
-    orig_dur = _ffprobe_duration(input_file)
+def policy_speed(orig_dur, target_duration, max_speed_for_stretch=2.0, allow_trim_when_too_fast=True):
+    """
+    Speed factor fit_audio_policy applies to reach target_duration
+    (1.0 when the audio is only trimmed or padded).
+    """
     print(f"Original duration: {orig_dur:.3f}s target: {target_duration:.3f}s")
 
-    # If already very close just copy
+    # If already very close just pad/trim the last few samples
     if abs(orig_dur - target_duration) < 0.01:
-        print("Duration within 10ms. Copying file.")
-        shutil.copy(input_file, output_file)
-        return orig_dur
+        print("Duration within 10ms. Keeping audio as is.")
+        return 1.0
 
     speed = orig_dur / target_duration
     print(f"Computed speed factor (orig/target) = {speed:.6f}")
 
-    # Decide net atempo factor (what ffmpeg atempo should implement)
-    if target_duration > orig_dur:
-        # need to slow down => net < 1
-        net = 1.0 / speed
-        print("Target longer than original -> will slow down (net atempo < 1)")
-    else:
-        if speed <= max_speed_for_stretch:
-            net = speed
-            print(f"Target shorter but within speed threshold ({max_speed_for_stretch}) -> speed up (net atempo)")
-        else:
-            # too big a speed change requested
-            print(f"Required speed {speed:.2f} exceeds max allowed {max_speed_for_stretch}")
-            if allow_trim_when_too_fast:
-                # Trim the original to requested duration (prefer naturalness over aggressive speeding)
-                print("Policy: trimming original file to the target duration (no aggressive speeding).")
-                cmd_trim = [
-                    "ffmpeg", "-y", "-i", input_file,
-                    "-t", f"{target_duration:.6f}"
-                ] + output_args + [output_file]
-                code, out, err = _run(cmd_trim)
-                if code != 0:
-                    raise RuntimeError(f"ffmpeg trim failed:\n{err}")
-                final = _ffprobe_duration(output_file)
-                print(f"Trimmed and saved {output_file} duration {final:.6f}s")
-                return final
-            else:
-                print("Policy: allow aggressive atempo chaining (may sound unnatural).")
-                net = speed
-
-    # Build atempo chain (ffmpeg atempo supports 0.5..2.0 per filter)
-    remaining = net
-    factors = []
-    while remaining > 2.0:
-        factors.append(2.0)
-        remaining /= 2.0
-    while remaining < 0.5:
-        factors.append(0.5)
-        remaining /= 0.5
-    factors.append(remaining)
-    factors = [max(0.5, min(2.0, float(f))) for f in factors]
-    filter_chain = ",".join(f"atempo={f:.6f}" for f in factors)
-    print("FFmpeg atempo filter chain:", filter_chain)
-
-    # run atempo into a temp PCM WAV (safe intermediate)
-    temp_output = output_file + ".tmp.wav"
-    ffmpeg_cmd = [
-        "ffmpeg", "-y",
-        "-i", input_file,
-        "-filter:a", filter_chain,
-        "-acodec", "pcm_s16le",
-        temp_output
+    if speed > max_speed_for_stretch:
+        # too big a speed change requested
+        print(f"Required speed {speed:.2f} exceeds max allowed {max_speed_for_stretch}")
+        if allow_trim_when_too_fast:
+            # Trim the original to requested duration (prefer naturalness over aggressive speeding)
+            print("Policy: trimming audio to the target duration (no aggressive speeding).")
+            return 1.0
+        print("Policy: allow aggressive speed up (may sound unnatural).")
+    return speed
+
+def fit_audio_policy(samples, rate, target_duration,
+                     max_speed_for_stretch=2.0,
+                     allow_trim_when_too_fast=True,
+                     speed=None):
+    """
+    Adjust audio samples to exactly target_duration, in memory.
+    Policy:
+      - If target_duration > original -> stretch (slow down)
+      - If target_duration < original and speed <= max_speed_for_stretch -> speed up
+      - If target_duration < original and speed > max_speed_for_stretch and allow_trim_when_too_fast -> trim instead
+    Any small difference left after stretching is trimmed or padded with silence.
+    speed skips the policy when the caller already has it from policy_speed.
+    Returns the adjusted samples.
+    """
+    n_target = int(round(target_duration * rate))
+    if speed is None:
+        speed = policy_speed(len(samples) / rate, target_duration, max_speed_for_stretch, allow_trim_when_too_fast)
+    if speed == 1.0:
+        return fit_to_length(samples, n_target)
+
+    stretched = time_stretch(samples, speed)
+    print(f"After time stretch duration: {len(stretched) / rate:.6f}s")
+    return fit_to_length(stretched, n_target)
+
+def adjust_audio_policy(input_file, output_file, target_duration,
+                        max_speed_for_stretch=2.0,
+                        allow_trim_when_too_fast=True):
+    """
+    Adjust an audio file to exact target_duration (see fit_audio_policy) and
+    save it as .wav or .mp3. Returns final saved duration in seconds.
+    """
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file not found: {input_file}")
+
+    samples, rate = sf.read(input_file, dtype="float32")
+    samples = fit_audio_policy(samples, rate, target_duration, max_speed_for_stretch, allow_trim_when_too_fast)
+    write_audio(output_file, samples, rate)
+    return len(samples) / rate
+
+# ---------------------------
+# Per-segment alignment
+# ---------------------------
+
+def find_pauses(samples, rate, silence_db=-35.0, min_pause=0.15, frame=0.02, hop=0.01):
+    """
+    Energy-based silence detection.
+
+    Returns:
+        (pauses, speech_start, speech_end): pauses is a list of (start, end) of
+        the silent stretches of at least min_pause seconds between the first
+        and the last frame louder than silence_db (relative to the loudest frame)
+    """
+    mono = samples if samples.ndim == 1 else samples.mean(axis=1)
+    frame_len, hop_len = int(rate * frame), int(rate * hop)
+    if len(mono) < frame_len:
+        return [], 0.0, len(mono) / rate
+    frames = np.lib.stride_tricks.sliding_window_view(mono, frame_len)[::hop_len]
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    db = 20 * np.log10(np.maximum(rms, 1e-10) / max(rms.max(), 1e-10))
+
+    voiced = np.flatnonzero(db >= silence_db)
+    if len(voiced) == 0:
+        return [], 0.0, len(mono) / rate
+    first, last = voiced[0], voiced[-1]
+
+    silent = np.concatenate([[0], (db[first:last + 1] < silence_db).astype(np.int8), [0]])
+    edges = np.diff(silent)
+    pauses = [
+        ((first + start) * hop_len / rate, (first + end) * hop_len / rate)
+        for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+        if (end - start) * hop_len / rate >= min_pause
     ]
-    code, out, err = _run(ffmpeg_cmd)
-    if code != 0:
-        raise RuntimeError(f"ffmpeg atempo failed:\n{err}")
-
-    new_dur = _ffprobe_duration(temp_output)
-    print(f"After atempo chain duration: {new_dur:.6f}s")
-
-    # If close to target just convert temp -> final codec
-    if abs(new_dur - target_duration) < 0.01:
-        conv_cmd = ["ffmpeg", "-y", "-i", temp_output] + output_args + [output_file]
-        code, out, err = _run(conv_cmd)
-        if code != 0:
-            raise RuntimeError(f"ffmpeg conversion failed:\n{err}")
-        if os.path.exists(temp_output):
-            os.remove(temp_output)
-        return target_duration
-
-    # If temp is longer than target trim it and encode to final codec
-    if new_dur > target_duration:
-        cmd_trim = [
-            "ffmpeg", "-y", "-i", temp_output,
-            "-t", f"{target_duration:.6f}"
-        ] + output_args + [output_file]
-        code, out, err = _run(cmd_trim)
-        if code != 0:
-            raise RuntimeError(f"ffmpeg trim failed:\n{err}")
-    else:
-        # temp shorter -> pad with silence then cut to exact duration then encode
-        pad_amount = target_duration - new_dur
-        cmd_pad = [
-            "ffmpeg", "-y", "-i", temp_output,
-            "-af", f"apad=pad_dur={pad_amount:.6f}",
-            "-t", f"{target_duration:.6f}"
-        ] + output_args + [output_file]
-        code, out, err = _run(cmd_pad)
-        if code != 0:
-            raise RuntimeError(f"ffmpeg pad failed:\n{err}")
-
-    # cleanup
-    if os.path.exists(temp_output):
-        os.remove(temp_output)
-
-    final_dur = _ffprobe_duration(output_file)
-    print("Final saved duration:", final_dur)
-    return final_dur
+    return pauses, first * hop_len / rate, (last * hop_len + frame_len) / rate
+
+def find_segment_boundaries(samples, rate, segments, silence_db=-35.0, min_pause=0.15):
+    """
+    Estimate where each script line starts and ends in the TTS audio.
+
+    Lines are expected to take a share of the speech proportional to their
+    length. Each boundary between two lines is snapped to a detected pause,
+    picked by dynamic programming so that the boundaries stay in order, sit
+    close to where they are expected and prefer long pauses. A boundary with
+    no suitable pause falls back to its expected position.
+
+    Returns:
+        List of len(segments) + 1 cut times in seconds, from 0 to the audio duration
+    """
+    duration = len(samples) / rate
+    n_cuts = len(segments) - 1
+    if n_cuts <= 0:
+        return [0.0, duration]
+
+    pauses, speech_start, speech_end = find_pauses(samples, rate, silence_db, min_pause)
+    weights = np.array([max(len(seg["script"].strip()), 1) for seg in segments], dtype=np.float64)
+    expected = speech_start + (speech_end - speech_start) * np.cumsum(weights)[:-1] / weights.sum()
+
+    # Candidates: pause midpoints (bonus for long pauses), or the expected
+    # positions themselves (penalized) so that a solution always exists
+    candidates = [((start + end) / 2, min(end - start, 1.0)) for start, end in pauses]
+    candidates += [(t, -0.5) for t in expected]
+    candidates.sort()
+    times = np.array([t for t, _ in candidates])
+    bonus = np.array([b for _, b in candidates])
+
+    # cost[k, j]: best total cost of boundaries 0..k with boundary k at candidate j
+    n = len(candidates)
+    cost = np.full((n_cuts, n), np.inf)
+    previous = np.zeros((n_cuts, n), dtype=np.intp)
+    cost[0] = np.abs(times - expected[0]) - bonus
+    for k in range(1, n_cuts):
+        best, best_index = np.inf, 0
+        for j in range(n):
+            # boundary k-1 must use an earlier candidate (strictly increasing times)
+            if j > 0 and cost[k - 1, j - 1] < best and times[j - 1] < times[j]:
+                best, best_index = cost[k - 1, j - 1], j - 1
+            cost[k, j] = best + abs(times[j] - expected[k]) - bonus[j]
+            previous[k, j] = best_index
+
+    j = int(np.argmin(cost[-1]))
+    cuts = []
+    for k in range(n_cuts - 1, -1, -1):
+        cuts.append(float(times[j]))
+        j = previous[k, j]
+    return [0.0] + cuts[::-1] + [duration]
+
+def align_segments(samples, rate, segments, mode="segments", min_speed=0.75, **policy):
+    """
+    Fit the narration to the segment timings.
+
+    Modes:
+      - "global": one stretch of the whole waveform to segments[-1]["end_time"]
+        (fit_audio_policy); the table reports where each line ended up
+      - "segments": every line is cut at its detected boundaries and fit into
+        its own start_time/end_time window, with silence in any gaps. Lines are
+        slowed down to at most min_speed; the rest of a longer window is silence.
+        The table's end_time is where the line's speech ends, so captions do
+        not linger over the trailing silence
+
+    Returns:
+        (samples, alignment): alignment has one entry per segment with the
+        output start_time/end_time of the line, its source_start/source_end in
+        the TTS audio and the speed applied
+    """
+    cuts = find_segment_boundaries(samples, rate, segments)
+    target_duration = segments[-1]["end_time"]
+
+    if mode == "global":
+        speed = policy_speed(len(samples) / rate, target_duration, **policy)
+        adjusted = fit_audio_policy(samples, rate, target_duration, speed=speed)
+        alignment = [
+            {
+                "script": seg["script"],
+                "start_time": round(min(cuts[i] / speed, target_duration), 3),
+                "end_time": round(min(cuts[i + 1] / speed, target_duration), 3),
+                "source_start": round(cuts[i], 3),
+                "source_end": round(cuts[i + 1], 3),
+                "speed": round(speed, 4),
+            }
+            for i, seg in enumerate(segments)
+        ]
+        return adjusted, alignment
+
+    if mode != "segments":
+        raise ValueError(f"Unknown alignment mode: {mode}. Use 'global' or 'segments'")
+
+    pieces, alignment = [], []
+    cursor = 0  # output position in samples
+    for i, seg in enumerate(segments):
+        window_start = int(round(seg["start_time"] * rate))
+        window_end = int(round(seg["end_time"] * rate))
+        if window_start > cursor:
+            pieces.append(np.zeros((window_start - cursor,) + samples.shape[1:], dtype=samples.dtype))
+            cursor = window_start
+
+        chunk = samples[int(round(cuts[i] * rate)):int(round(cuts[i + 1] * rate))]
+        n_window = max(window_end - cursor, 1)
+        n_fit = n_window if len(chunk) >= min_speed * n_window else int(len(chunk) / min_speed)
+        fitted = fit_to_length(fit_audio_policy(chunk, rate, n_fit / rate, **policy), n_window)
+        pieces.append(fitted)
+        # The line ends where its speech ends, not at the window boundary
+        _, _, speech_end = find_pauses(chunk, rate)
+        n_speech = min(int(round(speech_end * rate * n_fit / max(len(chunk), 1))), len(fitted))
+        alignment.append({
+            "script": seg["script"],
+            "start_time": round(cursor / rate, 3),
+            "end_time": round((cursor + n_speech) / rate, 3),
+            "source_start": round(cuts[i], 3),
+            "source_end": round(cuts[i + 1], 3),
+            "speed": round(len(chunk) / n_fit, 4),
+        })
+        cursor += len(fitted)
+
+    return np.concatenate(pieces), alignment
+
+def alignment_path(out_file):
+    """Path of the alignment table saved next to a narration file."""
+    return os.path.splitext(out_file)[0] + ".alignment.json"
+
+def load_alignment(path):
+    """Load an alignment table saved by generate_voice_from_segments."""
+    with open(path) as f:
+        return json.load(f)["segments"]
 
 # ---------------------------
 # TTS flow: generate voice and call adjuster
 # ---------------------------
 
-def generate_voice_from_segments(segments, out_file="output.wav", adjust_timing=True):
+def _load_cached_voice(cache, cache_key):
+    """Samples and rate of a cached TTS response, or None on a miss."""
+    path = cache.get(cache_key, ".wav")
+    if path is None:
+        return None
+    try:
+        samples, rate = sf.read(path, dtype="float32")
+    except (FileNotFoundError, sf.LibsndfileError):
+        # Evicted between lookup and read
+        return None
+    print(f"✓ Cache hit: TTS audio {path}")
+    return samples, rate
+
+def generate_voice_from_segments(segments, out_file="output.wav", adjust_timing=True, voice_name='Kore', workspace=None,
+                                 align=None):
     """
-    Generate voice using Google TTS and optionally adjust timing with ffmpeg policy adjuster.
-    segments: list of dicts with "script" and "end_time" keys at minimum.
+    Generate voice using Google TTS and optionally adjust timing (see fit_audio_policy).
+    segments: list of dicts with "script" and "end_time" keys at minimum
+    ("start_time" too when align="segments").
+    The TTS audio is decoded and adjusted in memory and written once to out_file.
+    align: None, "global" or "segments" (see align_segments). When set, the
+    alignment table is saved next to out_file (alignment_path) and returned as
+    a third value: (out_file, duration, alignment).
+    The raw TTS audio is cached on (model, transcript, voice), so only the cheap
+    timing adjustment reruns when the same script is voiced again.
+    If a JobWorkspace is given, out_file is saved in its audio directory.
     """
+    if workspace is not None:
+        out_file = workspace.audio_path(os.path.basename(out_file))
+
     # Build transcript
     transcript = "Read the following script with an energetic, motivating tone: "
     transcript += build_transcript(segments)
 
-    print("Calling Google TTS API...")
-    client = genai.Client()  # ensure GEMINI API key set in env as before
-
-    response = client.models.generate_content(
-        model="gemini-2.5-flash-preview-tts",
-        contents=transcript,
-        config=types.GenerateContentConfig(
-            response_modalities=["AUDIO"],
-            speech_config=types.SpeechConfig(
-                voice_config=types.VoiceConfig(
-                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                        voice_name='Kore'
+    cache = get_asset_cache()
+    cache_key = cache.make_key(TTS_MODEL, transcript, voice_name)
+    cached = _load_cached_voice(cache, cache_key)
+    if cached is not None:
+        samples, rate = cached
+        annotate(cached=True)
+    else:
+        print("Calling Google TTS API...")
+        from google.genai import types  # imported on first use, it is slow to load
+
+        response = get_gemini_manager().generate_content(
+            model=TTS_MODEL,
+            contents=transcript,
+            config=types.GenerateContentConfig(
+                response_modalities=["AUDIO"],
+                speech_config=types.SpeechConfig(
+                    voice_config=types.VoiceConfig(
+                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                            voice_name=voice_name
+                        )
                     )
                 )
             )
         )
-    )
 
-    # Extract PCM bytes from API response
-    pcm_data = response.candidates[0].content.parts[0].inline_data.data
-
-    # Prepare file paths
-    out_dir = os.path.dirname(out_file) or "."
-    os.makedirs(out_dir, exist_ok=True)
-    out_basename = os.path.basename(out_file)
-    temp_file = os.path.join(out_dir, "temp_" + out_basename)
-
-    # Save raw PCM to temp wav
-    save_wav(temp_file, pcm_data)
-    print(f"Initial audio saved to {temp_file}")
+        # Extract PCM bytes from API response
+        pcm_data = response.candidates[0].content.parts[0].inline_data.data
+        samples, rate = pcm_to_array(pcm_data), TTS_SAMPLE_RATE
+        cache.put_bytes(cache_key, wav_bytes(pcm_data), ".wav")
 
     # Adjust timing if requested
-    if adjust_timing and segments:
+    alignment = None
+    if align and segments:
+        print(f"Aligning narration to {len(segments)} segments ({align})")
+        with span("align_segments", "audio", mode=align):
+            samples, alignment = align_segments(samples, rate, segments, mode=align)
+    elif adjust_timing and segments:
         target_duration = segments[-1]["end_time"]
         print(f"Target duration from segments: {target_duration}s")
-        final_dur = adjust_audio_policy(temp_file, out_file, target_duration)
-        # cleanup temp
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        print(f"✓ Final audio saved to {out_file} duration {final_dur:.3f}s")
-        return out_file, final_dur
-    else:
-        # move temp file to final path (no timing adjustment)
-        shutil.move(temp_file, out_file)
-        final_dur = _ffprobe_duration(out_file)
-        print(f"Moved {temp_file} to {out_file} duration {final_dur:.3f}s")
-        return out_file, final_dur
+        with span("fit_audio_policy", "audio"):
+            samples = fit_audio_policy(samples, rate, target_duration)
+
+    write_audio(out_file, samples, rate)
+    final_dur = len(samples) / rate
+    print(f"✓ Final audio saved to {out_file} duration {final_dur:.3f}s")
 
+    if align:
+        with open(alignment_path(out_file), "w") as f:
+            json.dump({"mode": align, "segments": alignment or []}, f, indent=2)
+        return out_file, final_dur, alignment or []
+    return out_file, final_dur
@@ -0,0 +1,295 @@
+import asyncio
+import os
+import threading
+import time
+import httpx
+from app.utils import KeyPool, atomic_path, span, annotate
+
+VIDEO_MODEL = "runway-duration-5-generate"
+VIDEO_QUALITY = "720p"
+DEFAULT_BASE_URL = "https://api.kie.ai"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def get_api_keys():
+    """Get all available API keys from environment variables"""
+    api_keys = []
+    for i in range(1, 5):  # KIE_API_KEY1 through KIE_API_KEY4
+        key = os.getenv(f'KIE_API_KEY{i}')
+        if key:
+            api_keys.append(key)
+    return api_keys
+
+def _retry_after(response):
+    """Retry-After header of a response in seconds, if it is given as a number."""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+class PollSchedule:
+    """
+    Delays between status polls of a generation job.
+
+    Keeps an exponential moving average of how long finished jobs took. A new
+    job stays quiet for quiet_fraction of that expected duration, then polls
+    with exponential back-off from min_interval up to steady_interval, and keeps
+    polling at steady_interval. Without any observation yet it starts the
+    back-off right away.
+    """
+
+    def __init__(self, min_interval=1.0, steady_interval=5.0, quiet_fraction=0.8, smoothing=0.3):
+        self.min_interval = min_interval
+        self.steady_interval = steady_interval
+        self.quiet_fraction = quiet_fraction
+        self.smoothing = smoothing
+        self.expected_duration = None
+
+    def observe(self, seconds):
+        """Record the duration of a finished job."""
+        if self.expected_duration is None:
+            self.expected_duration = seconds
+        else:
+            self.expected_duration += self.smoothing * (seconds - self.expected_duration)
+
+    def delays(self):
+        """Yield the delay before each successive poll."""
+        if self.expected_duration:
+            yield self.expected_duration * self.quiet_fraction
+        delay = self.min_interval
+        while True:
+            yield delay
+            delay = min(delay * 2, self.steady_interval)
+
+class KieClient:
+    """
+    Async client for the Kie.ai Runway API.
+
+    Job creation, status polls and downloads all go through one pooled
+    httpx.AsyncClient, so connections are reused instead of opened per request.
+    Polling follows a PollSchedule tuned by the durations of earlier jobs, and
+    videos are streamed to disk in large chunks. Concurrent jobs are spread
+    over the API keys by a KeyPool, which rests keys that return 429s or errors.
+
+    The HTTP client is bound to the event loop it is first used on; use the
+    process-wide instance from get_kie_client() with run_coroutine(). Point
+    base_url (or KIE_API_BASE_URL) at a local stub server, or pass an httpx
+    transport, to run without the real API.
+
+    Args:
+        api_keys: Kie.ai API keys (default: KIE_API_KEY1-4 from the environment)
+        key_pool: Optional KeyPool, used instead of api_keys
+        max_key_wait: Max seconds to wait for a key to come off cooldown
+        base_url: API root (default: KIE_API_BASE_URL or https://api.kie.ai)
+        timeout: Timeout of a single HTTP request, in seconds
+        job_timeout: Max time to wait for a generation job, in seconds
+        max_connections: Size of the connection pool
+        poll_schedule: Optional PollSchedule
+        transport: Optional httpx transport (e.g. httpx.MockTransport)
+    """
+
+    def __init__(self, api_keys=None, key_pool=None, base_url=None, timeout=30.0, job_timeout=600,
+                 max_connections=20, poll_schedule=None, transport=None, max_key_wait=60.0):
+        self.key_pool = key_pool or KeyPool(api_keys if api_keys is not None else get_api_keys())
+        self.max_key_wait = max_key_wait
+        self.base_url = base_url or os.getenv("KIE_API_BASE_URL", DEFAULT_BASE_URL)
+        self.timeout = timeout
+        self.job_timeout = job_timeout
+        self.max_connections = max_connections
+        self.poll_schedule = poll_schedule or PollSchedule()
+        self._transport = transport
+        self._http = None
+
+    @property
+    def http(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                transport=self._transport,
+                follow_redirects=True,
+            )
+        return self._http
+
+    @staticmethod
+    def _headers(api_key):
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+    async def create_task(self, api_key, prompt, duration_seconds=5, aspect_ratio="9:16"):
+        """Start a generation job and return the API response."""
+        payload = {
+            "prompt": prompt,
+            "model": VIDEO_MODEL,
+            "callBackUrl": "https://api.example.com/callback",
+            "duration": duration_seconds,
+            "quality": VIDEO_QUALITY,
+            "aspectRatio": aspect_ratio,
+            "waterMark": ""  # Set to "" for no watermark, or e.g., "your-brand"
+        }
+        response = await self.http.post("/api/v1/runway/generate", json=payload, headers=self._headers(api_key))
+        response.raise_for_status()
+        return response.json()
+
+    async def wait_for_video(self, api_key, task_id):
+        """Poll a job until it finishes. Returns the video URL, or None on failure/timeout."""
+        started = time.monotonic()
+        for attempt, delay in enumerate(self.poll_schedule.delays(), 1):
+            elapsed = time.monotonic() - started
+            if elapsed + delay > self.job_timeout:
+                break
+            await asyncio.sleep(delay)
+
+            response = await self.http.get("/api/v1/runway/record-detail", params={"taskId": task_id},
+                                            headers=self._headers(api_key))
+            response.raise_for_status()
+            status_data = response.json()
+
+            if status_data.get("code") != 200:
+                print(f"✗ Status check failed: {status_data.get('msg', 'Unknown error')}")
+                return None
+
+            data = status_data.get("data", {})
+            state = data.get("state")
+            print(f"Poll {attempt} ({time.monotonic() - started:.0f}s): State = {state}")
+            annotate(polls=attempt, state=state)
+
+            if state == "success":
+                self.poll_schedule.observe(time.monotonic() - started)
+                video_url = data.get("videoInfo", {}).get("videoUrl")
+                if not video_url:
+                    print("✗ No videoUrl in successful response.")
+                return video_url
+            if state in ["failed", "error"]:
+                print(f"✗ Job failed: {data.get('errorMsg', 'Unknown error')}")
+                return None
+
+        print("✗ Timeout: Job took too long to complete.")
+        return None
+
+    async def download(self, url, filepath, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """Stream a file to filepath (written to a .part file, then renamed, see atomic_path)."""
+        print(f"Downloading video from {url} to {filepath}...")
+        with atomic_path(filepath) as partial_path:
+            async with self.http.stream("GET", url) as response:
+                response.raise_for_status()
+                with open(partial_path, "wb", buffering=chunk_size) as f:
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        f.write(chunk)
+        print(f"✓ Video saved: {filepath}")
+        return filepath
+
+    async def _acquire_key(self, tried):
+        """Take the least busy untried key, waiting for a cooldown to end if needed."""
+        while True:
+            api_key = self.key_pool.acquire(exclude=tried)
+            if api_key is not None:
+                return api_key
+            wait = self.key_pool.cooldown_remaining(exclude=tried)
+            if wait is None or wait > self.max_key_wait:
+                return None
+            print(f"→ All API keys cooling down, retrying in {wait:.0f}s...")
+            await asyncio.sleep(wait)
+
+    async def generate(self, prompt, filepath, duration_seconds=5, aspect_ratio="9:16"):
+        """
+        Generate a video and save it to filepath.
+        The job runs on the least busy API key; if that key is rate limited or
+        rejects the job, the next one is tried (each key at most once).
+
+        Returns:
+            filepath, or None on failure
+        """
+        if not len(self.key_pool):
+            print("✗ No API keys found in environment variables (KIE_API_KEY1-4)")
+            return None
+
+        tried = set()
+        while True:
+            api_key = await self._acquire_key(tried)
+            if api_key is None:
+                print("✗ All API keys exhausted")
+                return None
+            tried.add(api_key)
+            label = self.key_pool.label(api_key)
+            print(f"\n--- Attempting with API Key {label} ---")
+
+            task_id = None
+            status, retry_after = None, None
+            with span("kie.attempt", "media", key=label, polls=0) as attempt_span:
+                try:
+                    api_data = await self.create_task(api_key, prompt, duration_seconds, aspect_ratio)
+                    status = api_data.get("code")
+                    if status != 200:
+                        print(f"✗ API Key {label} rejected the job: {api_data.get('msg', 'Unknown error')}")
+                        print("→ Switching to next API key and retrying same video...")
+                        continue
+
+                    task_id = api_data.get("data", {}).get("taskId")
+                    if not task_id:
+                        print("✗ No taskId returned from API.")
+                        return None
+
+                    print(f"✓ Job started with taskId: {task_id}")
+                    print("Polling for completion...")
+                    attempt_span.set(task_id=task_id)
+                    video_url = await self.wait_for_video(api_key, task_id)
+                    if not video_url:
+                        return None
+                    with span("kie.download", "media"):
+                        return await self.download(video_url, filepath)
+
+                except httpx.HTTPStatusError as e:
+                    print(f"✗ Network/API error with Key {label}: {str(e)}")
+                    status = e.response.status_code
+                    retry_after = _retry_after(e.response)
+                    if task_id is None:
+                        print("→ Switching to next API key...")
+                        continue
+                    return None
+                except httpx.HTTPError as e:
+                    print(f"✗ Network/API error with Key {label}: {str(e)}")
+                    return None
+                finally:
+                    attempt_span.set(status=status)
+                    self.key_pool.release(api_key, status, retry_after)
+
+    def key_stats(self):
+        """Per-key usage counters (see KeyPool.stats)."""
+        return self.key_pool.stats()
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+_loop = None
+_kie_client = None
+_lock = threading.Lock()
+
+def get_event_loop():
+    """
+    Return the process-wide event loop for Kie.ai requests, running in a daemon
+    thread. Requests from every thread share it, and with it the connection pool.
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="kie-loop", daemon=True).start()
+        return _loop
+
+def run_coroutine(coro):
+    """Schedule coro on the shared event loop and return a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+def get_kie_client():
+    """Return the process-wide KieClient (configured from the environment)."""
+    global _kie_client
+    with _lock:
+        if _kie_client is None:
+            _kie_client = KieClient()
+        return _kie_client
@@ -0,0 +1,405 @@
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from app.utils import JobWorkspace, span, annotate, trace_job
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+DEFAULT_TEXT_OPTIONS = dict(
+    font_size=47,
+    color=(255, 255, 255, 255),
+    stroke_color="black",
+    stroke_width=3,
+    margin=(50, 100),
+)
+
+# Timeline, captions and soundtrack of a previewed job, kept in its workspace for render_job
+RENDER_INPUTS = "render_inputs.json"
+
+class Stage:
+    """
+    A single step of a pipeline.
+
+    Args:
+        name: Unique stage name
+        func: Callable taking a dict {dependency_name: result} and returning the stage result
+        depends_on: Names of the stages that must finish before this one starts
+        label: Human readable description used for progress reporting
+        slots: Optional semaphore held while the stage runs; share one between
+               pipelines to bound how many of them run this stage at once
+    """
+
+    def __init__(self, name, func, depends_on=(), label=None, slots=None):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.label = label or name
+        self.slots = slots
+
+    def run(self, inputs):
+        with span(self.name, "stage") as s:
+            if self.slots is None:
+                return self.func(inputs)
+            waited = time.perf_counter()
+            with self.slots:
+                s.set(slot_wait_s=round(time.perf_counter() - waited, 3))
+                return self.func(inputs)
+
+def run_stages(stages, on_update=None, max_workers=None):
+    """
+    Runs a DAG of stages, starting every stage as soon as all of its dependencies
+    are done, so independent stages run concurrently.
+
+    Scheduling and on_update callbacks happen on the calling thread (only the stage
+    functions run in worker threads), which keeps UI callbacks such as Streamlit
+    widgets safe to use.
+
+    Args:
+        stages: List of Stage objects
+        on_update: Optional callback on_update(stage, state, states) fired on every
+                   state change, where states maps stage name -> state
+        max_workers: Max stages running at the same time (defaults to len(stages))
+
+    Returns:
+        Dict mapping stage name -> stage result
+
+    Raises:
+        The exception of the first stage that fails; stages not started yet are cancelled,
+        stages already running are waited for and end up done or failed.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        for dep in stage.depends_on:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    states = {stage.name: PENDING for stage in stages}
+    results = {}
+    running = {}
+
+    def set_state(stage, state):
+        states[stage.name] = state
+        if on_update:
+            on_update(stage, state, dict(states))
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages)) as pool:
+        while True:
+            # Start every stage whose dependencies are all done
+            for stage in stages:
+                if states[stage.name] != PENDING:
+                    continue
+                if all(states[dep] == DONE for dep in stage.depends_on):
+                    inputs = {dep: results[dep] for dep in stage.depends_on}
+                    # Stages run in the caller's context, so their spans join its trace
+                    running[pool.submit(contextvars.copy_context().run, stage.run, inputs)] = stage
+                    set_state(stage, RUNNING)
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    results[stage.name] = future.result()
+                    set_state(stage, DONE)
+                    continue
+
+                set_state(stage, FAILED)
+                for other in stages:
+                    if states[other.name] == PENDING:
+                        set_state(other, CANCELLED)
+                # Let stages already in flight finish before surfacing the error;
+                # they report their own outcome, only stages never started are cancelled
+                for other_future, other in running.items():
+                    if other_future.exception() is None:
+                        results[other.name] = other_future.result()
+                        set_state(other, DONE)
+                    else:
+                        set_state(other, FAILED)
+                raise error
+
+    stuck = [name for name, state in states.items() if state == PENDING]
+    if stuck:
+        raise ValueError(f"Stages could not be scheduled (dependency cycle?): {stuck}")
+
+    return results
+
+def render_inputs(ws, inputs, profile='final', incremental=True, scale=1.0, fps=30):
+    """
+    Render the video described by inputs (media_list, texts, audio_path,
+    bg_music_path, bg_volume, orientation, text_options) into ws.
+    Returns the path of the rendered video.
+    """
+    from app.services.frame_stream import render_final_video_streaming
+    from app.services.render_segments import render_final_video_incremental
+
+    render = render_final_video_incremental if incremental else render_final_video_streaming
+    return render(
+        media_list=inputs["media_list"],
+        texts=inputs["texts"],
+        audio_path=inputs["audio_path"],
+        output_path="final_output.mp4",
+        bg_music_path=inputs["bg_music_path"],
+        bg_volume=inputs["bg_volume"],
+        orientation=inputs["orientation"],
+        workspace=ws,
+        profile=profile,
+        scale=scale,
+        fps=fps,
+        **inputs["text_options"],
+    )
+
+def run_video_pipeline(
+    user_prompt,
+    orientation='portrait',
+    bg_music_path="public/audios/bgMusic.mp3",
+    bg_volume=0.08,
+    text_options=None,
+    on_update=None,
+    workspace=None,
+    publish_dir="public/outputs",
+    profile='final',
+    align_narration='segments',
+    incremental=True,
+    voice_name='Kore',
+    stage_limits=None,
+    preview=False,
+    trace=None,
+    trace_dir=None,
+    combined_plan=True,
+    stream_plan=True,
+    plan_cache=True,
+):
+    """
+    Runs the full prompt -> video pipeline:
+
+        prompts -> script -> {voice, media} -> assemble
+
+    Voice synthesis and media generation only share the script and segment lists,
+    so they run concurrently.
+
+    With combined_plan, the segments and their narration come from a single
+    planner call (generate_plan_from_prompt) and the script stage has nothing
+    left to do. If that call fails or returns an unusable plan, the prompts and
+    the script are generated by two separate calls as before.
+
+    With stream_plan as well, the planner response is streamed
+    (stream_plan_from_prompt) and every segment is handed to a MediaGenerator
+    as soon as it is parsed, so the first images and videos are being
+    generated while the planner is still writing the later segments. The
+    media stage then only collects the results. The "media" stage limit is
+    taken before the first segment is submitted and held until the results
+    are collected, so streamed jobs count against the same per-host cap. If
+    the stream breaks off, the submitted jobs that have not started are
+    cancelled and the fallback plan waits for the running ones to finish (or
+    unwind, for videos) before it generates its media from scratch into the
+    same files. Video jobs already dispatched to Kie.ai are still billed.
+
+    Plans and scripts are memoized in the plan cache (get_plan_cache), so
+    rerunning a prompt skips the planning calls; plan_cache=False asks the
+    model for a fresh plan (e.g. for more variety) and replaces the cached one.
+
+    Every run works in its own JobWorkspace, so several pipelines can run on the
+    same host without overwriting each other's files. The final video is moved to
+    <publish_dir>/<job_id>.mp4 before the workspace is cleaned up.
+
+    With preview=True the video is rendered at PREVIEW_SCALE and PREVIEW_FPS
+    (360x640 at 15 fps by default) with the 'preview' encoder profile and
+    published as <job_id>_preview.mp4. The workspace is kept, with the
+    generated media, narration and render inputs, so that once the preview is
+    approved render_job(job_id) renders the full-quality video from the same
+    inputs without calling any model again.
+
+    Args:
+        user_prompt: The user's video description
+        orientation: 'portrait' or 'landscape'
+        bg_music_path: Optional background music (skipped if missing)
+        bg_volume: Volume multiplier for background music
+        text_options: Caption styling passed to the renderer (see CaptionTrack)
+        on_update: Progress callback, see run_stages
+        workspace: Optional, not yet entered JobWorkspace to use (a new one is created otherwise)
+        publish_dir: Directory the final video is published to
+        profile: Encoder profile of the final render (draft, preview or final)
+        align_narration: Narration alignment mode, 'segments', 'global' or None (see align_segments)
+        incremental: Render through the per-segment cache (render_final_video_incremental)
+                     instead of one render_final_video_streaming pass
+        voice_name: Gemini TTS voice of the narration
+        stage_limits: Optional dict mapping stage name -> semaphore, shared by
+                      pipelines that run at the same time (see Stage)
+        preview: Render a low-resolution preview and keep the job's inputs (see above)
+        trace: Optional Trace the run is recorded into (see trace_job); a new one otherwise
+        trace_dir: Directory the job's Chrome trace and summary table are saved to
+                   (default: TRACE_DIR; not saved if unset)
+        combined_plan: Plan segments and narration in one model call (see above)
+        stream_plan: Stream the combined plan and start media generation per segment (see above)
+        plan_cache: Reuse cached plans and scripts of identical requests (see above)
+
+    Returns:
+        Path to the published final video
+    """
+    # The stage modules load MoviePy, httpx and numpy; importing them here keeps
+    # importing the pipeline (API server, batch CLI) cheap
+    from app.services.plan_generator import generate_plan_from_prompt, stream_plan_from_prompt, split_plan, media_segment
+    from app.services.prompt_generator import generate_prompts_from_prompt
+    from app.services.script_generator import generate_script_from_prompt
+    from app.services.generate_voice import generate_voice_from_segments
+    from app.services.generate_media import generate_media_sequence, MediaGenerator
+    from app.services.generate_media_segments import process_media_segments
+    from app.services.concatenate_media import PREVIEW_SCALE, PREVIEW_FPS
+
+    if text_options is None:
+        text_options = DEFAULT_TEXT_OPTIONS
+
+    stage_limits = stage_limits or {}
+
+    ws = workspace or JobWorkspace()
+    if preview:
+        ws.keep = True
+
+    with ws, trace_job(ws.job_id, trace, trace_dir):
+        planned = {}
+        media_slots = stage_limits.get("media")
+        held_slots = []
+
+        # The media limit is managed here rather than by its Stage: a streamed
+        # plan submits media jobs from the prompts stage and the slot has to
+        # stay taken until the media stage has collected them
+        def acquire_media_slot():
+            if media_slots is not None and not held_slots:
+                waited = time.perf_counter()
+                media_slots.acquire()
+                held_slots.append(media_slots)
+                annotate(media_slot_wait_s=round(time.perf_counter() - waited, 3))
+
+        def release_media_slot():
+            while held_slots:
+                held_slots.pop().release()
+
+        def stream_plan_into_generator():
+            generator = MediaGenerator(workspace=ws)
+            items = []
+            try:
+                for item in stream_plan_from_prompt(user_prompt, use_cache=plan_cache):
+                    items.append(item)
+                    acquire_media_slot()
+                    generator.submit(media_segment(item))
+                segments, script_segments = split_plan(items)
+            except Exception:
+                # The fallback plan writes the same segment files: nothing of this plan may still be running
+                generator.shutdown(wait=True, cancel_futures=True)
+                release_media_slot()
+                raise
+            except BaseException:
+                generator.shutdown(wait=False, cancel_futures=True)
+                release_media_slot()
+                raise
+            planned["generator"] = generator
+            return segments, script_segments
+
+        def plan(r):
+            if combined_plan:
+                try:
+                    if stream_plan:
+                        segments, planned["script"] = stream_plan_into_generator()
+                    else:
+                        segments, planned["script"] = generate_plan_from_prompt(user_prompt, use_cache=plan_cache)
+                    return segments
+                except Exception as e:
+                    print(f"⚠️  Combined planner failed ({e}), generating prompts and script separately")
+            return generate_prompts_from_prompt(user_prompt, use_cache=plan_cache)
+
+        def script(r):
+            if "script" in planned:
+                return planned["script"]
+            return generate_script_from_prompt(r["prompts"], user_prompt, use_cache=plan_cache)
+
+        def media(r):
+            acquire_media_slot()
+            try:
+                return generate_media_sequence(r["prompts"], workspace=ws, generator=planned.get("generator"))
+            finally:
+                release_media_slot()
+
+        def assemble(r):
+            alignment = r["voice"][2] if align_narration else None
+            media_list, texts = process_media_segments(r["prompts"], r["script"], workspace=ws, alignment=alignment)
+            inputs = dict(
+                media_list=media_list,
+                texts=texts,
+                audio_path=r["voice"][0],
+                bg_music_path=bg_music_path,
+                bg_volume=bg_volume,
+                orientation=orientation,
+                text_options=dict(text_options),
+            )
+            if not preview:
+                return render_inputs(ws, inputs, profile, incremental)
+            with open(os.path.join(ws.root, RENDER_INPUTS), "w") as f:
+                json.dump(inputs, f, indent=2)
+            return render_inputs(ws, inputs, 'preview', incremental, PREVIEW_SCALE, PREVIEW_FPS)
+
+        stages = [
+            Stage("prompts", plan, label="Generating prompts"),
+            Stage("script", script, depends_on=["prompts"], label="Creating script"),
+            Stage("voice", lambda r: generate_voice_from_segments(r["script"], "a.wav", voice_name=voice_name,
+                                                                workspace=ws, align=align_narration),
+                  depends_on=["script"], label="Generating voiceover"),
+            Stage("media", media, depends_on=["prompts"], label="Creating media sequence"),
+            Stage("assemble", assemble,
+                  depends_on=["prompts", "script", "voice", "media"], label="Rendering final video"),
+        ]
+        for stage in stages:
+            if stage.name != "media":
+                stage.slots = stage_limits.get(stage.name)
+
+        try:
+            results = run_stages(stages, on_update=on_update)
+        finally:
+            release_media_slot()
+        return ws.publish(results["assemble"], publish_dir, suffix="_preview" if preview else "")
+
+def render_job(job_id, root="public/jobs", publish_dir="public/outputs", profile='final', incremental=True,
+               keep=False, trace=None, trace_dir=None):
+    """
+    Render the full-quality video of a job previewed with
+    run_video_pipeline(preview=True), from the media, narration and captions
+    kept in its workspace.
+
+    Args:
+        job_id: Id of the previewed job (its JobWorkspace id)
+        root: Root directory of the job workspaces
+        publish_dir: Directory the video is published to, as <job_id>.mp4
+        profile: Encoder profile of the render
+        incremental: Render through the per-segment cache (see run_video_pipeline)
+        keep: Keep the workspace afterwards, e.g. to render again with other
+              settings; by default it is deleted once the video is published
+        trace, trace_dir: See run_video_pipeline
+
+    Returns:
+        Path to the published video
+
+    Raises:
+        FileNotFoundError: The job has no kept inputs (not a preview, already rendered,
+                           or expired, see sweep_workspaces)
+    """
+    inputs_path = os.path.join(root, job_id, RENDER_INPUTS)
+    if not os.path.isfile(inputs_path):
+        raise FileNotFoundError(f"No render inputs for job {job_id} in {root} "
+                                "(run it with preview=True, and render it only once unless keep=True)")
+    with open(inputs_path) as f:
+        inputs = json.load(f)
+
+    # Kept until the video is published, so a failed render can be retried
+    with JobWorkspace(job_id, root=root, keep=True) as ws, trace_job(job_id, trace, trace_dir):
+        with span("render", "stage"):
+            published = ws.publish(render_inputs(ws, inputs, profile, incremental), publish_dir)
+        ws.keep = keep
+        return published
@@ -0,0 +1,185 @@
+import json
+from app.utils import read_prompt, get_gemini_manager, get_plan_cache, JsonArrayParser, annotate
+from dotenv import load_dotenv
+
+load_dotenv()  # take environment variables from .env.
+
+PLANNER_MODEL = "gemini-2.5-pro"
+
+PLAN_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "segment_number": {
+                "type": "integer",
+                "description": "Sequential order of the segment"
+            },
+            "type": {
+                "type": "string",
+                "enum": ["image", "video"],
+                "description": "Type of media segment"
+            },
+            "duration_seconds": {
+                "type": "integer",
+                "description": "Duration in seconds. For videos: always 5. For images: 2-5 seconds based on content importance"
+            },
+            "prompt": {
+                "type": "string",
+                "description": "Complete self-contained prompt for generating the media"
+            },
+            "script": {
+                "type": "string",
+                "description": "Narration spoken while this segment is on screen, short enough to fit its duration"
+            }
+        },
+        "required": ["segment_number", "type", "duration_seconds", "prompt", "script"]
+    }
+}
+
+def check_segment(item):
+    """Return a planner segment if it is well formed. Raises ValueError otherwise."""
+    if not isinstance(item, dict) or item.get("type") not in ("image", "video") or not item.get("prompt") \
+            or not isinstance(item.get("segment_number"), int) \
+            or not isinstance(item.get("duration_seconds"), (int, float)) or item["duration_seconds"] <= 0:
+        raise ValueError(f"Malformed plan segment: {item!r}")
+    return item
+
+def media_segment(item):
+    """The media part of a planner segment, as generate_prompts_from_prompt returns it."""
+    return {key: item[key] for key in ("segment_number", "type", "duration_seconds", "prompt")}
+
+def split_plan(plan):
+    """
+    Split planner output into the visual segments generate_prompts_from_prompt
+    returns and the script generate_script_from_prompt returns.
+
+    Script timings are the running sum of the segment durations, so every line
+    starts and ends with its segment. Segments without narration get no script
+    entry (silence).
+
+    Returns:
+        (segments, script_segments)
+
+    Raises:
+        ValueError: If the plan is empty or a segment is malformed
+    """
+    if not isinstance(plan, list) or not plan:
+        raise ValueError("The planner returned no segments")
+    for item in plan:
+        check_segment(item)
+
+    segments = []
+    script_segments = []
+    start_time = 0
+    for item in sorted(plan, key=lambda item: item["segment_number"]):
+        duration = item["duration_seconds"]
+        segments.append(media_segment(item))
+        script = (item.get("script") or "").strip()
+        if script:
+            script_segments.append({
+                "start_time": start_time,
+                "end_time": start_time + duration,
+                "script": script,
+            })
+        start_time += duration
+
+    if not script_segments:
+        raise ValueError("The planner returned no narration")
+    return segments, script_segments
+
+def _planner_config():
+    """Request config of the planner. Raises ValueError if a system prompt file cannot be read."""
+    prompts = []
+    for name in ("prompt_generator_prompt", "planner_prompt"):
+        prompt = read_prompt(name)
+        if prompt is None:  # read_prompt has printed why
+            raise ValueError(f"Planner system prompt app/prompts/{name}.txt could not be read")
+        prompts.append(prompt)
+    return {
+        "system_instruction": "\n".join(prompts),
+        "response_mime_type": "application/json",
+        "response_schema": PLAN_SCHEMA,
+    }
+
+def generate_plan_from_prompt(text: str, use_cache: bool = True):
+    """
+    Plan the video in one model call: the media segments (as
+    generate_prompts_from_prompt) together with the narration of each one (as
+    generate_script_from_prompt), from a single response schema.
+
+    Usable plans are memoized in the plan cache (get_plan_cache); use_cache=False
+    asks the model for a fresh one.
+
+    Returns:
+        (segments, script_segments), see split_plan
+
+    Raises:
+        ValueError: If the response is not a usable plan
+    """
+    config = _planner_config()
+
+    def generate():
+        response = get_gemini_manager().generate_content(
+            model=PLANNER_MODEL,
+            config=config,
+            contents=text,
+        )
+        plan = response.parsed
+        if plan is None:
+            try:
+                plan = json.loads(response.text or "")
+            except json.JSONDecodeError as e:
+                raise ValueError(f"The planner returned invalid JSON: {e}") from e
+        split_plan(plan)  # only usable plans are cached
+        return plan
+
+    return split_plan(get_plan_cache().memoize(PLANNER_MODEL, config, text, generate, use_cache))
+
+def stream_plan_from_prompt(text: str, use_cache: bool = True):
+    """
+    Streaming version of generate_plan_from_prompt: the response is read with
+    the streaming API and parsed incrementally (JsonArrayParser), and each
+    planner segment (media fields plus its "script" line) is yielded as soon
+    as its JSON object is complete, while the model is still writing the
+    next ones. Pass the collected segments to split_plan for the final
+    segment and script lists.
+
+    A plan found in the plan cache is yielded right away; a streamed plan is
+    stored once it is complete and usable. use_cache=False skips the lookup.
+
+    Raises:
+        ValueError: If a segment is malformed or the response ends early
+    """
+    config = _planner_config()
+    cache = get_plan_cache()
+    key = cache.make_key(PLANNER_MODEL, config, text)
+    if use_cache:
+        plan = cache.get(key)
+        annotate(plan_cache="hit" if plan is not None else "miss")
+        if plan is not None:
+            print(f"✓ Plan cache hit ({PLANNER_MODEL})")
+            for item in plan:
+                yield check_segment(item)
+            return
+    else:
+        annotate(plan_cache="bypass")
+
+    parser = JsonArrayParser()
+    items = []
+    chunks = get_gemini_manager().generate_content_stream(
+        model=PLANNER_MODEL,
+        config=config,
+        contents=text,
+    )
+    try:
+        for chunk in chunks:
+            for item in parser.feed(chunk.text or ""):
+                items.append(item)
+                annotate(streamed_segments=len(items))
+                yield check_segment(item)
+        parser.close()
+    finally:
+        chunks.close()
+    split_plan(items)
+    cache.put(key, PLANNER_MODEL, items)
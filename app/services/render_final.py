@@ -0,0 +1,94 @@
+from moviepy import AudioFileClip, CompositeAudioClip, concatenate_videoclips
+import os
+from app.services.concatenate_media import build_media_clips, get_target_size
+from app.services.add_multiple_texts import CaptionTrack, scale_caption_style
+from app.services.add_background_music import fit_bg_music
+from app.utils import moviepy_write_args, span
+
+def render_final_video(
+    media_list,
+    texts,
+    audio_path,
+    output_path="public/outputs/final_output.mp4",
+    bg_music_path=None,
+    bg_volume=0.08,
+    orientation='portrait',
+    workspace=None,
+    profile='final',
+    scale=1.0,
+    fps=30,
+    **text_options,
+):
+    """
+    Renders the final video in a single encode.
+
+    Builds one render graph out of the timeline (concatenate_media), the caption
+    overlays (add_multiple_texts), the narration track (add_audio_to_video) and the
+    optional background music (add_bgMusic_to_video), and writes it out once instead
+    of decoding and re-encoding the video after every step.
+
+    Args:
+        media_list: Visual timeline, as returned by process_media_segments
+        texts: List of (text, start_time, end_time) tuples, as returned by process_media_segments
+        audio_path: Path to the narration audio file
+        output_path: Path to save the final video
+        bg_music_path: Optional path to background music. Skipped if None or missing
+        bg_volume: Volume multiplier for background music (0.0 to 1.0)
+        orientation: 'portrait' or 'landscape'
+        workspace: Optional JobWorkspace; the output file is saved in its outputs directory
+        profile: Encoder profile name or dict (see ENCODER_PROFILES)
+        scale: Output resolution relative to the full-size frame; caption sizes
+               scale along (see scale_caption_style). PREVIEW_SCALE for previews
+        fps: Frame rate of the output
+        **text_options: Caption styling passed to CaptionTrack
+                        (font, font_size, color, stroke_color, stroke_width, margin, ...)
+
+    Returns:
+        Path to the rendered video
+    """
+    if workspace is not None:
+        output_path = workspace.output_path(os.path.basename(output_path))
+
+    target_width, target_height = get_target_size(orientation, scale)
+    text_options = scale_caption_style(text_options, scale)
+
+    # Visual timeline
+    clips = build_media_clips(media_list, target_width, target_height, fps)
+    timeline = concatenate_videoclips(clips, method='chain')
+
+    # Caption overlays
+    captions = CaptionTrack(texts, frame_size=(target_width, target_height), fps=fps, **text_options)
+    video = captions.apply_to(timeline)
+
+    # Narration + background music
+    audio_clips = []
+    narration = AudioFileClip(audio_path)
+    audio_clips.append(narration)
+
+    bg_audio = None
+    if bg_music_path and os.path.exists(bg_music_path):
+        bg_audio = AudioFileClip(bg_music_path)
+        audio_clips.append(fit_bg_music(bg_audio, video.duration, bg_volume))
+
+    mixed_audio = CompositeAudioClip(audio_clips).with_duration(video.duration)
+    video = video.with_audio(mixed_audio)
+
+    with span("write_videofile", "moviepy", output=output_path):
+        video.write_videofile(
+            output_path,
+            fps=fps,
+            logger='bar',
+            **moviepy_write_args(profile)
+        )
+
+    # Close clips to free memory
+    video.close()
+    timeline.close()
+    for clip in clips:
+        clip.close()
+    narration.close()
+    if bg_audio is not None:
+        bg_audio.close()
+
+    print(f"Video saved as {output_path}")
+    return output_path
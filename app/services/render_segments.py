@@ -0,0 +1,232 @@
+import contextvars
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from app.services.concatenate_media import get_target_size
+from app.services.add_multiple_texts import scale_caption_style
+from app.services.assemble_media import (
+    INTERMEDIATE_TIMESCALE, concat_compatible, concat_segments, copy_clip, is_conforming, is_video_item, probe_media,
+    run_tool,
+)
+from app.services.frame_stream import (
+    AUDIO_SAMPLE_RATE, FrameEncoder, segment_frames, soundtrack_args, stream_timeline,
+)
+from app.utils import get_asset_cache, file_digest, get_encoder_profile, ffmpeg_audio_args, encoder_threads, span, annotate
+
+# Part of every segment cache key; bump it when segment rendering changes
+SEGMENT_CACHE_VERSION = 4
+
+def segment_captions(texts, start, end):
+    """
+    Captions visible in [start, end), with times relative to start. A caption
+    that spans a cut keeps its original start/end in local time (possibly
+    negative), so its animation continues seamlessly across segments.
+    """
+    return [(text, s - start, e - start) for text, s, e in texts if s < end and e > start]
+
+def segment_key(item, captions, size, fps=30, profile='final', text_options=None):
+    """Cache key of a rendered segment: everything that changes its pixels."""
+    return get_asset_cache().make_key(
+        "timeline-segment", SEGMENT_CACHE_VERSION,
+        file_digest(item[0]), list(item[1:]),
+        list(size), fps, get_encoder_profile(profile),
+        captions, text_options or {},
+    )
+
+def render_segment(item, captions, output_path, size, fps=30, profile='final', text_options=None):
+    """Render one media_list entry with its captions into a video-only intermediate."""
+    with span("render_segment", "render", media=os.path.basename(item[0])):
+        with FrameEncoder(output_path, size, fps, profile,
+                          extra_args=["-video_track_timescale", INTERMEDIATE_TIMESCALE]) as encoder:
+            stream_timeline([item], captions, encoder, size, fps, text_options=text_options)
+    return output_path
+
+def copyable_clip(item, captions, size, fps=30):
+    """
+    True if a media_list entry can go into the timeline as-is: a clip used in
+    full, without captions over it, already in the intermediate format at the
+    output size and rate. Stream copy cuts on packet boundaries, so trimmed
+    clips are rendered.
+    """
+    if captions or not is_video_item(item) or item[1] != 0:
+        return False
+    info = probe_media(item[0])
+    return is_conforming(info, size, fps) and round(info["duration"] * fps) == segment_frames(item, fps)
+
+def render_workers():
+    """Segments rendered at the same time: RENDER_WORKERS, or half the CPU cores."""
+    workers = os.getenv("RENDER_WORKERS")
+    if workers:
+        return max(1, int(workers))
+    return max(1, encoder_threads() // 2)
+
+def render_segment_process(item, captions, output_path, size, fps=30, profile='final', text_options=None,
+                           threads=None):
+    """
+    render_segment in a separate Python process (python -m app.services.render_segments),
+    so several segments render on several cores. threads sets the child's ENCODER_THREADS.
+    """
+    job = dict(item=list(item), captions=captions, output_path=output_path, size=list(size), fps=fps,
+               profile=profile, text_options=text_options or {})
+    env = dict(os.environ)
+    # The child must find the app package whatever the working directory
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [project_root, env.get("PYTHONPATH")]))
+    if threads:
+        env["ENCODER_THREADS"] = str(threads)
+    with span("render_segment_process", "subprocess", media=os.path.basename(item[0]), threads=threads):
+        p = subprocess.run([sys.executable, "-m", "app.services.render_segments", json.dumps(job)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env)
+    if p.returncode != 0:
+        raise RuntimeError(f"Rendering segment {item[0]} failed:\n{p.stderr.strip()[-2000:]}")
+    return output_path
+
+def render_segments(jobs, size, fps=30, profile='final', text_options=None, workers=None):
+    """
+    Render (item, captions, output_path) jobs, in parallel worker processes
+    when there is more than one job and workers > 1. The x264 threads are
+    split between the workers so the cores are not oversubscribed.
+    """
+    workers = min(workers or render_workers(), len(jobs))
+    if workers <= 1:
+        for item, captions, output_path in jobs:
+            render_segment(item, captions, output_path, size, fps, profile, text_options)
+        return
+
+    threads = max(1, encoder_threads() // workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, render_segment_process,
+                        item, captions, output_path, size, fps, profile, text_options, threads)
+            for item, captions, output_path in jobs
+        ]
+        for future in futures:
+            future.result()
+
+def mux_audio(video_path, audio_path, output_path, duration, bg_music_path=None, bg_volume=0.08, profile='final'):
+    """
+    Add narration (padded with silence) and optional looped background music to
+    a video with ffmpeg (see soundtrack_args), copying the video stream as-is.
+    """
+    inputs, mapping = soundtrack_args(1, audio_path, bg_music_path, bg_volume)
+    run_tool([
+        "ffmpeg", "-y", "-v", "error", "-i", video_path, *inputs, *mapping,
+        "-c:v", "copy", *ffmpeg_audio_args(profile), "-ar", str(AUDIO_SAMPLE_RATE),
+        "-t", f"{duration:.6f}",
+        "-movflags", "+faststart",
+        output_path
+    ])
+    return output_path
+
+def render_final_video_incremental(
+    media_list,
+    texts,
+    audio_path,
+    output_path="public/outputs/final_output.mp4",
+    bg_music_path=None,
+    bg_volume=0.08,
+    orientation='portrait',
+    workspace=None,
+    profile='final',
+    scale=1.0,
+    fps=30,
+    workers=None,
+    **text_options,
+):
+    """
+    Renders the same video as render_final_video from cached per-segment pieces.
+
+    Every media_list entry is rendered together with the captions that overlap
+    it into its own video-only intermediate, cached on its inputs (media file
+    contents, duration, pan direction/intensity, captions in local time, caption
+    style, resolution and encoder profile). The pieces are stitched without
+    re-encoding and the narration and background music are muxed in with a
+    video stream copy. After an edit only the segments whose inputs changed are
+    rendered again. Segments that are not cached are rendered in parallel
+    worker processes (see render_segments).
+
+    Clips that already match the output (copyable_clip) are remuxed instead of
+    rendered, as long as their encoding parameters match the rendered pieces
+    (concat_compatible), so the pieces can still be joined without
+    re-encoding; a clip that does not match is rendered like the others.
+
+    Args:
+        Same as render_final_video, plus:
+        workers: Segments rendered at the same time (default: render_workers())
+
+    Returns:
+        Path to the rendered video
+    """
+    if workspace is not None:
+        output_path = workspace.output_path(os.path.basename(output_path))
+
+    size = get_target_size(orientation, scale)
+    text_options = scale_caption_style(text_options, scale)
+    cache = get_asset_cache()
+    work_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(output_path) or ".")
+
+    try:
+        entries = []
+        segments = []
+        start_frame = 0
+        for index, item in enumerate(media_list):
+            n_frames = segment_frames(item, fps)
+            captions = segment_captions(texts, start_frame / fps, (start_frame + n_frames) / fps)
+            start_frame += n_frames
+            segment_path = os.path.join(work_dir, f"{index:03d}.mp4")
+            segments.append((item, captions, segment_path))
+            entries.append(segment_path)
+
+        def render_or_fetch(jobs):
+            """Fetch the pieces of jobs from the cache, render the others; returns how many were rendered."""
+            misses = []
+            for item, captions, segment_path in jobs:
+                key = segment_key(item, captions, size, fps, profile, text_options)
+                if not cache.fetch(key, segment_path):
+                    misses.append((key, (item, captions, segment_path)))
+            render_segments([job for _, job in misses], size, fps, profile, text_options, workers)
+            for key, (_, _, segment_path) in misses:
+                cache.put(key, segment_path)
+            return len(misses)
+
+        copied = {}  # segment_path -> probe of the remuxed clip
+        for item, captions, segment_path in segments:
+            if copyable_clip(item, captions, size, fps):
+                copied[segment_path] = probe_media(copy_clip(item[0], segment_path))
+        rendered = render_or_fetch([job for job in segments if job[2] not in copied])
+
+        # The pieces must share their encoding parameters to be joined without
+        # re-encoding: clips that differ from the rendered pieces (or, if every
+        # segment is a clip, from the first one) are rendered after all
+        if copied:
+            others = [path for path in entries if path not in copied]
+            reference = probe_media(others[0]) if others else copied[entries[0]]
+            mismatched = [job for job in segments
+                          if job[2] in copied and not concat_compatible([reference, copied[job[2]]])]
+            for _, _, segment_path in mismatched:
+                del copied[segment_path]
+            rendered += render_or_fetch(mismatched)
+        annotate(segments=len(media_list), segments_rendered=rendered, segments_copied=len(copied))
+
+        video_path = os.path.join(work_dir, "video.mp4")
+        concat_segments(entries, video_path, profile)
+
+        if bg_music_path and not os.path.exists(bg_music_path):
+            bg_music_path = None
+        mux_audio(video_path, audio_path, output_path, start_frame / fps, bg_music_path, bg_volume, profile)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Video saved as {output_path} ({rendered}/{len(media_list)} segments rendered, "
+          f"{len(copied)} stream-copied, the rest from cache)")
+    return output_path
+
+if __name__ == "__main__":
+    # Worker entry point of render_segment_process
+    job = json.loads(sys.argv[1])
+    render_segment(job["item"], job["captions"], job["output_path"], tuple(job["size"]), job["fps"],
+                   job["profile"], job["text_options"])
@@ -1,15 +1,9 @@
-from google import genai
-from app.utils import read_prompt
+from app.utils import read_prompt, get_gemini_manager, get_plan_cache
 from dotenv import load_dotenv
-import os
 
 load_dotenv()  # take environment variables from .env.
 
-api_key = os.getenv("GEMINI_API_KEY")
-
-def generate_script_from_prompt(segments: list[str], main_prompt: str) -> list[str]:
-    client = genai.Client(api_key=api_key)
-
+def generate_script_from_prompt(segments: list[str], main_prompt: str, use_cache: bool = True) -> list[str]:
     # Your segment list (provided as context)
     segments_context = segments
 
@@ -20,36 +14,37 @@ def generate_script_from_prompt(segments: list[str], main_prompt: str) -> list[s
 
     Generate a voice-over script for each segment with appropriate timing."""
 
-    response = client.models.generate_content(
-        model="gemini-2.5-pro",
-        config={
-            "system_instruction": read_prompt("script_generator_prompt"),
-            "response_mime_type": "application/json",
-            "response_schema": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "start_time": {
-                            "type": "number",
-                            "description": "Starting timestamp in seconds"
-                        },
-                        "end_time": {
-                            "type": "number",
-                            "description": "Ending timestamp in seconds"
-                        },
-                        "script": {
-                            "type": "string",
-                            "description": "The narration text to be spoken during this time period"
-                        }
+    model = "gemini-2.5-pro"
+    config = {
+        "system_instruction": read_prompt("script_generator_prompt"),
+        "response_mime_type": "application/json",
+        "response_schema": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "start_time": {
+                        "type": "number",
+                        "description": "Starting timestamp in seconds"
                     },
-                    "required": ["start_time", "end_time", "script"]
-                }
+                    "end_time": {
+                        "type": "number",
+                        "description": "Ending timestamp in seconds"
+                    },
+                    "script": {
+                        "type": "string",
+                        "description": "The narration text to be spoken during this time period"
+                    }
+                },
+                "required": ["start_time", "end_time", "script"]
             }
-        },
-        contents=input_text,
-    )
+        }
+    }
+
+    # Identical requests are answered from the plan cache (use_cache=False for a fresh script)
+    def generate():
+        response = get_gemini_manager().generate_content(model=model, config=config, contents=input_text)
+        return response.parsed
 
-    # Parse the response
-    script_segments = response.parsed
+    script_segments = get_plan_cache().memoize(model, config, input_text, generate, use_cache)
     return script_segments
\ No newline at end of file
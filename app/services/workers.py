@@ -0,0 +1,134 @@
+import os
+import socket
+import threading
+import time
+from app.services.batch import run_job, make_stage_limits, DEFAULT_STAGE_LIMITS
+from app.services.pipeline import DONE
+
+class WorkerPool:
+    """
+    Background threads that take jobs from a JobQueue and run the video
+    pipeline on them (see run_job), storing per-stage progress and the result
+    back in the queue.
+
+    Several pools, in one or more processes, can serve the same queue; the
+    stage limits apply per pool. Running jobs are heartbeated, so jobs of a
+    pool that dies are picked up again by the others.
+
+    Args:
+        queue: JobQueue to serve
+        workers: Number of jobs run at the same time (default: API_WORKERS or 2)
+        stage_limits: Dict stage name -> max concurrent runs (default: DEFAULT_STAGE_LIMITS)
+        publish_dir: Directory finished videos are published to
+        profile: Encoder profile of the final renders
+        poll_interval: Seconds an idle worker waits before checking the queue again
+        heartbeat_interval: Seconds between heartbeats of running jobs
+        finish_attempts: Tries at storing a job's result before leaving it to the stale requeue
+    """
+
+    def __init__(self, queue, workers=None, stage_limits=None, publish_dir="public/outputs", profile='final',
+                 poll_interval=1.0, heartbeat_interval=15.0, finish_attempts=3):
+        self.queue = queue
+        self.workers = workers if workers is not None else int(os.getenv("API_WORKERS", "2"))
+        self.stage_limits = make_stage_limits(DEFAULT_STAGE_LIMITS if stage_limits is None else stage_limits)
+        self.publish_dir = publish_dir
+        self.profile = profile
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.finish_attempts = finish_attempts
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(f"{self.name}/{i}",),
+                                      name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.workers:
+            threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+        return self
+
+    def stop(self, wait=True):
+        """Stop taking new jobs; with wait=True, block until the running ones finish."""
+        self._stop.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self, worker):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker)
+            except Exception as e:
+                print(f"✗ Worker {worker} could not read the job queue: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                # Never let one job take the worker down; the job is requeued once its heartbeat goes stale
+                print(f"✗ Worker {worker} lost job {job['id']}: {e}")
+
+    def _run(self, job):
+        job_id = job["id"]
+        with self._lock:
+            self._running.add(job_id)
+        print(f"→ Job {job_id} started")
+        try:
+            record = run_job(
+                {**job["params"], "id": job_id},
+                stage_limits=self.stage_limits,
+                publish_dir=self.publish_dir,
+                profile=self.profile,
+                on_update=lambda _job, stage, state, states: self._update_stages(job_id, states),
+            )
+            if not self._finish(job_id, record):
+                return
+            mark = "✓" if record["status"] == DONE else "✗"
+            print(f"{mark} Job {job_id} {record['status']} in {record['elapsed_s']:.0f}s")
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _update_stages(self, job_id, states):
+        # Progress is best effort: a failed write must not fail the job
+        try:
+            self.queue.update_stages(job_id, states)
+        except Exception as e:
+            print(f"✗ Job {job_id}: could not store stage progress: {e}")
+
+    def _finish(self, job_id, record):
+        """
+        Store a job's result, retrying transient errors (e.g. a locked database).
+        Returns False if it could not be stored: the job then stays running
+        without heartbeats, so claim() requeues it once it goes stale.
+        """
+        for attempt in range(1, self.finish_attempts + 1):
+            try:
+                self.queue.finish(job_id, record["status"], record["output"], record["error"], record["stages"])
+                return True
+            except Exception as e:
+                print(f"✗ Job {job_id}: could not store the result (attempt {attempt}/{self.finish_attempts}): {e}")
+                if attempt < self.finish_attempts:
+                    time.sleep(attempt)
+        return False
+
+    def _heartbeat(self):
+        # Keeps going after stop() until the last running job has finished
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                running = list(self._running)
+            if self._stop.is_set() and not running:
+                return
+            try:
+                self.queue.heartbeat(running)
+            except Exception as e:
+                print(f"✗ Heartbeat failed: {e}")
@@ -1,5 +1,50 @@
-from app.utils.file_handler import *
+"""
+Shared helpers: caches, workspaces, encoder settings, API clients, tracing.
 
-__all__ = [
-    read_prompt
-]
\ No newline at end of file
+Names are loaded lazily, like app.services: `from app.utils import span`
+only imports the module that defines it, so importing the pipeline or the
+API server does not pull in google-genai or SQLite until they are used.
+"""
+import importlib
+
+# Public name -> module that defines it
+_EXPORTS = {
+    "read_prompt": "app.utils.file_handler",
+    "atomic_path": "app.utils.file_handler",
+    "AssetCache": "app.utils.asset_cache",
+    "get_asset_cache": "app.utils.asset_cache",
+    "file_digest": "app.utils.asset_cache",
+    "JobWorkspace": "app.utils.workspace",
+    "get_job_slots": "app.utils.workspace",
+    "sweep_workspaces": "app.utils.workspace",
+    "ENCODER_PROFILES": "app.utils.encoder_profiles",
+    "encoder_threads": "app.utils.encoder_profiles",
+    "get_encoder_profile": "app.utils.encoder_profiles",
+    "moviepy_write_args": "app.utils.encoder_profiles",
+    "ffmpeg_video_args": "app.utils.encoder_profiles",
+    "ffmpeg_audio_args": "app.utils.encoder_profiles",
+    "KeyPool": "app.utils.key_pool",
+    "JobQueue": "app.utils.job_queue",
+    "LocalConnections": "app.utils.sqlite_db",
+    "Transaction": "app.utils.sqlite_db",
+    "GeminiClientManager": "app.utils.genai_client",
+    "get_gemini_manager": "app.utils.genai_client",
+    "Trace": "app.utils.tracing",
+    "span": "app.utils.tracing",
+    "annotate": "app.utils.tracing",
+    "current_trace": "app.utils.tracing",
+    "trace_job": "app.utils.tracing",
+    "JsonArrayParser": "app.utils.json_stream",
+    "PlanCache": "app.utils.plan_cache",
+    "get_plan_cache": "app.utils.plan_cache",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from app.utils.file_handler import atomic_path
+
+# Share of max_bytes freed beyond the bound when evicting
+EVICT_HEADROOM = 0.1
+
+class AssetCache:
+    """
+    On-disk content-addressed cache for generated assets (images, clips, audio).
+
+    Entries are keyed on a hash of the inputs that produced them (model, prompt,
+    duration, aspect ratio, voice, ...) and stored as
+    <cache_dir>/<key[:2]>/<key><suffix>. Hits refresh the file's mtime, and the
+    least recently used entries are evicted once the cache grows past max_bytes.
+    The size is tracked as entries are written, so the directory is only
+    scanned when the bound is crossed or every rescan_interval seconds.
+    """
+
+    def __init__(self, cache_dir="public/cache/assets", max_bytes=2 * 1024 ** 3, rescan_interval=300):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._size = None  # bytes in the cache as of the last scan plus later writes; None before the first scan
+        self._scanned_at = 0.0
+
+    @staticmethod
+    def make_key(*parts):
+        """Hash the given inputs into a cache key."""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def get(self, key, suffix):
+        """Return the cached file path for key, or None on a miss."""
+        path = self._path(key, suffix)
+        with self._lock:
+            if os.path.exists(path):
+                self.hits += 1
+                os.utime(path)  # mark as recently used
+                return path
+            self.misses += 1
+            return None
+
+    def fetch(self, key, dest_path):
+        """
+        Copy the cached entry for key to dest_path.
+        Returns True on a hit, False on a miss.
+        """
+        cached = self.get(key, os.path.splitext(dest_path)[1])
+        if cached is None:
+            return False
+        try:
+            with atomic_path(dest_path) as tmp_path:
+                shutil.copyfile(cached, tmp_path)
+        except FileNotFoundError:
+            # Evicted between lookup and copy
+            return False
+        print(f"✓ Cache hit: {dest_path}")
+        return True
+
+    def _store(self, key, suffix, write):
+        """Write an entry through a unique temp file (write(f) fills it) so readers never see a partial file."""
+        path = self._path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=key, suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._added(os.path.getsize(path) - replaced)
+        return path
+
+    def put(self, key, src_path):
+        """Store a copy of src_path under key and return the cached path."""
+        def write(f):
+            with open(src_path, "rb") as src:
+                shutil.copyfileobj(src, f, 1024 * 1024)
+        return self._store(key, os.path.splitext(src_path)[1], write)
+
+    def put_bytes(self, key, data, suffix):
+        """Store data (e.g. an in-memory file) under key and return the cached path."""
+        return self._store(key, suffix, lambda f: f.write(data))
+
+    def _added(self, nbytes):
+        """
+        Account for a write. The cache directory is only scanned (evict()) when
+        the tracked size goes past max_bytes, or every rescan_interval seconds
+        to pick up what other processes sharing the cache have written.
+        """
+        with self._lock:
+            if self._size is not None:
+                self._size += nbytes
+            due = (self._size is None or self._size > self.max_bytes
+                   or time.monotonic() - self._scanned_at > self.rescan_interval)
+        if due:
+            self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits in max_bytes,
+        with EVICT_HEADROOM to spare so the next writes do not scan again.
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return  # another thread is already scanning
+        try:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+
+            entries.sort()
+            target = self.max_bytes if total <= self.max_bytes else self.max_bytes * (1 - EVICT_HEADROOM)
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+            with self._lock:
+                self._size = total
+                self._scanned_at = time.monotonic()
+        finally:
+            self._evict_lock.release()
+
+    def stats(self):
+        """Return hit/miss counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+@lru_cache(maxsize=1024)
+def _file_digest(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def file_digest(path):
+    """
+    sha256 of a file's contents, for cache keys that depend on an input file.
+    Memoized on (path, size, mtime), so unchanged files are hashed once per process.
+    """
+    st = os.stat(path)
+    return _file_digest(os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+_asset_cache = None
+_asset_cache_lock = threading.Lock()
+
+def get_asset_cache():
+    """
+    Return the process-wide AssetCache, configured from the environment:
+        ASSET_CACHE_DIR     cache directory (default public/cache/assets)
+        ASSET_CACHE_MAX_MB  size bound in megabytes (default 2048)
+    """
+    global _asset_cache
+    with _asset_cache_lock:
+        if _asset_cache is None:
+            _asset_cache = AssetCache(
+                cache_dir=os.getenv("ASSET_CACHE_DIR", "public/cache/assets"),
+                max_bytes=int(os.getenv("ASSET_CACHE_MAX_MB", "2048")) * 1024 ** 2,
+            )
+        return _asset_cache
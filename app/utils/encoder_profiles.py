@@ -0,0 +1,65 @@
+import os
+
+# Named x264/AAC settings used by every encode in the pipeline.
+#   draft:   fast intermediates and throwaway renders
+#   preview: quick full-quality-ish renders for review
+#   final:   delivered video
+# A profile may also set "bitrate" (-b:v) for constant-bitrate experiments,
+# but CRF is the rate control used by default.
+ENCODER_PROFILES = {
+    "draft": {"preset": "ultrafast", "crf": 23, "audio_bitrate": "128k"},
+    "preview": {"preset": "veryfast", "crf": 23, "audio_bitrate": "128k"},
+    "final": {"preset": "medium", "crf": 20, "audio_bitrate": "192k"},
+}
+
+def encoder_threads():
+    """Encoder thread count: ENCODER_THREADS if set, otherwise the number of CPU cores."""
+    threads = os.getenv("ENCODER_THREADS")
+    if threads:
+        return int(threads)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def get_encoder_profile(profile="final"):
+    """
+    Resolve a profile name (see ENCODER_PROFILES) or a custom profile dict.
+    """
+    if isinstance(profile, dict):
+        return {**ENCODER_PROFILES["final"], **profile}
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile '{profile}'. Use one of: {', '.join(ENCODER_PROFILES)}")
+    return ENCODER_PROFILES[profile]
+
+def moviepy_write_args(profile="final"):
+    """Keyword arguments for MoviePy's write_videofile."""
+    settings = get_encoder_profile(profile)
+    args = dict(
+        codec='libx264',
+        audio_codec='aac',
+        preset=settings["preset"],
+        threads=encoder_threads(),
+        audio_bitrate=settings["audio_bitrate"],
+        ffmpeg_params=['-crf', str(settings["crf"])],
+    )
+    if settings.get("bitrate"):
+        args["bitrate"] = settings["bitrate"]
+    return args
+
+def ffmpeg_video_args(profile="final"):
+    """ffmpeg command line arguments for the video encoder."""
+    settings = get_encoder_profile(profile)
+    args = [
+        "-c:v", "libx264",
+        "-preset", settings["preset"],
+        "-crf", str(settings["crf"]),
+        "-threads", str(encoder_threads()),
+    ]
+    if settings.get("bitrate"):
+        args += ["-b:v", settings["bitrate"]]
+    return args
+
+def ffmpeg_audio_args(profile="final"):
+    """ffmpeg command line arguments for the audio encoder."""
+    settings = get_encoder_profile(profile)
+    return ["-c:a", "aac", "-b:a", settings["audio_bitrate"]]
@@ -1,11 +1,53 @@
+import contextlib
+import os
+import tempfile
+import threading
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+
+_prompts = {}  # path -> (mtime_ns, text)
+_prompts_lock = threading.Lock()
+
 def read_prompt(prompt_name: str) -> str:
+    """
+    Text of app/prompts/<prompt_name>.txt, whatever the working directory.
+    Files are read once per process and re-read when their mtime changes, so
+    edited prompts are picked up without a restart.
+    """
     try:
-        path = f"app/prompts/{prompt_name}.txt"
-        with open(path) as file:
-            return file.read()
+        path = os.path.join(PROMPTS_DIR, f"{prompt_name}.txt")
+        mtime = os.stat(path).st_mtime_ns
+        with _prompts_lock:
+            cached = _prompts.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        with open(path, encoding="utf-8") as file:
+            text = file.read()
+        with _prompts_lock:
+            _prompts[path] = (mtime, text)
+        return text
     except Exception as e:
         print(f"Error while reading prompt: {e}")
 
+@contextlib.contextmanager
+def atomic_path(path):
+    """
+    Write a file in one step: yields a unique temp path next to path, which
+    replaces path when the block completes and is removed if it raises. Readers
+    never see a partial file, and of two writers racing for the same path the
+    last one to finish wins.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".part", dir=directory)
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 if __name__ == "__main__":
     prompt = read_prompt("test")
-    print(prompt)
\ No newline at end of file
+    print(prompt)
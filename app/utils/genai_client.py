@@ -0,0 +1,218 @@
+import contextlib
+import os
+import random
+import threading
+import time
+from app.utils.key_pool import KeyPool
+from app.utils.tracing import span
+
+# Max requests in flight per model, shared by every job in the process
+MODEL_LIMITS = {
+    "gemini-2.5-pro": int(os.getenv("GEMINI_TEXT_CONCURRENCY", "4")),
+    "gemini-2.5-flash-image": int(os.getenv("IMAGE_CONCURRENCY", "4")),
+    "gemini-2.5-flash-preview-tts": int(os.getenv("GEMINI_TTS_CONCURRENCY", "2")),
+}
+DEFAULT_MODEL_LIMIT = 4
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+def get_gemini_api_keys():
+    """GEMINI_API_KEY plus GEMINI_API_KEY1-4 from the environment, without duplicates."""
+    keys = []
+    for name in ["GEMINI_API_KEY"] + [f"GEMINI_API_KEY{i}" for i in range(1, 5)]:
+        key = os.getenv(name)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+def _error_status(error):
+    """(HTTP status or None, Retry-After seconds or None, transient?) of a failed call."""
+    import httpx
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        retry_after = None
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            retry_after = float(headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            pass
+        return error.code, retry_after, error.code in TRANSIENT_STATUSES
+    if isinstance(error, httpx.TransportError):
+        # Connection reset, timeout, ...: says nothing about the key
+        return None, None, True
+    return None, None, False
+
+class GeminiClientManager:
+    """
+    One place for every Gemini API call.
+
+    Owns a long-lived google-genai client per API key (each with its own
+    keep-alive connection pool), so calls reuse connections instead of paying
+    a TLS handshake each. Requests are spread over the keys by a KeyPool (a key
+    that returns 429 rests for Retry-After or rate_limit_cooldown seconds), each
+    model has a concurrency limit shared by all callers, and transient failures
+    (429, 5xx, timeouts, dropped connections) are retried with exponential
+    back-off and jitter. google.genai is imported on first use.
+
+    Usage:
+        gemini = get_gemini_manager()
+        response = gemini.generate_content(model="gemini-2.5-pro", contents=text, config=config)
+        for chunk in gemini.generate_content_stream(model="gemini-2.5-pro", contents=text, config=config):
+            ...
+
+    Args:
+        api_keys: Gemini API keys (default: get_gemini_api_keys())
+        model_limits: Dict model -> max requests in flight (default: MODEL_LIMITS)
+        default_limit: Limit of models not in model_limits
+        max_attempts: Attempts per call, including the first
+        base_delay: Back-off before the first retry, in seconds (doubles per retry)
+        max_delay: Max back-off between attempts, in seconds
+        max_connections: Connection pool size of each client
+        rate_limit_cooldown: Seconds a key rests after a 429 without Retry-After
+    """
+
+    def __init__(self, api_keys=None, model_limits=None, default_limit=DEFAULT_MODEL_LIMIT, max_attempts=4,
+                 base_delay=2.0, max_delay=30.0, max_connections=20, rate_limit_cooldown=60.0):
+        keys = api_keys if api_keys is not None else get_gemini_api_keys()
+        # Other errors are handled by the back-off, not by resting the key
+        self.key_pool = KeyPool(keys, rate_limit_cooldown=rate_limit_cooldown, error_cooldown=0.0)
+        self.model_limits = dict(MODEL_LIMITS if model_limits is None else model_limits)
+        self.default_limit = default_limit
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_connections = max_connections
+
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._limits = {}
+
+    def client(self, api_key):
+        """The shared google-genai client of api_key."""
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                import httpx
+                from google import genai
+                from google.genai import types
+
+                limits = httpx.Limits(max_connections=self.max_connections,
+                                      max_keepalive_connections=self.max_connections)
+                client = self._clients[api_key] = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(client_args={"limits": limits}),
+                )
+            return client
+
+    def limit(self, model):
+        """Semaphore bounding the requests in flight to model."""
+        with self._lock:
+            semaphore = self._limits.get(model)
+            if semaphore is None:
+                limit = self.model_limits.get(model, self.default_limit)
+                semaphore = self._limits[model] = threading.BoundedSemaphore(max(1, limit))
+            return semaphore
+
+    def _acquire_key(self):
+        """Take the least busy key, waiting for a cooldown to end if every key is resting."""
+        while True:
+            api_key = self.key_pool.acquire()
+            if api_key is not None:
+                return api_key
+            wait = self.key_pool.cooldown_remaining()
+            print(f"→ All Gemini API keys cooling down, retrying in {wait:.0f}s...")
+            time.sleep(wait)
+
+    def call(self, model, func, hold_slot=True):
+        """
+        Run func(client) under model's concurrency limit, on the least busy key,
+        retrying transient failures. Returns func's result; the last error is
+        raised once the attempts are used up, other errors right away.
+        hold_slot=False skips the concurrency limit, for callers already holding it.
+        """
+        return self._call(model, func, hold_slot)[0]
+
+    def _call(self, model, func, hold_slot=True, keep_key=False):
+        """
+        call(), returning (result, api_key). With keep_key the key of the
+        successful attempt stays taken: the caller releases it with
+        key_pool.release() once it is done with the response (e.g. a stream).
+        """
+        if not len(self.key_pool):
+            raise RuntimeError("No Gemini API key set (GEMINI_API_KEY)")
+
+        for attempt in range(1, self.max_attempts + 1):
+            api_key = self._acquire_key()
+            status, retry_after = None, None
+            try:
+                with span(model, "llm", key=self.key_pool.label(api_key), attempt=attempt) as s:
+                    waited = time.perf_counter()
+                    with self.limit(model) if hold_slot else contextlib.nullcontext():
+                        s.set(queue_wait_s=round(time.perf_counter() - waited, 3))
+                        result = func(self.client(api_key))
+                status = 200
+                return result, api_key
+            except Exception as e:
+                status, retry_after, transient = _error_status(e)
+                if not transient or attempt == self.max_attempts:
+                    raise
+                error = e
+            finally:
+                if not (keep_key and status == 200):
+                    self.key_pool.release(api_key, status, retry_after)
+
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+            delay = random.uniform(delay / 2, delay)
+            print(f"⚠ {model} call with key {self.key_pool.label(api_key)} failed ({error}), "
+                  f"retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def generate_content(self, model, contents, config=None):
+        """client.models.generate_content through call()."""
+        return self.call(model, lambda client: client.models.generate_content(
+            model=model, contents=contents, config=config))
+
+    def generate_content_stream(self, model, contents, config=None):
+        """
+        Yield the chunks of client.models.generate_content_stream. Opening the
+        stream (up to the first chunk) goes through call(), so it is retried
+        like any call; an error once chunks have been yielded is raised as is.
+        The model's concurrency slot and the API key are held until the stream
+        is exhausted or closed, and a mid-stream error (e.g. a 429) is recorded
+        against the key.
+        """
+        def start(client):
+            chunks = iter(client.models.generate_content_stream(model=model, contents=contents, config=config))
+            return chunks, next(chunks, None)  # the request is sent on the first read
+
+        with self.limit(model):
+            (chunks, first), api_key = self._call(model, start, hold_slot=False, keep_key=True)
+            status, retry_after = 200, None
+            try:
+                if first is None:
+                    return
+                yield first
+                yield from chunks
+            except Exception as e:
+                status, retry_after, _ = _error_status(e)
+                raise
+            finally:
+                self.key_pool.release(api_key, status, retry_after)
+
+    def stats(self):
+        """Per-key usage counters (see KeyPool.stats)."""
+        return self.key_pool.stats()
+
+_gemini_manager = None
+_gemini_manager_lock = threading.Lock()
+
+def get_gemini_manager():
+    """Return the process-wide GeminiClientManager (configured from the environment)."""
+    global _gemini_manager
+    with _gemini_manager_lock:
+        if _gemini_manager is None:
+            _gemini_manager = GeminiClientManager()
+        return _gemini_manager
@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from app.utils.sqlite_db import LocalConnections
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    params       TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    stages       TEXT NOT NULL DEFAULT '{}',
+    timings      TEXT NOT NULL DEFAULT '{}',
+    output       TEXT,
+    error        TEXT,
+    worker       TEXT,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    created_at   REAL NOT NULL,
+    started_at   REAL,
+    finished_at  REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+class JobQueue:
+    """
+    Persistent FIFO of render jobs in a local SQLite file, shared by the API
+    server and any number of worker threads or processes on the same host.
+
+    A job moves queued -> running -> done | failed (or queued -> cancelled).
+    Workers claim() the oldest queued job atomically and heartbeat() the jobs
+    they run; a running job whose heartbeat is older than stale_after seconds
+    (its worker died) goes back to the queue on the next claim(), up to
+    max_attempts times.
+
+    Args:
+        path: SQLite database file (default: JOB_DB_PATH or public/jobs.db)
+        stale_after: Seconds without heartbeat before a running job is requeued
+        max_attempts: Attempts before a job whose worker keeps dying is failed
+    """
+
+    def __init__(self, path=None, stale_after=120.0, max_attempts=3):
+        self.path = path or os.getenv("JOB_DB_PATH", "public/jobs.db")
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._connections = LocalConnections(self.path, row_factory=sqlite3.Row)
+        self._connect = self._connections.connect
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the database connections of every thread."""
+        self._connections.close()
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("params", "stages", "timings"):
+            job[field] = json.loads(job[field])
+        return job
+
+    def submit(self, params, job_id=None):
+        """Queue a job with the given parameters (JSON-serializable dict). Returns its id."""
+        job_id = job_id or uuid.uuid4().hex[:12]
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, params, status, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, json.dumps(params), QUEUED, time.time()),
+            )
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as db:
+            return self._to_dict(db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, status=None, limit=50):
+        """Most recent jobs first, optionally only those in one status."""
+        query, args = "SELECT * FROM jobs", []
+        if status:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with self._connect() as db:
+            return [self._to_dict(row) for row in db.execute(query, args)]
+
+    def position(self, job_id):
+        """Number of queued jobs ahead of a queued job (None if it is not queued)."""
+        with self._connect() as db:
+            row = db.execute("SELECT status, created_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] != QUEUED:
+                return None
+            return db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (QUEUED, row["created_at"])
+            ).fetchone()[0]
+
+    def counts(self):
+        """Number of jobs per status."""
+        with self._connect() as db:
+            return {row["status"]: row["n"] for row in
+                    db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    def claim(self, worker):
+        """
+        Take the oldest queued job for worker and mark it running.
+        Stale running jobs are requeued (or failed) first.
+        Returns the job dict, or None if the queue is empty.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            stale = now - self.stale_after
+            db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = 'Worker stopped responding' "
+                "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                (FAILED, now, RUNNING, stale, self.max_attempts),
+            )
+            db.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, stages = '{}' WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, stale),
+            )
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ? "
+                "WHERE id = ?",
+                (RUNNING, worker, now, now, row["id"]),
+            )
+            return self._to_dict(db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def heartbeat(self, job_ids):
+        """Mark running jobs as still alive."""
+        if not job_ids:
+            return
+        with self._connect() as db:
+            db.executemany("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                           [(time.time(), job_id, RUNNING) for job_id in job_ids])
+
+    def update_stages(self, job_id, stages):
+        """Store the per-stage states of a running job (dict stage name -> state)."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET stages = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                       (json.dumps(stages), time.time(), job_id, RUNNING))
+
+    def finish(self, job_id, status, output=None, error=None, timings=None):
+        """Record the outcome of a running job (status DONE or FAILED)."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, output = ?, error = ?, timings = ?, finished_at = ? "
+                "WHERE id = ? AND status = ?",
+                (status, output, error, json.dumps(timings or {}), time.time(), job_id, RUNNING),
+            )
+
+    def cancel(self, job_id):
+        """Cancel a queued job. Returns False if it does not exist or is no longer queued."""
+        with self._connect() as db:
+            cursor = db.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                                (CANCELLED, time.time(), job_id, QUEUED))
+            return cursor.rowcount == 1
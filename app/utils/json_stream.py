@@ -0,0 +1,89 @@
+import json
+
+class JsonArrayParser:
+    """
+    Incremental parser for a JSON array that arrives in pieces (e.g. a
+    streamed model response). feed() returns the elements completed by each
+    piece, so a consumer can act on the first elements while the rest is
+    still being written. Anything before the opening '[' is ignored.
+
+    Usage:
+        parser = JsonArrayParser()
+        for chunk in chunks:
+            for item in parser.feed(chunk):
+                handle(item)
+        parser.close()
+
+    Raises:
+        ValueError (json.JSONDecodeError): From feed() on an invalid element,
+        from close() if the array never ended
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0             # next character of _buffer to scan
+        self._depth = 0           # nesting depth; inside the array it is 1
+        self._in_string = False
+        self._escape = False
+        self._item_start = None   # offset in _buffer of the element being read
+        self.done = False
+
+    def _flush(self, end, items):
+        if self._item_start is not None:
+            text = self._buffer[self._item_start:end].strip()
+            if text:
+                items.append(json.loads(text))
+            self._item_start = None
+
+    def feed(self, text):
+        """Add the next piece of the document; returns the list of elements it completed."""
+        self._buffer += text
+        buffer = self._buffer
+        items = []
+        i = self._pos
+        while i < len(buffer) and not self.done:
+            c = buffer[i]
+            if self._depth == 0:
+                if c == "[":
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._item_start is None:
+                    self._item_start = i
+            elif c in "[{":
+                if self._depth == 1 and self._item_start is None:
+                    self._item_start = i
+                self._depth += 1
+            elif c in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._flush(i, items)  # a last scalar element
+                    self.done = True
+                elif self._depth == 1:
+                    self._flush(i + 1, items)
+            elif self._depth == 1:
+                if c == ",":
+                    self._flush(i, items)
+                elif self._item_start is None and not c.isspace():
+                    self._item_start = i  # number, true, false or null
+            i += 1
+
+        # Drop what has been consumed, keep the element being read
+        keep = i if self._item_start is None else self._item_start
+        self._buffer = buffer[keep:]
+        self._pos = i - keep
+        if self._item_start is not None:
+            self._item_start = 0
+        return items
+
+    def close(self):
+        """Check that the array was complete."""
+        if not self.done:
+            raise ValueError("The JSON array ended before its closing ']'")
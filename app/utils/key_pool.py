@@ -0,0 +1,100 @@
+import threading
+import time
+
+class KeyPool:
+    """
+    Spreads concurrent requests over several API keys.
+
+    acquire() hands out the key with the fewest requests in flight (ties go to
+    the key used least overall), skipping keys that are cooling down. release()
+    records the outcome: a 429 puts the key on cooldown for Retry-After or
+    rate_limit_cooldown seconds, any other non-200 status for error_cooldown
+    seconds. Thread-safe; keys never appear in stats or logs, only their
+    labels (#1, #2, ...).
+
+    Args:
+        keys: API keys, in priority order
+        rate_limit_cooldown: Seconds a key rests after a 429 without Retry-After
+        error_cooldown: Seconds a key rests after any other non-200 status
+    """
+
+    def __init__(self, keys, rate_limit_cooldown=60.0, error_cooldown=15.0):
+        self.keys = list(keys)
+        self.rate_limit_cooldown = rate_limit_cooldown
+        self.error_cooldown = error_cooldown
+        self._lock = threading.Lock()
+        self._labels = {key: f"#{i}" for i, key in enumerate(self.keys, 1)}
+        self._usage = {
+            key: {"in_flight": 0, "requests": 0, "successes": 0, "failures": 0, "rate_limited": 0}
+            for key in self.keys
+        }
+        self._cooldown_until = {key: 0.0 for key in self.keys}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def label(self, key):
+        return self._labels[key]
+
+    def acquire(self, exclude=()):
+        """Take the least busy available key, or None if every key is excluded or cooling down."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                key for key in self.keys
+                if key not in exclude and self._cooldown_until[key] <= now
+            ]
+            if not candidates:
+                return None
+            key = min(candidates, key=lambda k: (self._usage[k]["in_flight"], self._usage[k]["requests"]))
+            self._usage[key]["in_flight"] += 1
+            self._usage[key]["requests"] += 1
+            return key
+
+    def release(self, key, status=200, retry_after=None):
+        """
+        Return a key taken with acquire().
+
+        Args:
+            status: HTTP (or API) status of the request; None if the outcome
+                    says nothing about the key (e.g. a network error)
+            retry_after: Optional Retry-After seconds sent with a 429
+        """
+        with self._lock:
+            usage = self._usage[key]
+            usage["in_flight"] -= 1
+            if status is None:
+                return
+            if status == 200:
+                usage["successes"] += 1
+                return
+
+            usage["failures"] += 1
+            if status == 429:
+                usage["rate_limited"] += 1
+                cooldown = retry_after if retry_after is not None else self.rate_limit_cooldown
+            else:
+                cooldown = self.error_cooldown
+            self._cooldown_until[key] = max(self._cooldown_until[key], time.monotonic() + cooldown)
+
+    def cooldown_remaining(self, exclude=()):
+        """Seconds until a key outside exclude is available again (None if there is none)."""
+        now = time.monotonic()
+        with self._lock:
+            remaining = [
+                max(0.0, self._cooldown_until[key] - now)
+                for key in self.keys if key not in exclude
+            ]
+        return min(remaining) if remaining else None
+
+    def stats(self):
+        """Per-key usage counters, keyed by label."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                self._labels[key]: {
+                    **usage,
+                    "cooldown_s": round(max(0.0, self._cooldown_until[key] - now), 1),
+                }
+                for key, usage in self._usage.items()
+            }
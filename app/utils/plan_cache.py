@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from app.utils.sqlite_db import LocalConnections
+from app.utils.tracing import annotate
+
+# Bump when the format of the cached planner/script responses changes
+PLAN_CACHE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    key        TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_used_at ON plans (used_at);
+"""
+
+class PlanCache:
+    """
+    Persistent memo of planning model responses (segment prompts, scripts,
+    combined plans) in a local SQLite file, so reruns of the same prompt (batch
+    reruns, retries, A/B renders) skip the Gemini call.
+
+    Entries are keyed on the model, a hash of the system prompt, the response
+    schema, the request contents and PLAN_CACHE_VERSION, so editing a prompt
+    file or a schema invalidates the entries made with the old one. Entries
+    expire ttl seconds after they were stored, and the least recently used
+    ones are evicted beyond max_entries.
+
+    Args:
+        path: SQLite database file (default: PLAN_CACHE_PATH or public/cache/plans.db)
+        ttl: Seconds an entry stays valid
+        max_entries: Size bound of the cache
+    """
+
+    def __init__(self, path=None, ttl=7 * 24 * 3600, max_entries=1000):
+        self.path = path or os.getenv("PLAN_CACHE_PATH", "public/cache/plans.db")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._connections = LocalConnections(self.path)
+        self._connect = self._connections.connect
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the database connections of every thread."""
+        self._connections.close()
+
+    @staticmethod
+    def make_key(model, config, contents):
+        """Cache key of a generate_content request."""
+        config = config or {}
+        system_prompt = config.get("system_instruction") or ""
+        payload = json.dumps([
+            PLAN_CACHE_VERSION,
+            model,
+            hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+            config.get("response_schema"),
+            contents,
+        ], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM plans WHERE key = ? AND created_at > ?",
+                             (key, now - self.ttl)).fetchone()
+            if row is not None:
+                db.execute("UPDATE plans SET used_at = ? WHERE key = ?", (now, key))
+        self._count(row is not None)
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key, model, value):
+        """Store a JSON-serializable value under key, then enforce the TTL and size bounds."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "INSERT OR REPLACE INTO plans (key, model, value, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(value), now, now),
+            )
+            db.execute("DELETE FROM plans WHERE created_at <= ?", (now - self.ttl,))
+            db.execute(
+                "DELETE FROM plans WHERE key NOT IN (SELECT key FROM plans ORDER BY used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def memoize(self, model, config, contents, compute, use_cache=True):
+        """
+        Return compute() for this request, from the cache when possible.
+        With use_cache=False the lookup is skipped (a fresh response, e.g. for
+        more variety) and the new value replaces the cached one. None results
+        are not stored.
+        """
+        key = self.make_key(model, config, contents)
+        if use_cache:
+            value = self.get(key)
+            annotate(plan_cache="hit" if value is not None else "miss")
+            if value is not None:
+                print(f"✓ Plan cache hit ({model})")
+                return value
+        else:
+            annotate(plan_cache="bypass")
+        value = compute()
+        if value is not None:
+            self.put(key, model, value)
+        return value
+
+    def stats(self):
+        """Return hit/miss counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+_plan_cache = None
+_plan_cache_lock = threading.Lock()
+
+def get_plan_cache():
+    """
+    Return the process-wide PlanCache, configured from the environment:
+        PLAN_CACHE_PATH         SQLite file (default public/cache/plans.db)
+        PLAN_CACHE_TTL_HOURS    entry lifetime in hours (default 168)
+        PLAN_CACHE_MAX_ENTRIES  size bound (default 1000)
+    """
+    global _plan_cache
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            _plan_cache = PlanCache(
+                ttl=float(os.getenv("PLAN_CACHE_TTL_HOURS", "168")) * 3600,
+                max_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1000")),
+            )
+        return _plan_cache
@@ -0,0 +1,58 @@
+import sqlite3
+import threading
+
+class LocalConnections:
+    """
+    Per-thread connections to one SQLite file (sqlite3 connections must not be
+    used by two threads at once), in autocommit mode with WAL journaling so
+    readers do not block the writer. close() closes the connections of every
+    thread, e.g. at shutdown or at the end of a test.
+
+    Args:
+        path: SQLite database file
+        row_factory: Optional sqlite3 row factory of the connections
+    """
+
+    def __init__(self, path, row_factory=None):
+        self.path = path
+        self.row_factory = row_factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = []
+
+    def connect(self):
+        """This thread's connection, wrapped in a Transaction."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Only ever used by this thread; check_same_thread=False lets close() run anywhere
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            if self.row_factory is not None:
+                db.row_factory = self.row_factory
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            with self._lock:
+                self._all.append(db)
+        return Transaction(db)
+
+    def close(self):
+        """Close the connections of all threads; later calls open new ones."""
+        with self._lock:
+            connections, self._all = self._all, []
+        self._local = threading.local()
+        for db in connections:
+            db.close()
+
+class Transaction:
+    """Context manager committing (or rolling back) an explicit transaction on exit."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.db.in_transaction:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
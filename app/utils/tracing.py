@@ -0,0 +1,305 @@
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: no RSS high-water mark or child CPU times
+    resource = None
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+
+def _rusage():
+    """(child CPU seconds, RSS high-water mark in MB of this process), or (None, None) without resource."""
+    if resource is None:
+        return None, None
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return children.ru_utime + children.ru_stime, peak_mb
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else None
+
+def _current_rss_mb():
+    """Resident set size of this process right now in MB (Linux /proc), or None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError, TypeError):
+        return None
+
+def _track_name():
+    """Timeline row of the caller: its thread, or its asyncio task on an event loop thread."""
+    name = threading.current_thread().name
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is not None:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:  # no running event loop in this thread
+            task = None
+        if task is not None:
+            name = f"{name}/{task.get_name()}"
+    return name
+
+class Span:
+    """
+    One timed operation of a Trace. Use span() to create them.
+
+    Records wall time, CPU time of the calling thread, CPU time of child
+    processes that finished during the span (ffmpeg, render workers; with
+    several running at once each span also counts its neighbours'), the
+    process RSS at the start and end of the span (Linux only), the process's
+    RSS high-water mark so far (not specific to the span), and free-form
+    attributes (set()). In an asyncio task, the CPU time also covers the other
+    tasks of the event loop.
+    """
+
+    def __init__(self, trace, name, category, attrs):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.id = None
+        self.parent_id = None
+        self.track = None
+        self.start = None
+        self.wall_s = None
+        self.cpu_s = None
+        self.child_cpu_s = None
+        self.rss_start_mb = None
+        self.rss_end_mb = None
+        self.process_max_rss_mb = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attrs):
+        """Add attributes, e.g. span.set(polls=3)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.id = self.trace._next_id()
+        self.parent_id = parent.id if parent is not None and parent.trace is self.trace else None
+        self.track = _track_name()
+        self._token = _current_span.set(self)
+        self._child_cpu0, _ = _rusage()
+        self.rss_start_mb = _current_rss_mb()
+        self._cpu0 = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_s = time.perf_counter() - self.start
+        self.cpu_s = time.thread_time() - self._cpu0
+        child_cpu, self.process_max_rss_mb = _rusage()
+        self.rss_end_mb = _current_rss_mb()
+        if child_cpu is not None:
+            self.child_cpu_s = child_cpu - self._child_cpu0
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace._add(self)
+        return False
+
+class _NoSpan:
+    """Stands in for a Span when nothing is being traced."""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name, category="app", **attrs):
+    """
+    Context manager timing the block as a span of the active trace, nested
+    under the current span. Without an active trace it does nothing.
+
+    Usage:
+        with span("ffmpeg", "subprocess", output=path) as s:
+            ...
+            s.set(frames=n)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return Span(trace, name, category, attrs)
+
+def annotate(**attrs):
+    """Set attributes on the current span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attrs)
+
+class Trace:
+    """
+    Spans recorded for one job.
+
+    Activate it with `with trace:`; every span() opened in that context, and in
+    the threads and asyncio tasks started from it, is recorded. Thread pools do
+    not carry context over by themselves: submit with
+    pool.submit(contextvars.copy_context().run, func, ...).
+
+    Usage:
+        with Trace("job-1") as trace:
+            run_pipeline()
+        trace.save_chrome("job-1.trace.json")   # chrome://tracing or ui.perfetto.dev
+        print(trace.format_summary())
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._tokens = []
+
+    def _next_id(self):
+        return next(self._ids)
+
+    def _add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def __enter__(self):
+        self._tokens.append(_current_trace.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_trace.reset(self._tokens.pop())
+        return False
+
+    def chrome_events(self):
+        """Spans as Chrome trace events: one complete ("X") event each, one row per thread/task."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        pid = os.getpid()
+        tracks = {}
+        events = [{"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": f"job {self.name}"}}]
+        for s in spans:
+            tid = tracks.get(s.track)
+            if tid is None:
+                tid = tracks[s.track] = len(tracks) + 1
+                events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": s.track}})
+            args = {**s.attrs, "span_id": s.id, "parent_id": s.parent_id, "cpu_ms": round(s.cpu_s * 1000, 3)}
+            if s.child_cpu_s is not None:
+                args["child_cpu_ms"] = round(s.child_cpu_s * 1000, 3)
+                args["process_max_rss_mb"] = round(s.process_max_rss_mb, 1)
+            if s.rss_end_mb is not None:
+                args["rss_start_mb"] = round(s.rss_start_mb, 1)
+                args["rss_end_mb"] = round(s.rss_end_mb, 1)
+            if s.error:
+                args["error"] = s.error
+            events.append({
+                "ph": "X", "name": s.name, "cat": s.category, "pid": pid, "tid": tid,
+                "ts": round((s.start - self._origin) * 1e6, 3), "dur": round(s.wall_s * 1e6, 3),
+                "args": args,
+            })
+        return events
+
+    def save_chrome(self, path):
+        """Write the Chrome trace-event JSON file. Returns path."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "traceEvents": self.chrome_events(),
+                "displayTimeUnit": "ms",
+                "otherData": {"job": self.name, "started_at": self.started_at},
+            }, f, default=str)
+        return path
+
+    def summary(self):
+        """
+        One row per (category, name), slowest total first: count, total and max
+        wall time, total thread and child-process CPU time, the largest RSS
+        sampled at the start or end of one of its spans, errors.
+        Times of nested or concurrent spans overlap, so totals do not add up to
+        the job's wall time.
+        """
+        rows = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            row = rows.setdefault((s.category, s.name), {
+                "category": s.category, "name": s.name, "count": 0, "wall_s": 0.0, "max_wall_s": 0.0,
+                "cpu_s": 0.0, "child_cpu_s": 0.0, "rss_mb": 0.0, "errors": 0,
+            })
+            row["count"] += 1
+            row["wall_s"] += s.wall_s
+            row["max_wall_s"] = max(row["max_wall_s"], s.wall_s)
+            row["cpu_s"] += s.cpu_s
+            row["child_cpu_s"] += s.child_cpu_s or 0.0
+            row["rss_mb"] = max(row["rss_mb"], s.rss_start_mb or 0.0, s.rss_end_mb or 0.0)
+            row["errors"] += s.error is not None
+        return sorted(rows.values(), key=lambda row: row["wall_s"], reverse=True)
+
+    def format_summary(self):
+        """The summary() as a text table."""
+        header = (f"{'category':<11} {'span':<34} {'count':>5} {'wall s':>9} {'max s':>8} "
+                  f"{'cpu s':>8} {'child cpu s':>11} {'rss MB':>8} {'errors':>6}")
+        lines = [f"Trace of job {self.name}", header, "-" * len(header)]
+        for row in self.summary():
+            lines.append(
+                f"{row['category'][:11]:<11} {row['name'][:34]:<34} {row['count']:>5} {row['wall_s']:>9.2f} "
+                f"{row['max_wall_s']:>8.2f} {row['cpu_s']:>8.2f} {row['child_cpu_s']:>11.2f} "
+                f"{row['rss_mb']:>8.0f} {row['errors']:>6}"
+            )
+        return "\n".join(lines)
+
+def current_trace():
+    """The active Trace, or None."""
+    return _current_trace.get()
+
+class trace_job:
+    """
+    Context manager tracing one job: activates trace (or the already active
+    trace, or a new Trace(job_id)) and wraps the block in a "job" span. With
+    trace_dir (default: TRACE_DIR), <job_id>.trace.json (Chrome trace events)
+    and <job_id>.summary.txt are written there on exit and the summary is
+    printed.
+
+    Usage:
+        with trace_job(ws.job_id) as trace:
+            ...
+    """
+
+    def __init__(self, job_id, trace=None, trace_dir=None):
+        self.job_id = job_id
+        self.trace = trace or current_trace() or Trace(job_id)
+        self.trace_dir = trace_dir if trace_dir is not None else os.getenv("TRACE_DIR")
+        self._span = None
+
+    def __enter__(self):
+        self.trace.__enter__()
+        self._span = span("job", "job", job_id=self.job_id)
+        self._span.__enter__()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._span.__exit__(exc_type, exc, tb)
+        finally:
+            self.trace.__exit__(exc_type, exc, tb)
+        if self.trace_dir:
+            try:
+                self.trace.save_chrome(os.path.join(self.trace_dir, f"{self.job_id}.trace.json"))
+                summary = self.trace.format_summary()
+                with open(os.path.join(self.trace_dir, f"{self.job_id}.summary.txt"), "w", encoding="utf-8") as f:
+                    f.write(summary + "\n")
+                print(summary)
+            except OSError as e:
+                print(f"✗ Could not save the trace of job {self.job_id}: {e}")
+        return False
@@ -0,0 +1,174 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+
+_job_slots = None
+_job_slots_lock = threading.Lock()
+
+# Workspaces of this process that are in use, and when each root was last swept
+_active_roots = set()
+_last_sweep = {}
+_sweep_lock = threading.Lock()
+
+# Seconds between two sweeps of the same workspace root by one process
+SWEEP_INTERVAL = 3600
+
+def get_job_slots():
+    """
+    Return the host-wide semaphore bounding concurrent jobs.
+    The limit comes from MAX_CONCURRENT_JOBS (default: number of CPU cores).
+    """
+    global _job_slots
+    with _job_slots_lock:
+        if _job_slots is None:
+            limit = int(os.getenv("MAX_CONCURRENT_JOBS", str(os.cpu_count() or 1)))
+            _job_slots = threading.BoundedSemaphore(max(1, limit))
+        return _job_slots
+
+def workspace_ttl():
+    """Seconds a kept workspace may sit unused: JOB_WORKSPACE_TTL_HOURS (default 24, 0 = forever)."""
+    return float(os.getenv("JOB_WORKSPACE_TTL_HOURS", "24")) * 3600
+
+def _last_modified(path):
+    latest = os.stat(path).st_mtime
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                latest = max(latest, os.stat(os.path.join(root, name)).st_mtime)
+            except FileNotFoundError:
+                pass
+    return latest
+
+def sweep_workspaces(root="public/jobs", max_age=None):
+    """
+    Delete the job workspaces under root in which nothing was modified for
+    max_age seconds (default: workspace_ttl()), e.g. previews that were never
+    approved. Workspaces in use by this process are skipped.
+
+    Returns:
+        The job ids of the deleted workspaces
+    """
+    max_age = workspace_ttl() if max_age is None else max_age
+    if max_age <= 0 or not os.path.isdir(root):
+        return []
+    cutoff = time.time() - max_age
+    deleted = []
+    for job_id in os.listdir(root):
+        path = os.path.join(root, job_id)
+        with _sweep_lock:
+            if path in _active_roots:
+                continue
+        try:
+            if not os.path.isdir(path) or _last_modified(path) > cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        deleted.append(job_id)
+    if deleted:
+        print(f"Deleted {len(deleted)} expired job workspace(s) from {root}")
+    return deleted
+
+def _sweep_if_due(root):
+    now = time.monotonic()
+    with _sweep_lock:
+        if now - _last_sweep.get(root, -SWEEP_INTERVAL) < SWEEP_INTERVAL:
+            return
+        _last_sweep[root] = now
+    sweep_workspaces(root)
+
+class JobWorkspace:
+    """
+    Private working directory for one render job, so concurrent jobs never
+    share intermediate files.
+
+    Layout:
+        <root>/<job_id>/media/     generated images and clips
+        <root>/<job_id>/audios/    narration audio
+        <root>/<job_id>/outputs/   rendered videos
+
+    Used as a context manager, the workspace waits for a free job slot
+    (see get_job_slots), creates its directories, and deletes them again on exit
+    unless keep=True (or KEEP_JOB_WORKSPACES=1). Use publish() to move the final
+    video out before the workspace is cleaned up. Kept workspaces expire: once
+    an hour, entering a workspace deletes the ones under the same root left
+    unmodified for JOB_WORKSPACE_TTL_HOURS (see sweep_workspaces).
+
+    Usage:
+        with JobWorkspace() as workspace:
+            generate_media_sequence(segments, workspace=workspace)
+            ...
+            final_path = workspace.publish(workspace.output_path("final_output.mp4"))
+    """
+
+    def __init__(self, job_id=None, root="public/jobs", keep=None):
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.base = root
+        self.root = os.path.join(root, self.job_id)
+        if keep is None:
+            keep = os.getenv("KEEP_JOB_WORKSPACES", "0") == "1"
+        self.keep = keep
+        self._slot_acquired = False
+
+    @property
+    def media_dir(self):
+        return os.path.join(self.root, "media")
+
+    @property
+    def audio_dir(self):
+        return os.path.join(self.root, "audios")
+
+    @property
+    def output_dir(self):
+        return os.path.join(self.root, "outputs")
+
+    def media_path(self, filename):
+        return os.path.join(self.media_dir, filename)
+
+    def audio_path(self, filename):
+        return os.path.join(self.audio_dir, filename)
+
+    def output_path(self, filename):
+        return os.path.join(self.output_dir, filename)
+
+    def create(self):
+        for path in (self.media_dir, self.audio_dir, self.output_dir):
+            os.makedirs(path, exist_ok=True)
+        return self
+
+    def publish(self, path, dest_dir="public/outputs", suffix=""):
+        """
+        Move a file out of the workspace into dest_dir, named after the job id
+        (plus suffix, e.g. "_preview") so published files from different jobs
+        never collide.
+        Returns the new path.
+        """
+        os.makedirs(dest_dir, exist_ok=True)
+        dest = os.path.join(dest_dir, self.job_id + suffix + os.path.splitext(path)[1])
+        shutil.move(path, dest)
+        return dest
+
+    def cleanup(self):
+        if not self.keep:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        get_job_slots().acquire()
+        self._slot_acquired = True
+        with _sweep_lock:
+            _active_roots.add(self.root)
+        _sweep_if_due(self.base)
+        return self.create()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.cleanup()
+        finally:
+            with _sweep_lock:
+                _active_roots.discard(self.root)
+            if self._slot_acquired:
+                get_job_slots().release()
+                self._slot_acquired = False
+        return False
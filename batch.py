@@ -0,0 +1,49 @@
+"""
+Headless batch renderer.
+
+Reads prompt jobs from a JSONL file, one per line:
+
+    {"id": "promo-1", "prompt": "Make a 20-second promo video for a fitness app",
+     "orientation": "portrait", "voice": "Kore", "music": "public/audios/bgMusic.mp3", "bg_volume": 0.08}
+
+renders them with a pool of workers and appends a result record per job
+(status, output path, error, timings per stage) to a results JSONL file.
+Re-running the same command resumes the batch: finished jobs are skipped.
+
+Usage:
+    uv run batch.py jobs.jsonl
+    uv run batch.py jobs.jsonl --workers 4 --limit assemble=1 --limit media=3 --results out.jsonl
+"""
+import argparse
+from app.services.batch import run_batch, DEFAULT_STAGE_LIMITS
+from app.utils import ENCODER_PROFILES
+
+def parse_limit(value):
+    stage, sep, n = value.partition("=")
+    if not sep or not n.isdigit() or int(n) < 1:
+        raise argparse.ArgumentTypeError(f"expected STAGE=N with N >= 1, got {value!r}")
+    return stage, int(n)
+
+if __name__ == "__main__":
+    defaults = ", ".join(f"{stage}={n}" for stage, n in DEFAULT_STAGE_LIMITS.items())
+
+    parser = argparse.ArgumentParser(description="Render every prompt of a JSONL file")
+    parser.add_argument("jobs", help="JSONL file with one job per line")
+    parser.add_argument("--results", help="Results JSONL file (default: <jobs>.results.jsonl)")
+    parser.add_argument("--workers", type=int, default=2, help="Jobs processed at the same time")
+    parser.add_argument("--limit", type=parse_limit, action="append", default=[], metavar="STAGE=N",
+                        help=f"Max concurrent runs of a pipeline stage across jobs (default: {defaults})")
+    parser.add_argument("--profile", default="final", choices=list(ENCODER_PROFILES))
+    parser.add_argument("--publish-dir", default="public/outputs")
+    parser.add_argument("--no-retry-failed", action="store_true", help="Skip jobs that failed in an earlier run")
+    args = parser.parse_args()
+
+    run_batch(
+        args.jobs,
+        results_path=args.results,
+        workers=args.workers,
+        stage_limits={**DEFAULT_STAGE_LIMITS, **dict(args.limit)},
+        publish_dir=args.publish_dir,
+        profile=args.profile,
+        retry_failed=not args.no_retry_failed,
+    )
@@ -0,0 +1,201 @@
+"""
+Encoder settings benchmark.
+
+Renders a fixed synthetic timeline (generated images with pan/zoom, ffmpeg
+test-pattern clips, captions and a tone as narration - no network calls)
+through render_final_video under every encoder profile, and reports for each:
+wall time, CPU seconds (this process plus ffmpeg), output size, the bitrates
+actually written and PSNR/SSIM against a lossless (CRF 0) render.
+
+Usage:
+    uv run benchmark.py
+    uv run benchmark.py --seconds 20 --orientation landscape --profiles draft final
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+import numpy as np
+from PIL import Image
+from app.services.render_final import render_final_video
+from app.utils import ENCODER_PROFILES
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The settings used before encoder profiles existed, for comparison
+LEGACY_PROFILE = {"preset": "ultrafast", "crf": 23, "bitrate": "50k", "audio_bitrate": "2k"}
+REFERENCE_PROFILE = {"preset": "ultrafast", "crf": 0}
+
+TEXT_OPTIONS = dict(
+    font_size=47,
+    color=(255, 255, 255, 255),
+    stroke_color="black",
+    stroke_width=3,
+    margin=(50, 100),
+)
+
+def _cpu_seconds():
+    if resource is None:
+        return time.process_time()
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+def _ffmpeg(*args):
+    p = subprocess.run(["ffmpeg", "-y", "-hide_banner", *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed:\n{p.stderr.strip()}")
+    return p.stderr
+
+def make_image(path, index, size=(1600, 1200)):
+    """Deterministic test image: gradient, grid and noise so motion and detail cost bits."""
+    rng = np.random.default_rng(index)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.empty((height, width, 3), np.float32)
+    image[..., 0] = 255 * x / width
+    image[..., 1] = 255 * y / height
+    image[..., 2] = 128 + 127 * np.sin((x + y) / (40 + 10 * index))
+    image[(x.astype(int) % 100 < 4) | (y.astype(int) % 100 < 4)] = 255
+    image += rng.normal(0, 12, image.shape)
+    Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(path)
+    return path
+
+def make_clip(path, source, seconds, size="1280x720"):
+    """Test-pattern clip from one of ffmpeg's lavfi sources."""
+    _ffmpeg("-f", "lavfi", "-i", f"{source}=size={size}:rate=30", "-t", str(seconds),
+            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "18", "-pix_fmt", "yuv420p", path)
+    return path
+
+def make_tone(path, seconds, rate=24000):
+    """Narration stand-in: a 220Hz tone with a slow tremolo."""
+    t = np.arange(int(seconds * rate)) / rate
+    samples = 0.3 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 0.5 * t))
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((samples * 32767).astype(np.int16).tobytes())
+    return path
+
+def build_timeline(work_dir, seconds):
+    """Fixed five-segment timeline of `seconds` total, alternating images and clips."""
+    part = seconds / 5
+    image = lambda i: make_image(os.path.join(work_dir, f"image{i}.png"), i)
+    clip = lambda name, source: make_clip(os.path.join(work_dir, name), source, part)
+    media_list = [
+        (image(0), part, 'zoom_in', 1.2),
+        (clip("testsrc2.mp4", "testsrc2"), 0, part),
+        (image(1), part, 'left', 1.15),
+        (clip("mandelbrot.mp4", "mandelbrot"), 0, part),
+        (image(2), part, 'zoom_out', 1.2),
+    ]
+    texts = [(f"Segment\n{i + 1}", i * part, (i + 1) * part) for i in range(5)]
+    audio_path = make_tone(os.path.join(work_dir, "narration.wav"), seconds)
+    return media_list, texts, audio_path
+
+def stream_bitrates(path):
+    """Bitrates (kbit/s) of the video and audio streams as written."""
+    p = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "stream=codec_type,bit_rate", "-of", "json", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
+    )
+    rates = {}
+    for stream in json.loads(p.stdout)["streams"]:
+        if stream.get("bit_rate", "N/A") != "N/A":
+            rates[stream["codec_type"]] = int(stream["bit_rate"]) / 1000
+    return rates
+
+def quality(path, reference_path):
+    """(PSNR dB, SSIM) of the video stream against the reference render."""
+    log = _ffmpeg(
+        "-i", path, "-i", reference_path,
+        "-filter_complex", "[0:v]split[a][b];[1:v]split[c][d];[a][c]ssim;[b][d]psnr",
+        "-f", "null", "-"
+    )
+    ssim = re.search(r"SSIM .*All:([\d.]+)", log)
+    psnr = re.search(r"PSNR .*average:([\d.]+|inf)", log)
+    return (round(float(psnr.group(1)), 2) if psnr else None, round(float(ssim.group(1)), 4) if ssim else None)
+
+def render(name, profile, timeline, work_dir, orientation):
+    media_list, texts, audio_path = timeline
+    output_path = os.path.join(work_dir, f"{name}.mp4")
+    cpu_start, wall_start = _cpu_seconds(), time.perf_counter()
+    render_final_video(media_list, texts, audio_path, output_path,
+                       orientation=orientation, profile=profile, **TEXT_OPTIONS)
+    return output_path, time.perf_counter() - wall_start, _cpu_seconds() - cpu_start
+
+def run_benchmark(profiles, seconds=10, orientation='portrait', keep=False):
+    """
+    Renders the synthetic timeline once per profile.
+
+    Args:
+        profiles: Dict name -> profile (name of an ENCODER_PROFILES entry or a dict)
+        seconds: Length of the timeline
+        orientation: 'portrait' or 'landscape'
+        keep: Keep the rendered files instead of deleting the work directory
+
+    Returns:
+        List of result dicts, one per profile
+    """
+    work_dir = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        timeline = build_timeline(work_dir, seconds)
+        reference_path, _, _ = render("reference", REFERENCE_PROFILE, timeline, work_dir, orientation)
+
+        results = []
+        for name, profile in profiles.items():
+            output_path, wall, cpu = render(name, profile, timeline, work_dir, orientation)
+            psnr, ssim = quality(output_path, reference_path)
+            rates = stream_bitrates(output_path)
+            results.append({
+                "profile": name,
+                "wall_s": round(wall, 2),
+                "cpu_s": round(cpu, 2),
+                "size_kb": round(os.path.getsize(output_path) / 1024, 1),
+                "video_kbps": round(rates.get("video", 0), 1),
+                "audio_kbps": round(rates.get("audio", 0), 1),
+                "psnr_db": psnr,
+                "ssim": ssim,
+            })
+        if keep:
+            print(f"Rendered files kept in {work_dir}")
+        return results
+    finally:
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def print_table(results):
+    columns = ["profile", "wall_s", "cpu_s", "size_kb", "video_kbps", "audio_kbps", "psnr_db", "ssim"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.rjust(widths[c]) for c in columns))
+    for r in results:
+        print("  ".join(str(r[c]).rjust(widths[c]) for c in columns))
+
+if __name__ == "__main__":
+    available = {**{name: name for name in ENCODER_PROFILES}, "legacy": LEGACY_PROFILE}
+
+    parser = argparse.ArgumentParser(description="Benchmark the encoder profiles on a synthetic timeline")
+    parser.add_argument("--seconds", type=float, default=10, help="Timeline length in seconds")
+    parser.add_argument("--orientation", default="portrait", choices=["portrait", "landscape"])
+    parser.add_argument("--profiles", nargs="+", default=list(available), choices=list(available))
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--keep", action="store_true", help="Keep the rendered videos")
+    args = parser.parse_args()
+
+    results = run_benchmark({name: available[name] for name in args.profiles},
+                            args.seconds, args.orientation, args.keep)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
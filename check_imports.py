@@ -0,0 +1,80 @@
+"""
+Import-time budget check.
+
+Imports each entry point in a fresh interpreter with `python -X importtime`
+and fails (exit code 1) if it takes longer than its budget, or if it loads
+one of the heavy packages (MoviePy, google-genai, librosa, httpx, requests)
+that should only be imported when a service actually needs them.
+
+Usage:
+    uv run check_imports.py
+    uv run check_imports.py --scale 2 --top 10   # looser budgets on a slow machine
+"""
+import argparse
+import subprocess
+import sys
+
+# Entry point -> budget in seconds (own imports only, interpreter startup excluded)
+BUDGETS = {
+    "app.utils": 0.01,
+    "app.services": 0.05,
+    "app.services.generate_media_segments": 0.05,
+    "app.services.pipeline": 0.10,
+    "app.services.batch": 0.10,
+    "app.services.workers": 0.10,
+    "api": 0.60,  # Flask itself
+}
+
+# Packages none of the entry points may load
+HEAVY_PACKAGES = ("moviepy", "google.genai", "librosa", "httpx", "requests")
+
+def import_times(code):
+    """Run code under -X importtime; returns {module: self time in seconds}."""
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"`{code}` failed:\n{p.stderr.strip()}")
+
+    times = {}
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(self_us) / 1e6
+    return times
+
+def check(module, budget, baseline, top=5):
+    """Import cost of module beyond the interpreter baseline. Returns (ok, report lines)."""
+    times = {name: t for name, t in import_times(f"import {module}").items() if name not in baseline}
+    total = sum(times.values())
+    heavy = sorted({
+        package for package in HEAVY_PACKAGES
+        for name in times if name == package or name.startswith(package + ".")
+    })
+
+    ok = total <= budget and not heavy
+    lines = [f"{'ok  ' if ok else 'FAIL'} {module:<40} {total * 1000:7.1f} ms / {budget * 1000:.0f} ms"
+             f"  ({len(times)} modules)"]
+    if heavy:
+        lines.append(f"     loads heavy packages: {', '.join(heavy)}")
+    if not ok:
+        for name, t in sorted(times.items(), key=lambda item: item[1], reverse=True)[:top]:
+            lines.append(f"     {t * 1000:7.1f} ms  {name}")
+    return ok, lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import time of the app entry points")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget by this factor")
+    parser.add_argument("--top", type=int, default=5, help="Slowest modules listed for a failing entry point")
+    parser.add_argument("modules", nargs="*", help="Entry points to check (default: all in BUDGETS)")
+    args = parser.parse_args()
+
+    baseline = set(import_times("pass"))
+    failed = 0
+    for module in args.modules or BUDGETS:
+        budget = BUDGETS.get(module, 0.10) * args.scale
+        ok, lines = check(module, budget, baseline, args.top)
+        failed += not ok
+        print("\n".join(lines))
+
+    sys.exit(1 if failed else 0)
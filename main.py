@@ -4,17 +4,8 @@ import os
 from pathlib import Path
 
 # Import your services
-from app.services import (
-    generate_prompts_from_prompt,
-    generate_script_from_prompt,
-    generate_voice_from_segments,
-    generate_media_sequence,
-    process_media_segments,
-    concatenate_media,
-    add_multiple_texts,
-    add_audio_to_video,
-    add_bgMusic_to_video
-)
+from app.services import run_video_pipeline, render_job
+from app.utils import JobWorkspace, Trace
 
 # Page configuration
 st.set_page_config(
@@ -39,6 +30,10 @@ if 'video_path' not in st.session_state:
     st.session_state.video_path = None
 if 'generation_time' not in st.session_state:
     st.session_state.generation_time = 0
+if 'preview_job_id' not in st.session_state:
+    st.session_state.preview_job_id = None
+if 'trace_summary' not in st.session_state:
+    st.session_state.trace_summary = None
 
 # Input section
 st.markdown("### 📝 Enter Your Prompt")
@@ -52,11 +47,22 @@ user_prompt = st.text_area(
 col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
     generate_button = st.button("🚀 Generate Video", use_container_width=True, type="primary")
+    preview_mode = st.checkbox(
+        "Preview first (360p, 15 fps)",
+        value=True,
+        help="Check pacing and captions on a quick low-resolution render, then render full quality from the same media and voiceover",
+    )
+    fresh_plan = st.checkbox(
+        "Fresh plan",
+        value=False,
+        help="Ask Gemini for a new plan and script instead of reusing the cached ones for this prompt",
+    )
 
 # Video generation process
 if generate_button and user_prompt:
     st.session_state.video_generated = False
     st.session_state.video_path = None
+    st.session_state.preview_job_id = None
     
     # Progress container
     progress_container = st.container()
@@ -71,76 +77,35 @@ if generate_button and user_prompt:
         start_time = time.time()
         
         try:
-            # Step 1: Generate prompts
-            status_text.text("⏳ Step 1/8: Generating prompts...")
-            progress_bar.progress(10)
-            seg = generate_prompts_from_prompt(user_prompt)
-            
-            # Step 2: Generate script
-            status_text.text("⏳ Step 2/8: Creating script...")
-            progress_bar.progress(20)
-            script = generate_script_from_prompt(seg, user_prompt)
-            
-            # Step 3: Generate voice
-            status_text.text("⏳ Step 3/8: Generating voiceover...")
-            progress_bar.progress(35)
-            audio_path = "public/audios/a.wav"
-            generate_voice_from_segments(script, audio_path)
-            
-            # Step 4: Generate media sequence
-            status_text.text("⏳ Step 4/8: Creating media sequence...")
-            progress_bar.progress(50)
-            generate_media_sequence(seg, "public/media")
-            
-            # Step 5: Process media segments
-            status_text.text("⏳ Step 5/8: Processing media segments...")
-            progress_bar.progress(60)
-            segment = process_media_segments(seg, script)
-            
-            # Step 6: Concatenate media
-            status_text.text("⏳ Step 6/8: Concatenating media...")
-            progress_bar.progress(70)
-            concatenate_media(segment[0], orientation='portrait')
-            
-            # Step 7: Add text overlays
-            status_text.text("⏳ Step 7/8: Adding text overlays...")
-            progress_bar.progress(80)
-            add_multiple_texts(
-                video_path="public/outputs/output.mp4",
-                output_path="public/outputs/output_with_texts.mp4",
-                texts=segment[1],
-                font_size=47,
-                color=(255, 255, 255, 255),
-                stroke_color="black",
-                stroke_width=3,
-                margin=(50, 100),
-            )
+            stage_icons = {
+                "pending": "⏸️",
+                "running": "⏳",
+                "done": "✅",
+                "failed": "❌",
+                "cancelled": "⏹️",
+            }
             
-            # Step 8: Add audio
-            status_text.text("⏳ Step 8/8: Adding audio...")
-            progress_bar.progress(90)
-            add_audio_to_video(
-                "public/outputs/output_with_texts.mp4",
-                audio_path,
-                "public/outputs/output_with_audio.mp4"
+            # Per-stage progress: voice and media run at the same time
+            def on_stage_update(stage, state, states):
+                done = sum(1 for s in states.values() if s == "done")
+                progress_bar.progress(int(100 * done / len(states)))
+                status_text.markdown("\n".join(
+                    f"{stage_icons[s]} **{name}**: {s}" for name, s in states.items()
+                ))
+                timer_text.text(f"⏱️ Elapsed: {time.time() - start_time:.0f}s")
+            
+            workspace = JobWorkspace()
+            trace = Trace(workspace.job_id)
+            final_output_path = run_video_pipeline(
+                user_prompt,
+                orientation='portrait',
+                on_update=on_stage_update,
+                workspace=workspace,
+                preview=preview_mode,
+                trace=trace,
+                plan_cache=not fresh_plan,
             )
             
-            # Step 9: Add background music (if exists)
-            status_text.text("⏳ Final step: Adding background music...")
-            progress_bar.progress(95)
-            final_output_path = "public/outputs/final_output.mp4"
-            
-            if os.path.exists("public/audios/bgMusic.mp3"):
-                add_bgMusic_to_video(
-                    "public/outputs/output_with_audio.mp4",
-                    "public/audios/bgMusic.mp3",
-                    final_output_path,
-                    bg_volume=0.08
-                )
-            else:
-                # If no background music, use the audio version as final
-                os.rename("public/outputs/output_with_audio.mp4", final_output_path)
-            
             # Complete
             progress_bar.progress(100)
             end_time = time.time()
@@ -149,12 +114,17 @@ if generate_button and user_prompt:
             st.session_state.video_generated = True
             st.session_state.video_path = final_output_path
             st.session_state.generation_time = generation_time
+            st.session_state.preview_job_id = workspace.job_id if preview_mode else None
+            st.session_state.trace_summary = trace.format_summary()
             
             status_text.empty()
             progress_bar.empty()
             
             # Success message
-            st.success(f"✅ Video generated successfully in {generation_time:.2f} seconds!")
+            if preview_mode:
+                st.success(f"✅ Preview generated in {generation_time:.2f} seconds! Render the full-quality video below once it looks right.")
+            else:
+                st.success(f"✅ Video generated successfully in {generation_time:.2f} seconds!")
             
         except Exception as e:
             st.error(f"❌ Error generating video: {str(e)}")
@@ -167,6 +137,9 @@ if st.session_state.video_generated and st.session_state.video_path:
     
     # Display generation time
     st.info(f"⏱️ Generation Time: {st.session_state.generation_time:.2f} seconds")
+    if st.session_state.trace_summary:
+        with st.expander("Timing breakdown"):
+            st.code(st.session_state.trace_summary, language=None)
     
     # Display video with custom dimensions
     col1, col2, col3 = st.columns([1, 1, 1])
@@ -197,6 +170,22 @@ if st.session_state.video_generated and st.session_state.video_path:
             
             st.markdown('</div>', unsafe_allow_html=True)
             
+            # Full-quality render of an approved preview, from the same inputs
+            if st.session_state.preview_job_id:
+                if st.button("✨ Render Full Quality", use_container_width=True, type="primary"):
+                    with st.spinner("Rendering full-quality video..."):
+                        try:
+                            start_time = time.time()
+                            trace = Trace(st.session_state.preview_job_id)
+                            st.session_state.video_path = render_job(st.session_state.preview_job_id, trace=trace)
+                            st.session_state.generation_time = time.time() - start_time
+                            st.session_state.trace_summary = trace.format_summary()
+                            st.session_state.preview_job_id = None
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"❌ Error rendering video: {str(e)}")
+                            st.exception(e)
+            
             # Download button
             st.download_button(
                 label="⬇️ Download Video",
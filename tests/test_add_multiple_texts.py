@@ -0,0 +1,104 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.services.add_multiple_texts import (
+    FADE_DURATION, ZOOM_DURATION, ZOOM_START_SCALE, CaptionTrack, caption_opacity, caption_scale,
+    scale_caption_style,
+)
+
+def sprite(width, height, color=(255, 0, 0), alpha=255):
+    rgba = np.zeros((height, width, 4), np.uint8)
+    rgba[..., :3] = color
+    rgba[..., 3] = alpha
+    return rgba
+
+class CaptionTimingTest(unittest.TestCase):
+    def test_scale(self):
+        self.assertEqual(caption_scale(0), ZOOM_START_SCALE)
+        self.assertAlmostEqual(caption_scale(ZOOM_DURATION / 2), (ZOOM_START_SCALE + 1) / 2)
+        self.assertEqual(caption_scale(ZOOM_DURATION), 1.0)
+        self.assertEqual(caption_scale(5), 1.0)
+
+    def test_opacity(self):
+        self.assertEqual(caption_opacity(0, 2), 0)
+        self.assertAlmostEqual(caption_opacity(FADE_DURATION / 2, 2), 0.5)
+        self.assertEqual(caption_opacity(1, 2), 1)
+        self.assertAlmostEqual(caption_opacity(2 - FADE_DURATION / 4, 2), 0.25)
+        self.assertEqual(caption_opacity(2, 2), 0)
+        # Shorter than both fades: never fully opaque
+        self.assertLess(caption_opacity(0.075, 0.15), 1)
+
+    def test_scale_caption_style(self):
+        style = dict(font_size=47, stroke_width=3, size=(800, None), margin=(50, 100), interline=4)
+        self.assertEqual(scale_caption_style(style, 1.0), style)
+        half = scale_caption_style(style, 0.5)
+        self.assertEqual(half, dict(font_size=24, stroke_width=2, size=(400, None), margin=(25, 50), interline=2))
+        self.assertEqual(scale_caption_style(dict(color="white"), 0.5)["font_size"], 20)  # default 40, halved
+        self.assertEqual(scale_caption_style(dict(font_size=1), 0.1)["font_size"], 1)
+
+class CaptionTrackTest(unittest.TestCase):
+    def track(self, texts, frame_size=(100, 80), sprites=None, **style):
+        sprites = sprites or {}
+        with mock.patch("app.services.add_multiple_texts.render_caption_sprite",
+                        lambda text, **kwargs: sprites.get(text, sprite(40, 10))):
+            return CaptionTrack(texts, frame_size, fps=10, **style)
+
+    def frame(self, value=0):
+        return np.full((80, 100, 3), value, np.uint8)
+
+    def test_caption_is_drawn_only_while_visible(self):
+        track = self.track([("hello", 1.0, 2.0)])
+        for t in (0.5, 2.0, 3.0):
+            self.assertFalse(track.blend(self.frame(), t).any(), t)
+        self.assertTrue(track.blend(self.frame(), 1.5).any())
+
+    def test_settled_caption_is_an_alpha_blit_at_the_bottom_center(self):
+        track = self.track([("hello", 0.0, 2.0)])
+        frame = track.blend(self.frame(), 1.0)
+        ys, xs = np.nonzero(frame[..., 0])
+        self.assertEqual((xs.min(), xs.max() + 1), (30, 70))
+        self.assertEqual((ys.min(), ys.max() + 1), (70, 80))
+        self.assertTrue(np.all(frame[70:80, 30:70] == (255, 0, 0)))
+
+    def test_translucent_pixels_and_fades_blend_with_the_frame(self):
+        track = self.track([("half", 0.0, 2.0)], sprites={"half": sprite(40, 10, (200, 200, 200), alpha=128)})
+        pixel = track.blend(self.frame(100), 1.0)[75, 50]
+        self.assertTrue(np.all(np.abs(pixel.astype(int) - (100 * (1 - 128 / 255) + 200 * 128 / 255)) <= 1))
+
+        track = self.track([("solid", 0.0, 2.0)], sprites={"solid": sprite(40, 10, (200, 200, 200))})
+        pixel = track.blend(self.frame(100), 2.0 - FADE_DURATION / 2)[75, 50]  # half faded out
+        self.assertTrue(np.all(np.abs(pixel.astype(int) - 150) <= 1))
+
+    def test_zoom_keyframes_start_larger(self):
+        track = self.track([("hello", 0.0, 2.0)])
+        _, _, keyframes, layer = track.captions[0]
+        self.assertEqual(len(keyframes), int(np.ceil(ZOOM_DURATION * 10)))
+        self.assertEqual((keyframes[0].width, keyframes[0].height), (48, 12))
+        self.assertEqual((layer.width, layer.height), (40, 10))
+
+    def test_sprites_larger_than_the_frame_are_clipped(self):
+        track = self.track([("wide", 0.0, 2.0)], sprites={"wide": sprite(300, 200)}, vertical_align="top")
+        frame = track.blend(self.frame(), 1.0)
+        self.assertTrue(np.all(frame[..., 0] == 255))
+
+    def test_overlapping_captions_stack(self):
+        track = self.track([("a", 0.0, 2.0), ("b", 0.0, 2.0)],
+                           sprites={"a": sprite(40, 10, (255, 0, 0), 128), "b": sprite(40, 10, (0, 0, 255), 128)})
+        pixel = track.blend(self.frame(), 1.0)[75, 50]
+        self.assertGreater(pixel[0], 0)
+        self.assertGreater(pixel[2], pixel[0])  # b is drawn on top
+
+    def test_apply_to_never_draws_on_the_source_frame(self):
+        track = self.track([("hello", 0.0, 2.0)])
+        source = self.frame()
+        source.flags.writeable = False
+        clip = mock.Mock()
+        clip.transform.side_effect = lambda func: func
+        frame = track.apply_to(clip)(lambda t: source, 1.0)
+        self.assertTrue(frame.any())
+        self.assertFalse(source.any())
+
+if __name__ == "__main__":
+    unittest.main()
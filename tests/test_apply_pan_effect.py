@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+
+from app.services.apply_pan_effect import PanZoomRenderer, box_reduce, compute_pan_zoom_rects
+
+DIRECTIONS = ["zoom", "zoom_in", "zoom_out", "left", "right", "up", "down"]
+
+class PanZoomRectsTest(unittest.TestCase):
+    def test_frame_is_always_covered(self):
+        for source in ((1920, 1080), (1080, 1920), (1000, 1000)):
+            for direction in DIRECTIONS:
+                rects = compute_pan_zoom_rects(*source, 720, 1280, duration=2, fps=30, direction=direction)
+                x, y, w, h = rects.T
+                with self.subTest(source=source, direction=direction):
+                    self.assertEqual(len(rects), 60)
+                    self.assertTrue(np.all(x >= -1e-9) and np.all(y >= -1e-9))
+                    self.assertTrue(np.all(x + w <= source[0] + 1e-9))
+                    self.assertTrue(np.all(y + h <= source[1] + 1e-9))
+                    np.testing.assert_allclose(w / h, 720 / 1280)
+
+    def test_zoom_in_and_out(self):
+        zoom_in = compute_pan_zoom_rects(1920, 1080, 1920, 1080, duration=1, fps=10, direction="zoom_in")
+        np.testing.assert_allclose(zoom_in[0], [0, 0, 1920, 1080])
+        self.assertTrue(np.all(np.diff(zoom_in[:, 2]) < 0))  # the window shrinks
+        np.testing.assert_allclose(zoom_in[:, 0] + zoom_in[:, 2] / 2, 960)  # centered
+
+        zoom_out = compute_pan_zoom_rects(1920, 1080, 1920, 1080, duration=1, fps=10, direction="zoom_out")
+        np.testing.assert_allclose(zoom_out[0, 2], 1920 / 1.15)
+        self.assertTrue(np.all(np.diff(zoom_out[:, 2]) > 0))
+
+    def test_pans_move_the_window_edge_to_edge(self):
+        duration, fps = 1, 10
+        left = compute_pan_zoom_rects(1000, 1000, 500, 500, duration, fps, direction="left")
+        width = 1000 / 1.15
+        self.assertAlmostEqual(left[0, 0], 0)
+        self.assertTrue(np.all(np.diff(left[:, 0]) > 0))
+        np.testing.assert_allclose(left[:, 2], width)
+        np.testing.assert_allclose(left[:, 1], (1000 - width) / 2)
+
+        right = compute_pan_zoom_rects(1000, 1000, 500, 500, duration, fps, direction="right")
+        self.assertAlmostEqual(right[0, 0], 1000 - width)
+        up = compute_pan_zoom_rects(1000, 1000, 500, 500, duration, fps, direction="up")
+        np.testing.assert_allclose(up[:, 1], left[:, 0])
+
+class PanZoomRendererTest(unittest.TestCase):
+    def test_flat_image_renders_flat(self):
+        image = np.full((300, 400, 3), (10, 128, 250), np.float32)
+        renderer = PanZoomRenderer(image, 64, 48, duration=1, fps=10, direction="left")
+        for index in (0, 5, renderer.n_frames - 1):
+            frame = renderer.render(index)
+            self.assertEqual(frame.shape, (48, 64, 3))
+            self.assertEqual(frame.dtype, np.uint8)
+            self.assertTrue(np.all(frame == (10, 128, 250)))
+
+    def test_first_zoom_frame_is_the_source_at_its_own_size(self):
+        rng = np.random.default_rng(0)
+        image = rng.integers(0, 256, (36, 64, 3)).astype(np.float32)
+        renderer = PanZoomRenderer(image, 64, 36, duration=1, fps=10, direction="zoom")
+        np.testing.assert_array_equal(renderer.render(0), image.astype(np.uint8))
+
+    def test_pan_follows_a_horizontal_gradient(self):
+        # Pixel value == its x coordinate, so the sampled value tells where the window is
+        image = np.repeat(np.arange(256, dtype=np.float32)[None, :, None], 64, axis=0).repeat(3, axis=2)
+        renderer = PanZoomRenderer(image, 32, 32, duration=1, fps=10, direction="left", intensity=2.0)
+        for index in (0, renderer.n_frames - 1):
+            x, _, w, _ = renderer.rects[index]
+            expected = x + (np.arange(32) + 0.5) * w / 32 - 0.5
+            np.testing.assert_allclose(renderer.render(index)[0, :, 0], expected, atol=1)
+
+    def test_downscaling_prefilters_the_source(self):
+        image = np.zeros((400, 400, 3), np.float32)
+        # The most zoomed-in frame shows 400 / 1.15 = 348 source pixels across 100
+        self.assertEqual(PanZoomRenderer(image, 100, 100, duration=1, fps=5).prefilter, 3)
+        self.assertEqual(PanZoomRenderer(image, 100, 100, duration=1, fps=5, intensity=1.0).prefilter, 4)
+        self.assertEqual(PanZoomRenderer(image, 300, 300, duration=1, fps=5).prefilter, 1)
+
+    def test_prefilter_removes_aliasing(self):
+        # One-pixel checkerboard: its average is mid-grey, and point sampling would keep it black/white
+        checker = (np.indices((400, 400)).sum(axis=0) % 2 * 255).astype(np.float32)
+        image = np.repeat(checker[..., None], 3, axis=2)
+        frame = PanZoomRenderer(image, 50, 50, duration=1, fps=5, direction="up").render(0)
+        self.assertLess(np.abs(frame.astype(float) - 127.5).max(), 2)
+
+    def test_frame_index(self):
+        renderer = PanZoomRenderer(np.zeros((20, 20, 3), np.float32), 10, 10, duration=2, fps=10)
+        self.assertEqual(renderer.frame_index(0), 0)
+        self.assertEqual(renderer.frame_index(0.5), 5)
+        self.assertEqual(renderer.frame_index(10), renderer.n_frames - 1)
+
+class BoxReduceTest(unittest.TestCase):
+    def test_averages_blocks(self):
+        image = np.arange(16, dtype=np.float32).reshape(4, 4, 1)
+        np.testing.assert_allclose(box_reduce(image, 2)[..., 0], [[2.5, 4.5], [10.5, 12.5]])
+
+    def test_drops_the_remainder(self):
+        self.assertEqual(box_reduce(np.zeros((9, 7, 3), np.float32), 2).shape, (4, 3, 3))
+
+if __name__ == "__main__":
+    unittest.main()
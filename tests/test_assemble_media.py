@@ -0,0 +1,103 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from app.services.assemble_media import (
+    INTERMEDIATE_TIMESCALE, concat_compatible, concat_segments, copy_clip, is_conforming, is_video_item, probe_media,
+)
+from app.utils import ffmpeg_video_args
+
+HAVE_FFMPEG = shutil.which("ffmpeg") and shutil.which("ffprobe")
+
+def info(**fields):
+    base = dict(codec="h264", profile="High", level=31, pix_fmt="yuv420p", width=360, height=640, sar="1:1",
+                time_base="1/15360", extradata_hash="SHA256:aa", fps=15.0, duration=2.0)
+    return {**base, **fields}
+
+def count_frames(path):
+    out = subprocess.run(["ffmpeg", "-v", "error", "-progress", "pipe:1", "-i", path,
+                          "-map", "0:v", "-f", "null", "-"],
+                         stdout=subprocess.PIPE, text=True, check=True).stdout
+    return int([line for line in out.splitlines() if line.startswith("frame=")][-1][len("frame="):])
+
+class ProbeRulesTest(unittest.TestCase):
+    def test_is_video_item(self):
+        self.assertTrue(is_video_item(("clip.mp4", 0, 5)))
+        self.assertFalse(is_video_item(("image.png", 5)))
+        self.assertFalse(is_video_item(("image.png", 5, "zoom_in", 1.15)))
+        self.assertFalse(is_video_item(("image.png", 5, None)))
+        self.assertFalse(is_video_item(("clip.mp4", 5, 5)))
+
+    def test_is_conforming(self):
+        self.assertTrue(is_conforming(info(), (360, 640), 15))
+        self.assertTrue(is_conforming(info(sar=None), (360, 640), 15))
+        self.assertFalse(is_conforming(info(), (720, 1280), 15))
+        self.assertFalse(is_conforming(info(), (360, 640), 30))
+        self.assertFalse(is_conforming(info(codec="hevc"), (360, 640), 15))
+        self.assertFalse(is_conforming(info(pix_fmt="yuv444p"), (360, 640), 15))
+        self.assertFalse(is_conforming(info(sar="4:3"), (360, 640), 15))
+
+    def test_concat_compatible(self):
+        self.assertTrue(concat_compatible([info(), info(duration=7.0, fps=15.0)]))
+        for field, value in (("profile", "Main"), ("level", 40), ("time_base", "1/90000"),
+                             ("extradata_hash", "SHA256:bb"), ("sar", "0:1")):
+            self.assertFalse(concat_compatible([info(), info(), info(**{field: value})]), field)
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg is not installed")
+class StreamCopyTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def clip(self, name, seconds=1, profile="draft", size="64x128"):
+        path = os.path.join(self.tmp, name)
+        subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=15",
+                        "-t", str(seconds), *ffmpeg_video_args(profile), "-pix_fmt", "yuv420p", path], check=True)
+        return path
+
+    def test_copy_clip_keeps_the_frames_and_sets_the_timescale(self):
+        clip = self.clip("clip.mp4", seconds=2)
+        piece = copy_clip(clip, os.path.join(self.tmp, "piece.mp4"))
+        probed = probe_media(piece)
+        self.assertEqual(probed["time_base"], f"1/{INTERMEDIATE_TIMESCALE}")
+        self.assertEqual(probed["extradata_hash"], probe_media(clip)["extradata_hash"])
+        self.assertEqual(count_frames(piece), 30)
+
+    def test_compatible_pieces_are_stream_copied(self):
+        pieces = [copy_clip(self.clip(f"{i}.mp4"), os.path.join(self.tmp, f"p{i}.mp4")) for i in range(2)]
+        output = concat_segments(pieces + pieces[:1], os.path.join(self.tmp, "out.mp4"), profile="draft")
+        self.assertEqual(count_frames(output), 45)
+        self.assertEqual(probe_media(output)["extradata_hash"], probe_media(pieces[0])["extradata_hash"])
+
+    def test_mismatched_pieces_are_re_encoded(self):
+        pieces = [
+            copy_clip(self.clip("draft.mp4", profile="draft"), os.path.join(self.tmp, "a.mp4")),
+            copy_clip(self.clip("final.mp4", profile="final"), os.path.join(self.tmp, "b.mp4")),
+        ]
+        self.assertFalse(concat_compatible([probe_media(path) for path in pieces]))
+        output = concat_segments(pieces, os.path.join(self.tmp, "out.mp4"), profile="draft")
+        self.assertEqual(count_frames(output), 30)
+        self.assertEqual(probe_media(output)["profile"], probe_media(pieces[0])["profile"])
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg is not installed")
+class CopyableClipTest(unittest.TestCase):
+    def test_only_whole_uncaptioned_conforming_clips(self):
+        from app.services.render_segments import copyable_clip
+
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = os.path.join(tmp, "clip.mp4")
+            subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", "testsrc2=size=64x128:rate=15",
+                            "-t", "2", *ffmpeg_video_args("draft"), "-pix_fmt", "yuv420p", clip], check=True)
+            self.assertTrue(copyable_clip((clip, 0, 2.0), [], (64, 128), 15))
+            self.assertFalse(copyable_clip((clip, 0, 2.0), [("Hi", 0.0, 1.0)], (64, 128), 15))
+            self.assertFalse(copyable_clip((clip, 0, 1.0), [], (64, 128), 15))  # trimmed
+            self.assertFalse(copyable_clip((clip, 0.5, 2.0), [], (64, 128), 15))
+            self.assertFalse(copyable_clip((clip, 0, 2.0), [], (128, 256), 15))
+            self.assertFalse(copyable_clip((clip, 0, 2.0), [], (64, 128), 30))
+            self.assertFalse(copyable_clip((clip, 2.0, "zoom_in", 1.15), [], (64, 128), 15))
+
+if __name__ == "__main__":
+    unittest.main()
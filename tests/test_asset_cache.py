@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app.utils.asset_cache import AssetCache, file_digest
+
+class AssetCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.cache_dir = os.path.join(self.tmp, "cache")
+
+    def key(self, name):
+        return AssetCache.make_key("model", name)
+
+    def age(self, path, seconds_ago):
+        """Backdate an entry's last use."""
+        t = os.path.getmtime(path) - seconds_ago
+        os.utime(path, (t, t))
+
+    def entries(self):
+        return sorted(name for _, _, files in os.walk(self.cache_dir) for name in files)
+
+    def test_make_key(self):
+        self.assertEqual(AssetCache.make_key("m", {"a": 1, "b": 2}), AssetCache.make_key("m", {"b": 2, "a": 1}))
+        self.assertNotEqual(AssetCache.make_key("m", 5), AssetCache.make_key("m", 6))
+
+    def test_put_get_and_fetch(self):
+        cache = AssetCache(self.cache_dir)
+        src = os.path.join(self.tmp, "image.png")
+        with open(src, "wb") as f:
+            f.write(b"png")
+        key = self.key("image")
+        path = cache.put(key, src)
+        self.assertEqual(path, os.path.join(self.cache_dir, key[:2], key + ".png"))
+        self.assertEqual(cache.get(key, ".png"), path)
+        self.assertIsNone(cache.get(key, ".mp4"))
+
+        dest = os.path.join(self.tmp, "job", "media", "1.png")
+        self.assertTrue(cache.fetch(key, dest))
+        with open(dest, "rb") as f:
+            self.assertEqual(f.read(), b"png")
+        self.assertFalse(cache.fetch(self.key("other"), os.path.join(self.tmp, "2.png")))
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 2})
+
+    def test_no_temp_files_are_left_behind(self):
+        cache = AssetCache(self.cache_dir)
+        cache.put_bytes(self.key("a"), b"x", ".wav")
+
+        def failing_write(f):
+            f.write(b"partial")
+            raise OSError("disk full")
+
+        with self.assertRaises(OSError):
+            cache._store(self.key("b"), ".wav", failing_write)
+        self.assertEqual(self.entries(), [self.key("a") + ".wav"])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = AssetCache(self.cache_dir, max_bytes=350)
+        paths = {name: cache.put_bytes(self.key(name), b"x" * 100, ".png") for name in "abc"}
+        for seconds_ago, name in ((30, "a"), (20, "b"), (10, "c")):
+            self.age(paths[name], seconds_ago)
+        cache.get(self.key("a"), ".png")  # a is now the most recently used
+        cache.put_bytes(self.key("d"), b"x" * 100, ".png")
+        self.assertIsNone(cache.get(self.key("b"), ".png"))
+        for name in "acd":
+            self.assertIsNotNone(cache.get(self.key(name), ".png"), name)
+
+    def test_eviction_frees_headroom(self):
+        cache = AssetCache(self.cache_dir, max_bytes=1000)
+        for i in range(10):
+            path = cache.put_bytes(self.key(i), b"x" * 100, ".png")
+            self.age(path, 100 - i)
+        cache.put_bytes(self.key("new"), b"x" * 100, ".png")
+        # Down to 90% of max_bytes, not just under it
+        self.assertEqual(len(self.entries()), 9)
+        self.assertIsNone(cache.get(self.key(0), ".png"))
+        self.assertIsNone(cache.get(self.key(1), ".png"))
+
+    def test_directory_is_scanned_only_when_needed(self):
+        cache = AssetCache(self.cache_dir, max_bytes=1000)
+        with mock.patch.object(cache, "evict", wraps=cache.evict) as evict:
+            for i in range(5):
+                cache.put_bytes(self.key(i), b"x" * 100, ".png")
+            self.assertEqual(evict.call_count, 1)  # first write: the size is unknown
+            for i in range(5, 11):
+                cache.put_bytes(self.key(i), b"x" * 100, ".png")
+            self.assertEqual(evict.call_count, 2)  # the 11th write crosses max_bytes
+
+    def test_overwrite_counts_only_the_size_difference(self):
+        cache = AssetCache(self.cache_dir, max_bytes=1000)
+        for _ in range(20):
+            cache.put_bytes(self.key("same"), b"x" * 100, ".png")
+        self.assertEqual(cache._size, 100)
+
+class FileDigestTest(unittest.TestCase):
+    def test_digest_follows_the_contents(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "voice.wav")
+            with open(path, "wb") as f:
+                f.write(b"one")
+            first = file_digest(path)
+            self.assertEqual(file_digest(path), first)
+            with open(path, "wb") as f:
+                f.write(b"two!")
+            self.assertNotEqual(file_digest(path), first)
+
+if __name__ == "__main__":
+    unittest.main()
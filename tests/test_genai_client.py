@@ -0,0 +1,70 @@
+import unittest
+from unittest import mock
+
+class GeminiFailoverTest(unittest.TestCase):
+    def setUp(self):
+        try:
+            from google.genai import errors
+        except ImportError:
+            self.skipTest("google-genai is not installed")
+        from app.utils.genai_client import GeminiClientManager
+
+        self.errors = errors
+        self.manager = GeminiClientManager(api_keys=["k1", "k2"], base_delay=0, max_attempts=3)
+        self.manager.client = lambda api_key: api_key  # func receives the key instead of a client
+        patcher = mock.patch("app.utils.genai_client.time.sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rate_limited(self):
+        return self.errors.ClientError(429, {"error": {"code": 429, "message": "quota", "status": "RESOURCE_EXHAUSTED"}})
+
+    def test_rate_limited_key_fails_over_to_the_next(self):
+        calls = []
+
+        def func(api_key):
+            calls.append(api_key)
+            if api_key == "k1":
+                raise self.rate_limited()
+            return "ok"
+
+        self.assertEqual(self.manager.call("m", func), "ok")
+        self.assertEqual(calls, ["k1", "k2"])
+        stats = self.manager.stats()
+        self.assertEqual(stats["#1"]["rate_limited"], 1)
+        self.assertGreater(stats["#1"]["cooldown_s"], 0)
+        self.assertEqual(stats["#2"]["successes"], 1)
+        self.assertEqual(self.manager.call("m", func), "ok")
+        self.assertEqual(calls[-1], "k2")
+
+    def test_non_transient_errors_are_not_retried(self):
+        func = mock.Mock(side_effect=ValueError("bad request"))
+        with self.assertRaises(ValueError):
+            self.manager.call("m", func)
+        func.assert_called_once()
+
+    def test_last_error_is_raised_after_max_attempts(self):
+        func = mock.Mock(side_effect=self.errors.ServerError(
+            503, {"error": {"code": 503, "message": "busy", "status": "UNAVAILABLE"}}))
+        with self.assertRaises(self.errors.ServerError):
+            self.manager.call("m", func)
+        self.assertEqual(func.call_count, 3)
+
+    def test_mid_stream_rate_limit_rests_the_key(self):
+        def stream(api_key):
+            yield "chunk"
+            raise self.rate_limited()
+
+        client = mock.Mock()
+        client.models.generate_content_stream.side_effect = lambda **kwargs: stream("k1")
+        self.manager.client = lambda api_key: client
+        chunks = self.manager.generate_content_stream("m", "contents")
+        self.assertEqual(next(chunks), "chunk")
+        with self.assertRaises(self.errors.ClientError):
+            next(chunks)
+        stats = self.manager.stats()
+        self.assertEqual(stats["#1"]["rate_limited"], 1)
+        self.assertEqual(stats["#1"]["in_flight"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.services import generate_voice
+from app.services.generate_voice import (
+    align_segments, find_pauses, find_segment_boundaries, fit_audio_policy, fit_to_length, policy_speed,
+)
+
+RATE = 8000
+
+def tone(seconds, freq=220.0):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE), np.float32)
+
+def narration(lines, pause=0.4, lead=0.2):
+    """Lines of 'speech' (tones of the given durations) separated by pauses. Returns (samples, line spans)."""
+    parts, spans, cursor = [silence(lead)], [], lead
+    for i, seconds in enumerate(lines):
+        parts.append(tone(seconds))
+        spans.append((cursor, cursor + seconds))
+        cursor += seconds
+        if i < len(lines) - 1:
+            parts.append(silence(pause))
+            cursor += pause
+    parts.append(silence(lead))
+    return np.concatenate(parts), spans
+
+def quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+class PolicyTest(unittest.TestCase):
+    def test_policy_speed(self):
+        self.assertEqual(quiet(policy_speed, 10.0, 10.005), 1.0)
+        self.assertAlmostEqual(quiet(policy_speed, 12.0, 10.0), 1.2)
+        self.assertAlmostEqual(quiet(policy_speed, 8.0, 10.0), 0.8)
+        self.assertEqual(quiet(policy_speed, 30.0, 10.0), 1.0)  # too fast: trimmed instead
+        self.assertEqual(quiet(policy_speed, 30.0, 10.0, allow_trim_when_too_fast=False), 3.0)
+
+    def test_fit_audio_policy_hits_the_exact_length(self):
+        samples = tone(2.0)
+        for target in (1.5, 2.0, 2.5, 0.5):
+            self.assertEqual(len(quiet(fit_audio_policy, samples, RATE, target)), int(target * RATE))
+
+    def test_given_speed_skips_the_policy(self):
+        with mock.patch.object(generate_voice, "policy_speed") as policy:
+            adjusted = quiet(fit_audio_policy, tone(2.0), RATE, 2.5, speed=0.8)
+        policy.assert_not_called()
+        self.assertEqual(len(adjusted), int(2.5 * RATE))
+
+    def test_fit_to_length(self):
+        self.assertEqual(len(fit_to_length(np.ones(10), 4)), 4)
+        padded = fit_to_length(np.ones((3, 2)), 5)
+        self.assertEqual(padded.shape, (5, 2))
+        self.assertFalse(padded[3:].any())
+
+class BoundaryTest(unittest.TestCase):
+    def test_find_pauses(self):
+        samples, spans = narration([1.0, 0.5, 0.8])
+        pauses, speech_start, speech_end = find_pauses(samples, RATE)
+        self.assertEqual(len(pauses), 2)
+        for (start, end), (prev_span, next_span) in zip(pauses, zip(spans, spans[1:])):
+            self.assertAlmostEqual(start, prev_span[1], delta=0.03)
+            self.assertAlmostEqual(end, next_span[0], delta=0.03)
+        self.assertAlmostEqual(speech_start, spans[0][0], delta=0.03)
+        self.assertAlmostEqual(speech_end, spans[-1][1], delta=0.03)
+
+    def test_short_gaps_are_not_pauses(self):
+        samples = np.concatenate([tone(0.5), silence(0.05), tone(0.5)])
+        self.assertEqual(find_pauses(samples, RATE)[0], [])
+
+    def test_silence(self):
+        self.assertEqual(find_pauses(silence(1.0), RATE), ([], 0.0, 1.0))
+
+    def test_cuts_snap_to_the_pauses_between_lines(self):
+        # Line lengths do not match the text lengths exactly; the pauses decide
+        samples, spans = narration([1.2, 0.6, 1.0])
+        segments = [{"script": "a" * 30}, {"script": "b" * 20}, {"script": "c" * 30}]
+        cuts = find_segment_boundaries(samples, RATE, segments)
+        self.assertEqual(len(cuts), 4)
+        self.assertEqual((cuts[0], cuts[-1]), (0.0, len(samples) / RATE))
+        for cut, (prev_span, next_span) in zip(cuts[1:-1], zip(spans, spans[1:])):
+            self.assertGreater(cut, prev_span[1])
+            self.assertLess(cut, next_span[0])
+
+    def test_pauses_inside_a_line_are_skipped_for_better_ones(self):
+        # The first line has a pause of its own, shorter than the pause after it
+        samples = np.concatenate([
+            silence(0.2), tone(0.6), silence(0.2), tone(0.6), silence(0.6), tone(1.2), silence(0.2),
+        ])
+        segments = [{"script": "x" * 12}, {"script": "y" * 12}]
+        cuts = find_segment_boundaries(samples, RATE, segments)
+        self.assertGreater(cuts[1], 1.6)
+        self.assertLess(cuts[1], 2.2)
+
+    def test_no_pauses_falls_back_to_the_text_proportions(self):
+        samples = tone(3.0)
+        cuts = find_segment_boundaries(samples, RATE, [{"script": "a" * 10}, {"script": "b" * 20}])
+        self.assertAlmostEqual(cuts[1], 1.0, delta=0.05)
+
+    def test_more_lines_than_pauses_keeps_cuts_in_order(self):
+        samples, _ = narration([1.0, 1.0])
+        cuts = find_segment_boundaries(samples, RATE, [{"script": "line"}] * 4)
+        self.assertEqual(cuts, sorted(cuts))
+        self.assertEqual(len(set(cuts)), 5)
+
+    def test_single_line(self):
+        samples = tone(1.0)
+        self.assertEqual(find_segment_boundaries(samples, RATE, [{"script": "one"}]), [0.0, 1.0])
+
+class AlignSegmentsTest(unittest.TestCase):
+    segments = [
+        {"script": "a" * 20, "start_time": 0.0, "end_time": 2.0},
+        {"script": "b" * 20, "start_time": 2.0, "end_time": 5.0},
+        {"script": "c" * 20, "start_time": 5.0, "end_time": 6.0},
+    ]
+
+    def test_each_line_lands_in_its_window(self):
+        samples, _ = narration([1.0, 1.0, 1.0])
+        adjusted, alignment = quiet(align_segments, samples, RATE, self.segments)
+        self.assertEqual(len(adjusted), 6 * RATE)
+        for line, seg in zip(alignment, self.segments):
+            self.assertEqual(line["start_time"], seg["start_time"])
+            self.assertLessEqual(line["end_time"], seg["end_time"])
+        # A long window is not filled by slowing the line down past min_speed
+        self.assertGreaterEqual(alignment[1]["speed"], 0.75)
+        self.assertLess(alignment[1]["end_time"], 4.5)
+        # A short window speeds its line up
+        self.assertGreater(alignment[2]["speed"], 1.0)
+
+        # The audio after a line's speech end is silent (once the stretch's ringing has died down)
+        tail = adjusted[int((alignment[1]["end_time"] + 0.3) * RATE):int(5.0 * RATE)]
+        self.assertLess(np.abs(tail).max(), 0.01)
+
+    def test_gaps_between_windows_are_silent(self):
+        segments = [dict(self.segments[0]), dict(self.segments[1], start_time=3.0)]
+        samples, _ = narration([1.0, 1.0])
+        adjusted, alignment = quiet(align_segments, samples, RATE, segments)
+        self.assertEqual(alignment[1]["start_time"], 3.0)
+        self.assertFalse(adjusted[2 * RATE:3 * RATE].any())
+
+    def test_global_mode_computes_the_speed_once(self):
+        samples, _ = narration([1.0, 1.0, 1.0])
+        with mock.patch.object(generate_voice, "policy_speed", wraps=policy_speed) as policy:
+            adjusted, alignment = quiet(align_segments, samples, RATE, self.segments, mode="global")
+        self.assertEqual(policy.call_count, 1)
+        self.assertEqual(len(adjusted), 6 * RATE)
+        speed = alignment[0]["speed"]
+        self.assertAlmostEqual(speed, len(samples) / RATE / 6.0, places=3)
+        self.assertEqual([line["speed"] for line in alignment], [speed] * 3)
+        self.assertEqual(alignment[-1]["end_time"], 6.0)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            quiet(align_segments, tone(1.0), RATE, self.segments[:1], mode="nope")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from app.utils.job_queue import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        self.now += 0.001  # keep created_at distinct so FIFO order is defined
+        return self.now
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.clock = FakeClock()
+        patcher = mock.patch("app.utils.job_queue.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = JobQueue(os.path.join(tmp.name, "jobs.db"), stale_after=60, max_attempts=3)
+        self.addCleanup(self.queue.close)
+
+    def test_claims_are_first_in_first_out(self):
+        ids = [self.queue.submit({"n": n}) for n in range(3)]
+        self.assertEqual(self.queue.position(ids[2]), 2)
+        job = self.queue.claim("w1")
+        self.assertEqual(job["id"], ids[0])
+        self.assertEqual(job["params"], {"n": 0})
+        self.assertEqual((job["status"], job["worker"], job["attempts"]), (RUNNING, "w1", 1))
+        self.assertIsNone(self.queue.position(ids[0]))
+        self.assertEqual(self.queue.position(ids[2]), 1)
+        self.assertEqual(self.queue.claim("w2")["id"], ids[1])
+        self.assertEqual(self.queue.claim("w3")["id"], ids[2])
+        self.assertIsNone(self.queue.claim("w4"))
+
+    def test_concurrent_claims_take_each_job_once(self):
+        ids = {self.queue.submit({"n": n}) for n in range(20)}
+        claimed, lock = [], threading.Lock()
+
+        def worker(name):
+            while (job := self.queue.claim(name)) is not None:
+                with lock:
+                    claimed.append(job["id"])
+
+        threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), sorted(ids))
+
+    def test_finish(self):
+        job_id = self.queue.submit({})
+        self.queue.claim("w")
+        self.queue.update_stages(job_id, {"plan": "done"})
+        self.queue.finish(job_id, DONE, output="out.mp4", timings={"total_s": 1.5})
+        job = self.queue.get(job_id)
+        self.assertEqual((job["status"], job["output"]), (DONE, "out.mp4"))
+        self.assertEqual(job["stages"], {"plan": "done"})
+        self.assertEqual(job["timings"], {"total_s": 1.5})
+        self.assertIsNotNone(job["finished_at"])
+        # Only running jobs can finish
+        self.queue.finish(job_id, FAILED, error="late")
+        self.assertEqual(self.queue.get(job_id)["status"], DONE)
+
+    def test_cancel_only_queued_jobs(self):
+        queued, running = self.queue.submit({}), self.queue.submit({})
+        self.queue.claim("w")  # takes queued (the oldest)
+        self.assertFalse(self.queue.cancel(queued))
+        self.assertTrue(self.queue.cancel(running))
+        self.assertEqual(self.queue.get(running)["status"], CANCELLED)
+        self.assertFalse(self.queue.cancel(running))
+        self.assertFalse(self.queue.cancel("missing"))
+        self.assertIsNone(self.queue.claim("w"))
+
+    def test_heartbeat_keeps_a_job_running(self):
+        job_id = self.queue.submit({})
+        self.queue.claim("w1")
+        for _ in range(3):
+            self.clock.now += 50
+            self.queue.heartbeat([job_id])
+            self.assertIsNone(self.queue.claim("w2"))
+        self.assertEqual(self.queue.get(job_id)["worker"], "w1")
+
+    def test_stale_job_is_requeued(self):
+        job_id = self.queue.submit({})
+        self.queue.claim("w1")
+        self.queue.update_stages(job_id, {"plan": "running"})
+        self.clock.now += 61
+        job = self.queue.claim("w2")
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual((job["worker"], job["attempts"], job["stages"]), ("w2", 2, {}))
+
+    def test_stale_job_fails_after_max_attempts(self):
+        job_id = self.queue.submit({})
+        for attempt in range(1, 4):
+            self.assertEqual(self.queue.claim(f"w{attempt}")["attempts"], attempt)
+            self.clock.now += 61
+        self.assertIsNone(self.queue.claim("w4"))
+        job = self.queue.get(job_id)
+        self.assertEqual((job["status"], job["error"]), (FAILED, "Worker stopped responding"))
+
+    def test_list_and_counts(self):
+        ids = [self.queue.submit({"n": n}) for n in range(3)]
+        self.queue.claim("w")
+        self.assertEqual([job["id"] for job in self.queue.list()], ids[::-1])
+        self.assertEqual([job["id"] for job in self.queue.list(status=QUEUED, limit=1)], [ids[2]])
+        self.assertEqual(self.queue.counts(), {QUEUED: 2, RUNNING: 1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import random
+import unittest
+
+from app.utils.json_stream import JsonArrayParser
+
+PLAN = [
+    {"segment_number": 1, "type": "image", "duration_seconds": 3, "prompt": "A runner at dawn, [golden] light"},
+    {"segment_number": 2, "type": "video", "duration_seconds": 5, "prompt": "Quote \"go\", brace } and bracket ]",
+     "tags": ["a", {"b": [1, 2]}]},
+    {"segment_number": 3, "type": "image", "duration_seconds": 2, "prompt": "Escaped \\ backslash, unicode é"},
+    12.5,
+    None,
+    "plain string",
+    [],
+]
+
+def feed_all(pieces):
+    parser = JsonArrayParser()
+    items = []
+    for piece in pieces:
+        items.extend(parser.feed(piece))
+    parser.close()
+    return items
+
+def random_split(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), rng.randint(0, min(20, len(text) - 1))))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+class JsonArrayParserTest(unittest.TestCase):
+    def test_whole_document(self):
+        self.assertEqual(feed_all([json.dumps(PLAN)]), PLAN)
+
+    def test_one_character_at_a_time(self):
+        self.assertEqual(feed_all(list(json.dumps(PLAN, indent=2))), PLAN)
+
+    def test_random_splits(self):
+        rng = random.Random(1234)
+        for indent in (None, 2):
+            text = json.dumps(PLAN, indent=indent, ensure_ascii=False)
+            for _ in range(500):
+                self.assertEqual(feed_all(random_split(text, rng)), PLAN)
+
+    def test_elements_are_returned_as_soon_as_complete(self):
+        parser = JsonArrayParser()
+        self.assertEqual(parser.feed('[{"a": 1}, {"b"'), [{"a": 1}])
+        self.assertEqual(parser.feed(': 2}'), [{"b": 2}])
+        self.assertEqual(parser.feed(', 3'), [])
+        self.assertEqual(parser.feed(']'), [3])
+        self.assertTrue(parser.done)
+        parser.close()
+
+    def test_text_before_the_array_is_ignored(self):
+        self.assertEqual(feed_all(["Here is the plan:\n```json\n", "[1, ", "2]\n```"]), [1, 2])
+
+    def test_empty_array(self):
+        self.assertEqual(feed_all(["[", " ", "]"]), [])
+
+    def test_text_after_the_array_is_ignored(self):
+        parser = JsonArrayParser()
+        self.assertEqual(parser.feed('[1] trailing [2]'), [1])
+        self.assertEqual(parser.feed('[3]'), [])
+
+    def test_truncated_array_fails_on_close(self):
+        parser = JsonArrayParser()
+        parser.feed('[{"a": 1}, {"b": 2')
+        with self.assertRaises(ValueError):
+            parser.close()
+
+    def test_invalid_element_fails(self):
+        parser = JsonArrayParser()
+        with self.assertRaises(ValueError):
+            parser.feed('[{"a": 1}, nope]')
+
+if __name__ == "__main__":
+    unittest.main()
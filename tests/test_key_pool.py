@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+from app.utils.key_pool import KeyPool
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+class KeyPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("app.utils.key_pool.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = KeyPool(["a", "b", "c"], rate_limit_cooldown=60.0, error_cooldown=15.0)
+
+    def test_least_in_flight_key_is_taken(self):
+        self.assertEqual([self.pool.acquire() for _ in range(3)], ["a", "b", "c"])
+        self.pool.release("b")
+        self.assertEqual(self.pool.acquire(), "b")
+
+    def test_ties_go_to_the_least_used_key(self):
+        for _ in range(2):
+            self.pool.release(self.pool.acquire(exclude=("b", "c")))
+        self.pool.release(self.pool.acquire(exclude=("a", "c")))
+        # All idle; a has served 2 requests, b 1, c none
+        self.assertEqual(self.pool.acquire(), "c")
+        self.assertEqual(self.pool.acquire(), "b")
+        self.assertEqual(self.pool.acquire(), "a")
+
+    def test_rate_limit_cooldown(self):
+        key = self.pool.acquire()
+        self.pool.release(key, 429)
+        self.assertNotIn(key, [self.pool.acquire() for _ in range(4)])
+        self.clock.now += 60
+        self.assertEqual(self.pool.acquire(), key)
+
+    def test_retry_after_overrides_the_default_cooldown(self):
+        self.pool.release(self.pool.acquire(), 429, retry_after=5)
+        self.assertAlmostEqual(self.pool.cooldown_remaining(exclude=("b", "c")), 5)
+        self.clock.now += 5
+        self.assertEqual(self.pool.acquire(exclude=("b", "c")), "a")
+
+    def test_other_errors_use_the_error_cooldown(self):
+        self.pool.release(self.pool.acquire(), 500)
+        self.assertAlmostEqual(self.pool.cooldown_remaining(exclude=("b", "c")), 15)
+
+    def test_unknown_outcome_does_not_rest_the_key(self):
+        self.pool.release(self.pool.acquire(), None)
+        self.assertEqual(self.pool.cooldown_remaining(), 0)
+        self.assertEqual(self.pool.stats()["#1"]["failures"], 0)
+
+    def test_exclude_and_exhaustion(self):
+        self.assertEqual(self.pool.acquire(exclude=("a",)), "b")
+        self.assertIsNone(self.pool.acquire(exclude=("a", "b", "c")))
+        self.assertIsNone(self.pool.cooldown_remaining(exclude=("a", "b", "c")))
+        for key in ("a", "b", "c"):
+            self.pool.acquire()
+        for key, wait in (("a", 30), ("b", 10), ("c", 20)):
+            self.pool.release(key, 429, retry_after=wait)
+        self.assertIsNone(self.pool.acquire())
+        self.assertAlmostEqual(self.pool.cooldown_remaining(), 10)
+
+    def test_stats_are_keyed_by_label(self):
+        self.pool = KeyPool(["secret-key-1", "secret-key-2", "secret-key-3"])
+        self.pool.release(self.pool.acquire(), 200)
+        self.pool.release(self.pool.acquire(), 429)
+        stats = self.pool.stats()
+        self.assertEqual(list(stats), ["#1", "#2", "#3"])
+        self.assertEqual(stats["#1"]["successes"], 1)
+        self.assertEqual(stats["#2"]["rate_limited"], 1)
+        self.assertEqual(stats["#2"]["cooldown_s"], 60.0)
+        self.assertNotIn("secret-key", repr(stats))
+
+if __name__ == "__main__":
+    unittest.main()
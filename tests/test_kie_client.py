@@ -0,0 +1,158 @@
+import itertools
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import httpx
+
+from app.services.generate_video import generate_video_async
+from app.services.kie_client import KieClient, PollSchedule
+from app.utils import AssetCache, JobWorkspace, KeyPool
+
+VIDEO_URL = "https://cdn.example.com/clips/abc.mp4"
+VIDEO_BYTES = os.urandom(3 * 1024 * 1024 + 123)  # several download chunks
+
+class FakeClock:
+    """time.monotonic for kie_client; asyncio.sleep advances it instead of waiting."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class StubKie:
+    """
+    Local stand-in for the Kie.ai API: keys in rate_limited get a 429, a job
+    is done after `polls` status checks, and the video URL serves VIDEO_BYTES.
+    """
+
+    def __init__(self, rate_limited=(), polls=3):
+        self.rate_limited = set(rate_limited)
+        self.polls = polls
+        self.created = []  # (api key, payload)
+        self.status_checks = {}
+
+    def __call__(self, request):
+        api_key = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if request.url.path == "/api/v1/runway/generate":
+            if api_key in self.rate_limited:
+                return httpx.Response(429, headers={"Retry-After": "30"}, json={"msg": "rate limited"})
+            self.created.append((api_key, json.loads(request.content)))
+            task_id = f"task-{len(self.created)}"
+            self.status_checks[task_id] = 0
+            return httpx.Response(200, json={"code": 200, "data": {"taskId": task_id}})
+        if request.url.path == "/api/v1/runway/record-detail":
+            task_id = request.url.params["taskId"]
+            self.status_checks[task_id] += 1
+            if self.status_checks[task_id] < self.polls:
+                return httpx.Response(200, json={"code": 200, "data": {"state": "generating"}})
+            return httpx.Response(200, json={"code": 200, "data": {"state": "success",
+                                                                  "videoInfo": {"videoUrl": VIDEO_URL}}})
+        if str(request.url) == VIDEO_URL:
+            return httpx.Response(200, content=VIDEO_BYTES)
+        return httpx.Response(404)
+
+class PollScheduleTest(unittest.TestCase):
+    def test_back_off_without_history(self):
+        schedule = PollSchedule(min_interval=1, steady_interval=5)
+        self.assertEqual(list(itertools.islice(schedule.delays(), 6)), [1, 2, 4, 5, 5, 5])
+
+    def test_quiet_period_follows_observed_durations(self):
+        schedule = PollSchedule(min_interval=1, steady_interval=5, quiet_fraction=0.8, smoothing=0.5)
+        schedule.observe(100)
+        self.assertEqual(list(itertools.islice(schedule.delays(), 3)), [80, 1, 2])
+        schedule.observe(50)
+        self.assertEqual(next(schedule.delays()), 60)  # 0.8 * (100 + 0.5 * (50 - 100))
+
+class KieClientTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.clock = FakeClock()
+        for target, value in (("app.services.kie_client.time", self.clock),
+                              ("app.services.kie_client.asyncio.sleep", self.clock.sleep),
+                              ("app.services.generate_video.get_asset_cache",
+                               lambda: AssetCache(os.path.join(self.tmp, "cache")))):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def client(self, stub, keys=("key-1", "key-2")):
+        client = KieClient(key_pool=KeyPool(keys), base_url="https://api.test",
+                           transport=httpx.MockTransport(stub))
+        self.addAsyncCleanup(client.aclose)
+        return client
+
+    async def test_polls_follow_the_schedule(self):
+        stub = StubKie(polls=4)
+        client = self.client(stub)
+        self.assertIsNotNone(await client.generate("a fox", os.path.join(self.tmp, "1.mp4")))
+        self.assertEqual(self.clock.sleeps, [1, 2, 4, 5])
+        self.assertEqual(client.poll_schedule.expected_duration, 12)
+
+        # The next job waits out most of the expected duration before polling
+        self.clock.sleeps.clear()
+        stub.polls = 2
+        await client.generate("a fox", os.path.join(self.tmp, "2.mp4"))
+        self.assertEqual(self.clock.sleeps, [12 * 0.8, 1])
+
+    async def test_rate_limited_key_fails_over(self):
+        stub = StubKie(rate_limited={"key-1"})
+        client = self.client(stub)
+        self.assertIsNotNone(await client.generate("a fox", os.path.join(self.tmp, "1.mp4")))
+        self.assertEqual([key for key, _ in stub.created], ["key-2"])
+        stats = client.key_stats()
+        self.assertEqual(stats["#1"]["rate_limited"], 1)
+        self.assertEqual(stats["#1"]["cooldown_s"], 30.0)  # Retry-After
+        self.assertEqual(stats["#2"]["successes"], 1)
+
+        # While key-1 rests, new jobs go straight to key-2
+        await client.generate("a cat", os.path.join(self.tmp, "2.mp4"))
+        self.assertEqual(client.key_stats()["#1"]["requests"], 1)
+
+    async def test_every_key_rate_limited(self):
+        client = self.client(StubKie(rate_limited={"key-1", "key-2"}))
+        client.max_key_wait = 0
+        self.assertIsNone(await client.generate("a fox", os.path.join(self.tmp, "1.mp4")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "1.mp4")))
+
+    async def test_download_lands_in_the_workspace(self):
+        stub = StubKie()
+        workspace = JobWorkspace("job", root=self.tmp, keep=True).create()
+        path = await generate_video_async("a fox", 3, duration_seconds=5, aspect_ratio="9:16",
+                                          workspace=workspace, client=self.client(stub))
+        self.assertEqual(path, workspace.media_path("3.mp4"))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), VIDEO_BYTES)
+        self.assertEqual(os.listdir(workspace.media_dir), ["3.mp4"])  # no .part file left
+        self.assertEqual(stub.created[0][1]["duration"], 5)
+        self.assertEqual(stub.created[0][1]["aspectRatio"], "9:16")
+
+        # Same prompt again: served by the asset cache, no new job
+        path = await generate_video_async("a fox", 4, workspace=workspace, client=self.client(stub))
+        self.assertEqual(path, workspace.media_path("4.mp4"))
+        self.assertEqual(len(stub.created), 1)
+
+    async def test_failed_download_leaves_no_file(self):
+        def broken_cdn(request):
+            if str(request.url) == VIDEO_URL:
+                return httpx.Response(503)
+            return stub(request)
+
+        stub = StubKie()
+        client = self.client(broken_cdn)
+        filepath = os.path.join(self.tmp, "media", "1.mp4")
+        self.assertIsNone(await client.generate("a fox", filepath))
+        self.assertEqual(os.listdir(os.path.dirname(filepath)), [])
+
+if __name__ == "__main__":
+    unittest.main()
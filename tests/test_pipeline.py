@@ -0,0 +1,166 @@
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from app.services.pipeline import CANCELLED, DONE, FAILED, RUNNING, Stage, run_stages, run_video_pipeline
+from app.utils import JobWorkspace
+
+class Recorder:
+    """on_update callback keeping every (stage, state) transition."""
+
+    def __init__(self):
+        self.events = []
+        self.last = {}
+
+    def __call__(self, stage, state, states):
+        self.events.append((stage.name, state))
+        self.last = states
+
+class RunStagesTest(unittest.TestCase):
+    def test_results_flow_along_dependencies(self):
+        stages = [
+            Stage("prompts", lambda r: [1, 2]),
+            Stage("script", lambda r: len(r["prompts"]), depends_on=["prompts"]),
+            Stage("media", lambda r: sum(r["prompts"]), depends_on=["prompts"]),
+            Stage("assemble", lambda r: (r["script"], r["media"]), depends_on=["script", "media"]),
+        ]
+        updates = Recorder()
+        results = run_stages(stages, on_update=updates)
+        self.assertEqual(results, {"prompts": [1, 2], "script": 2, "media": 3, "assemble": (2, 3)})
+        self.assertEqual(set(updates.last.values()), {DONE})
+        self.assertLess(updates.events.index(("prompts", DONE)), updates.events.index(("script", RUNNING)))
+
+    def test_independent_stages_run_concurrently(self):
+        both_started = threading.Barrier(2, timeout=5)
+        stages = [Stage("voice", lambda r: both_started.wait()), Stage("media", lambda r: both_started.wait())]
+        run_stages(stages)  # a BrokenBarrierError would mean they ran one after the other
+
+    def test_failure_cancels_pending_stages_and_reports_in_flight_ones(self):
+        release = threading.Event()
+
+        def slow(r):
+            release.wait(5)
+            return "voice"
+
+        def fail(r):
+            release.set()  # voice is still in flight when the failure is seen, or just done
+            raise RuntimeError("planner down")
+
+        stages = [
+            Stage("voice", slow),
+            Stage("media", fail),
+            Stage("assemble", lambda r: None, depends_on=["voice", "media"]),
+        ]
+        updates = Recorder()
+        with self.assertRaisesRegex(RuntimeError, "planner down"):
+            run_stages(stages, on_update=updates)
+        self.assertEqual(updates.last, {"voice": DONE, "media": FAILED, "assemble": CANCELLED})
+        self.assertNotIn(("assemble", RUNNING), updates.events)
+
+    def test_in_flight_stage_that_also_fails_is_reported_failed(self):
+        started = threading.Barrier(2, timeout=5)
+
+        def fail(message):
+            def func(r):
+                started.wait()
+                raise RuntimeError(message)
+            return func
+
+        updates = Recorder()
+        with self.assertRaises(RuntimeError):
+            run_stages([Stage("a", fail("a")), Stage("b", fail("b"))], on_update=updates)
+        self.assertEqual(updates.last, {"a": FAILED, "b": FAILED})
+
+    def test_slots_bound_concurrent_runs(self):
+        slots = threading.BoundedSemaphore(1)
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def work(r):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            threading.Event().wait(0.05)
+            with lock:
+                active[0] -= 1
+
+        run_stages([Stage(f"s{i}", work, slots=slots) for i in range(3)])
+        self.assertEqual(peak[0], 1)
+
+    def test_unknown_dependency(self):
+        with self.assertRaisesRegex(ValueError, "unknown stage 'missing'"):
+            run_stages([Stage("a", lambda r: None, depends_on=["missing"])])
+
+    def test_dependency_cycle(self):
+        stages = [Stage("a", lambda r: None, depends_on=["b"]), Stage("b", lambda r: None, depends_on=["a"])]
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            run_stages(stages)
+
+class StreamPlanFallbackTest(unittest.TestCase):
+    """A planner stream that breaks off after submitting media jobs, then the fallback plan."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.events = []
+        self.lock = threading.Lock()
+        self.gate = threading.Event()
+
+    def record(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def stream(self, prompt, use_cache=True):
+        for n in range(1, 7):
+            yield {"segment_number": n, "type": "image", "duration_seconds": 3, "prompt": f"image {n}"}
+        yield {"segment_number": 7, "type": "video", "duration_seconds": 5, "prompt": "video 7"}
+        # The running jobs are still busy when the stream breaks off
+        threading.Timer(0.2, self.gate.set).start()
+        raise ValueError("The planner response ended early")
+
+    def image(self, prompt, segment_number, output_dir):
+        self.record(f"start {segment_number}")
+        self.gate.wait(5)
+        with open(os.path.join(output_dir, f"{segment_number}.png"), "w") as f:
+            f.write(prompt)
+        self.record(f"end {segment_number}")
+        return f.name
+
+    async def video(self, prompt, segment_number, **kwargs):
+        self.record(f"start {segment_number}")
+        try:
+            await asyncio.sleep(60)
+        finally:
+            self.record(f"end {segment_number}")
+
+    def fallback(self, prompt, use_cache=True):
+        self.record("fallback")
+        raise RuntimeError("stop after the fallback starts")
+
+    def test_no_job_of_the_broken_plan_runs_after_the_fallback_starts(self):
+        patches = [
+            mock.patch("app.services.plan_generator.stream_plan_from_prompt", self.stream),
+            mock.patch("app.services.prompt_generator.generate_prompts_from_prompt", self.fallback),
+            mock.patch("app.services.generate_media.generate_image_from_prompt", self.image),
+            mock.patch("app.services.generate_media.generate_video_async", self.video),
+            mock.patch.dict("app.services.generate_media.PROVIDER_LIMITS", {"image": 2, "video": 1}),
+        ]
+        with contextlib.ExitStack() as stack, contextlib.redirect_stdout(io.StringIO()):
+            for patch in patches:
+                stack.enter_context(patch)
+            with self.assertRaisesRegex(RuntimeError, "stop after the fallback starts"):
+                run_video_pipeline("a fox", workspace=JobWorkspace("job", root=self.tmp))
+
+        self.assertEqual(self.events[-1], "fallback")
+        started = sorted(event for event in self.events if event.startswith("start"))
+        self.assertEqual(started, ["start 1", "start 2", "start 7"])  # the queued images never ran
+        self.assertEqual(sorted(event for event in self.events if event.startswith("end")),
+                         ["end 1", "end 2", "end 7"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from app.utils.plan_cache import PlanCache
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+class PlanCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.clock = FakeClock()
+        patcher = mock.patch("app.utils.plan_cache.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path = os.path.join(tmp.name, "plans.db")
+
+    def cache(self, **kwargs):
+        cache = PlanCache(self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_put_then_get(self):
+        cache = self.cache()
+        cache.put("k", "model", {"segments": [1, 2]})
+        self.assertEqual(cache.get("k"), {"segments": [1, 2]})
+        self.assertIsNone(cache.get("other"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1})
+
+    def test_entries_persist_across_instances(self):
+        cache = self.cache()
+        cache.put("k", "model", [1])
+        cache.close()
+        self.assertEqual(self.cache().get("k"), [1])
+
+    def test_entries_expire_after_ttl(self):
+        cache = self.cache(ttl=60)
+        cache.put("k", "model", "v")
+        self.clock.now += 59
+        self.assertEqual(cache.get("k"), "v")
+        self.clock.now += 2
+        self.assertIsNone(cache.get("k"))
+
+    def test_reading_does_not_extend_ttl(self):
+        cache = self.cache(ttl=60)
+        cache.put("k", "model", "v")
+        self.clock.now += 50
+        cache.get("k")
+        self.clock.now += 20
+        self.assertIsNone(cache.get("k"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.cache(max_entries=2)
+        cache.put("a", "model", "A")
+        self.clock.now += 1
+        cache.put("b", "model", "B")
+        self.clock.now += 1
+        cache.get("a")  # b is now the least recently used
+        self.clock.now += 1
+        cache.put("c", "model", "C")
+        self.assertEqual(cache.get("a"), "A")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "C")
+
+    def test_make_key_covers_model_prompt_schema_and_contents(self):
+        config = {"system_instruction": "plan", "response_schema": {"type": "ARRAY"}}
+        key = PlanCache.make_key("m", config, "hello")
+        self.assertEqual(key, PlanCache.make_key("m", dict(config), "hello"))
+        self.assertNotEqual(key, PlanCache.make_key("m2", config, "hello"))
+        self.assertNotEqual(key, PlanCache.make_key("m", {**config, "system_instruction": "plan2"}, "hello"))
+        self.assertNotEqual(key, PlanCache.make_key("m", {**config, "response_schema": None}, "hello"))
+        self.assertNotEqual(key, PlanCache.make_key("m", config, "hello!"))
+        self.assertEqual(PlanCache.make_key("m", None, "x"), PlanCache.make_key("m", {}, "x"))
+
+    def test_memoize(self):
+        cache = self.cache()
+        compute = mock.Mock(return_value=["first"])
+        self.assertEqual(cache.memoize("m", {}, "c", compute), ["first"])
+        self.assertEqual(cache.memoize("m", {}, "c", compute), ["first"])
+        self.assertEqual(compute.call_count, 1)
+
+    def test_memoize_bypass_replaces_the_cached_value(self):
+        cache = self.cache()
+        cache.memoize("m", {}, "c", lambda: "old")
+        compute = mock.Mock(return_value="new")
+        self.assertEqual(cache.memoize("m", {}, "c", compute, use_cache=False), "new")
+        compute.assert_called_once()
+        self.assertEqual(cache.memoize("m", {}, "c", mock.Mock()), "new")
+
+    def test_close_from_another_thread(self):
+        cache = self.cache()
+        thread = threading.Thread(target=cache.put, args=("k", "model", "v"))
+        thread.start()
+        thread.join()
+        cache.close()
+        self.assertEqual(cache.get("k"), "v")  # reconnects
+
+    def test_memoize_does_not_store_none(self):
+        cache = self.cache()
+        self.assertIsNone(cache.memoize("m", {}, "c", lambda: None))
+        self.assertEqual(cache.memoize("m", {}, "c", lambda: "v"), "v")
+
+if __name__ == "__main__":
+    unittest.main()
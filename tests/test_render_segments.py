@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app.services.render_segments import segment_captions, segment_key
+from app.utils import AssetCache
+
+class SegmentCaptionsTest(unittest.TestCase):
+    def test_captions_in_local_time(self):
+        texts = [("a", 0.0, 1.0), ("b", 1.0, 3.0), ("c", 4.5, 6.0), ("d", 6.0, 7.0)]
+        self.assertEqual(segment_captions(texts, 2.0, 6.0), [("b", -1.0, 1.0), ("c", 2.5, 4.0)])
+
+    def test_touching_captions_are_left_out(self):
+        self.assertEqual(segment_captions([("a", 0.0, 2.0), ("b", 4.0, 5.0)], 2.0, 4.0), [])
+
+class SegmentKeyTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.image = os.path.join(self.tmp, "1.png")
+        with open(self.image, "wb") as f:
+            f.write(b"image one")
+        patcher = mock.patch("app.services.render_segments.get_asset_cache",
+                             lambda: AssetCache(os.path.join(self.tmp, "cache")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def key(self, item=None, captions=(), size=(720, 1280), **kwargs):
+        return segment_key(item or (self.image, 5.0, "zoom_in", 1.15), list(captions), size, **kwargs)
+
+    def test_same_inputs_same_key(self):
+        copy = os.path.join(self.tmp, "copy.png")
+        with open(copy, "wb") as f:
+            f.write(b"image one")
+        self.assertEqual(self.key(), self.key())
+        # Keyed on the file contents, not its path
+        self.assertEqual(self.key(), self.key((copy, 5.0, "zoom_in", 1.15)))
+
+    def test_everything_that_changes_the_pixels_changes_the_key(self):
+        base = self.key()
+        variants = {
+            "duration": self.key((self.image, 4.0, "zoom_in", 1.15)),
+            "direction": self.key((self.image, 5.0, "left", 1.15)),
+            "intensity": self.key((self.image, 5.0, "zoom_in", 1.3)),
+            "captions": self.key(captions=[("Hi", 0.0, 1.0)]),
+            "caption timing": self.key(captions=[("Hi", -0.5, 1.0)]),
+            "size": self.key(size=(360, 640)),
+            "fps": self.key(fps=24),
+            "profile": self.key(profile="draft"),
+            "text options": self.key(text_options={"font_size": 60}),
+        }
+        for name, key in variants.items():
+            self.assertNotEqual(key, base, name)
+        self.assertEqual(len(set(variants.values())), len(variants))
+
+    def test_edited_file_changes_the_key(self):
+        before = self.key()
+        with open(self.image, "wb") as f:
+            f.write(b"image one, edited")
+        self.assertNotEqual(self.key(), before)
+
+if __name__ == "__main__":
+    unittest.main()
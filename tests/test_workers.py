@@ -0,0 +1,78 @@
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from app.services.workers import WorkerPool
+from app.utils.job_queue import DONE, QUEUED, RUNNING, JobQueue
+
+def record(status=DONE):
+    return {"status": status, "output": "out.mp4", "error": None, "stages": {}, "elapsed_s": 1.0}
+
+class FlakyQueue(JobQueue):
+    """A JobQueue whose first `failures` finish() calls raise, like a locked database."""
+
+    def __init__(self, path, failures):
+        super().__init__(path)
+        self.failures = failures
+
+    def finish(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return super().finish(*args, **kwargs)
+
+    def update_stages(self, job_id, stages):
+        raise sqlite3.OperationalError("database is locked")
+
+class WorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "jobs.db")
+        for target, value in (("app.services.workers.time", mock.Mock()),
+                              ("app.services.workers.run_job", self.run_job),
+                              ("sys.stdout", io.StringIO())):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_job(self, job, on_update, **kwargs):
+        on_update(job, None, RUNNING, {"plan": RUNNING})
+        return record()
+
+    def queue(self, failures):
+        queue = FlakyQueue(self.path, failures)
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_transient_finish_errors_are_retried(self):
+        queue = self.queue(failures=2)
+        job_id = queue.submit({})
+        pool = WorkerPool(queue, workers=0, finish_attempts=3)
+        pool._run(queue.claim("w"))
+        self.assertEqual(queue.get(job_id)["status"], DONE)
+        self.assertEqual(pool._running, set())
+
+    def test_worker_survives_a_result_it_cannot_store(self):
+        queue = self.queue(failures=3)
+        first, second = queue.submit({}), queue.submit({})
+        pool = WorkerPool(queue, workers=0, poll_interval=0.01, finish_attempts=3)
+        worker = threading.Thread(target=pool._work, args=("w",))
+        worker.start()
+        for _ in range(500):
+            if queue.get(second)["status"] == DONE:
+                break
+            threading.Event().wait(0.01)
+        pool.stop(wait=False)
+        worker.join()
+        # The first job stays running without heartbeats, for claim() to requeue once stale
+        self.assertEqual(queue.get(first)["status"], RUNNING)
+        self.assertEqual(queue.get(second)["status"], DONE)
+        self.assertNotIn(QUEUED, queue.counts())
+
+if __name__ == "__main__":
+    unittest.main()